@@ -0,0 +1,284 @@
+"""文件系统变化监视。
+
+监视 ROM 根目录、gamelist 目录和 downloaded_media，把新增/删除/修改事件批量推送给各插件。
+安装了 watchdog 时使用系统原生通知 (Linux 上为 inotify，Windows 上为 ReadDirectoryChangesW)；
+否则退回到轮询：每轮只 stat 目录，mtime 变化的目录才重新列出并与上次的文件列表做差分，
+另外单独 stat 受关注的文件 (gamelist.xml) 以发现内容修改。
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+    WATCHDOG_AVAILABLE = False
+
+TOOLKIT_CONFIG_FILE = "esde_toolkit_config.json"
+POLL_INTERVAL = 3.0
+# 原生通知模式下，事件先收集再按此间隔批量派发，避免复制大量文件时频繁刷新界面
+DISPATCH_INTERVAL = 0.5
+WATCHED_FILE_NAMES = ("gamelist.xml",)
+
+ROOT_ROMS = "roms"
+ROOT_GAMELISTS = "gamelists"
+ROOT_MEDIA = "media"
+
+
+class FsEvent(NamedTuple):
+    kind: str  # "added" / "removed" / "modified"
+    path: Path
+    is_dir: bool = False
+
+    def relative_parts(self, root: Path) -> Tuple[str, ...]:
+        try:
+            return self.path.relative_to(root).parts
+        except ValueError:
+            return ()
+
+
+# 监听回调: (根目录标识, 根目录路径, 事件列表)
+FsListener = Callable[[str, Path, List[FsEvent]], None]
+
+
+class _PollingTree:
+    """单个根目录的轮询状态：目录 mtime、目录下的文件/子目录集合，以及关注文件的 mtime。"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.dir_mtimes: Dict[str, int] = {}
+        self.dir_files: Dict[str, Set[str]] = {}
+        self.dir_subdirs: Dict[str, Set[str]] = {}
+        self.file_mtimes: Dict[str, int] = {}
+
+    def _list(self, directory: str) -> Optional[Tuple[int, Set[str], Set[str]]]:
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            files, subdirs = set(), set()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirs.add(entry.name)
+                        elif entry.is_file():
+                            files.add(entry.name)
+                    except OSError:
+                        continue
+            return mtime_ns, files, subdirs
+        except OSError:
+            return None
+
+    def _forget(self, directory: str, events: List[FsEvent]):
+        for name in self.dir_files.pop(directory, set()):
+            path = os.path.join(directory, name)
+            self.file_mtimes.pop(path, None)
+            events.append(FsEvent("removed", Path(path)))
+        for name in self.dir_subdirs.pop(directory, set()):
+            self._forget(os.path.join(directory, name), events)
+            events.append(FsEvent("removed", Path(directory, name), True))
+        self.dir_mtimes.pop(directory, None)
+
+    def _track_files(self, directory: str, names: Set[str]):
+        for name in names:
+            if name in WATCHED_FILE_NAMES:
+                path = os.path.join(directory, name)
+                try:
+                    self.file_mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+
+    def poll(self, report: bool = True) -> List[FsEvent]:
+        events: List[FsEvent] = []
+        pending = [os.fspath(self.root)]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._forget(directory, events)
+                continue
+
+            if self.dir_mtimes.get(directory) != mtime_ns:
+                listing = self._list(directory)
+                if listing is None:
+                    continue
+                mtime_ns, files, subdirs = listing
+                old_files = self.dir_files.get(directory, set())
+                old_subdirs = self.dir_subdirs.get(directory, set())
+                for name in files - old_files:
+                    events.append(FsEvent("added", Path(directory, name)))
+                for name in old_files - files:
+                    self.file_mtimes.pop(os.path.join(directory, name), None)
+                    events.append(FsEvent("removed", Path(directory, name)))
+                for name in old_subdirs - subdirs:
+                    self._forget(os.path.join(directory, name), events)
+                    events.append(FsEvent("removed", Path(directory, name), True))
+                for name in subdirs - old_subdirs:
+                    events.append(FsEvent("added", Path(directory, name), True))
+                self.dir_mtimes[directory] = mtime_ns
+                self.dir_files[directory] = files
+                self.dir_subdirs[directory] = subdirs
+                self._track_files(directory, files - old_files)
+
+            pending.extend(os.path.join(directory, name) for name in self.dir_subdirs.get(directory, ()))
+
+        for path, old_mtime in list(self.file_mtimes.items()):
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            if mtime_ns != old_mtime:
+                self.file_mtimes[path] = mtime_ns
+                events.append(FsEvent("modified", Path(path)))
+
+        return events if report else []
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "FileSystemWatcher", root_key: str):
+        super().__init__()
+        self.watcher = watcher
+        self.root_key = root_key
+
+    def on_any_event(self, event):
+        kinds = {"created": "added", "deleted": "removed", "modified": "modified"}
+        if event.event_type == "moved":
+            self.watcher._queue(self.root_key, FsEvent("removed", Path(event.src_path), event.is_directory))
+            self.watcher._queue(self.root_key, FsEvent("added", Path(event.dest_path), event.is_directory))
+        elif event.event_type in kinds:
+            # 目录自身的 modified 事件只表示其内容变化，子项会有各自的事件
+            if event.event_type == "modified" and event.is_directory:
+                return
+            self.watcher._queue(self.root_key, FsEvent(kinds[event.event_type], Path(event.src_path),
+                                                       event.is_directory))
+
+
+class FileSystemWatcher:
+    """监视一组根目录，把事件按根目录分批推送给监听者 (在后台线程中调用)。"""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, use_native: bool = WATCHDOG_AVAILABLE):
+        self.poll_interval = poll_interval
+        self.use_native = use_native and WATCHDOG_AVAILABLE
+        self.roots: Dict[str, Path] = {}
+        self._listeners: List[FsListener] = []
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[FsEvent]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    @property
+    def mode(self) -> str:
+        return "native" if self.use_native else "polling"
+
+    def add_listener(self, listener: FsListener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: FsListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def start(self, roots: Dict[str, Path]):
+        """开始监视；roots 变化时先停止再以新的目录重新开始。"""
+        roots = {key: Path(path) for key, path in roots.items() if path and Path(path).is_dir()}
+        if self._thread and self._thread.is_alive():
+            if roots == self.roots:
+                return
+            self.stop()
+        self.roots = roots
+        self._stop.clear()
+
+        if self.use_native:
+            self._observer = Observer()
+            for key, root in roots.items():
+                self._observer.schedule(_WatchdogHandler(self, key), os.fspath(root), recursive=True)
+            self._observer.start()
+            target = self._dispatch_loop
+        else:
+            target = self._poll_loop
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _queue(self, root_key: str, event: FsEvent):
+        with self._lock:
+            self._pending.setdefault(root_key, []).append(event)
+
+    def _dispatch(self, root_key: str, events: List[FsEvent]):
+        if not events:
+            return
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(root_key, self.roots[root_key], events)
+            except Exception as e:
+                print(f"警告: 文件变化回调失败: {e}")
+
+    def _dispatch_loop(self):
+        while not self._stop.wait(DISPATCH_INTERVAL):
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for root_key, events in pending.items():
+                self._dispatch(root_key, events)
+
+    def _poll_loop(self):
+        trees = {key: _PollingTree(root) for key, root in self.roots.items()}
+        # 第一轮只建立基线，不产生事件
+        for tree in trees.values():
+            tree.poll(report=False)
+        while not self._stop.wait(self.poll_interval):
+            for key, tree in trees.items():
+                self._dispatch(key, tree.poll())
+
+
+_shared_watcher: Optional[FileSystemWatcher] = None
+_shared_watcher_lock = threading.Lock()
+
+
+def get_fs_watcher() -> FileSystemWatcher:
+    global _shared_watcher
+    with _shared_watcher_lock:
+        if _shared_watcher is None:
+            _shared_watcher = FileSystemWatcher()
+        return _shared_watcher
+
+
+def start_fs_watcher_from_config() -> FileSystemWatcher:
+    """按配置文件中的 ROM 根目录、gamelist 目录及其 downloaded_media 启动监视。"""
+    watcher = get_fs_watcher()
+    config_path = Path(__file__).parent / "config" / TOOLKIT_CONFIG_FILE
+    config = {}
+    if config_path.is_file():
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            config = {}
+
+    roots: Dict[str, Path] = {}
+    if config.get("rom_files_dir"):
+        roots[ROOT_ROMS] = Path(config["rom_files_dir"])
+    if config.get("gamelist_base_dir"):
+        gamelist_base = Path(config["gamelist_base_dir"])
+        roots[ROOT_GAMELISTS] = gamelist_base
+        # 媒体预览插件约定 downloaded_media 与 gamelists 目录同级
+        roots[ROOT_MEDIA] = gamelist_base.parent / "downloaded_media"
+    watcher.start(roots)
+    return watcher
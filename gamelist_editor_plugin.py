@@ -3,7 +3,7 @@ import tkinter as tk
 from tkinter import messagebox, filedialog, simpledialog
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Union, Tuple
+from typing import Optional, Dict, Any, List, Union, Tuple, Callable, Set
 import threading
 import sys
 import os
@@ -13,6 +13,19 @@ from collections import defaultdict
 import time
 
 from interface_loader import register_interface 
+from rom_index_lookup import UserOverrideStore, calculate_rom_hashes, recall_rom_hashes
+from library_scan import get_library_scan_service, load_library_settings, system_from_label
+from library_health import relative_rom_path
+from fs_watcher import ROOT_GAMELISTS, FsEvent, get_fs_watcher
+import xml_backend
+from gamelist_loader import GamelistDocument, GamelistLoadCancelled
+from gamelist_repository import GamelistChangedError, get_gamelist_repository
+from gamelist_writer import SAVE_MODE_REPLAN
+from gamelist_journal import journal_for
+from gamelist_records import LIST_FIELDS, RECORD_FIELDS, GameRecord, GameRecordIndex, records_for
+from gamelist_search import GamelistSearchIndex
+import gamelist_bulk_edit
+from gamelist_bulk_edit import BulkEditPreview, BulkOperation
 
 try:
     import requests 
@@ -34,6 +47,17 @@ ITEM_DEFAULT_COLOR = "#2c2c2c"
 ITEM_SELECTED_COLOR = "#3498DB"   
 LIST_FRAME_BG_COLOR = "#2a2d2e"   
 ES_SETTINGS_FILE = "es_settings.xml" 
+# 自动保存：最后一次修改后等待这么久再在后台保存
+AUTOSAVE_DELAY_MS = 3000
+# 详情输入框的修改先记下字段名，每个间隔内最多写入一次记录
+FIELD_EDIT_DEBOUNCE_MS = 300
+SAVE_STATUS_CLEAN_COLOR = "#2ECC71"
+SAVE_STATUS_DIRTY_COLOR = "#F39C12"
+SAVE_STATUS_ERROR_COLOR = "#E74C3C"
+# 批量编辑预览中最多显示的修改行数
+BULK_PREVIEW_MAX_LINES = 500
+# 每次按键都立即过滤，只有重建列表控件推迟到停止输入这么久之后
+LIST_FILTER_DEBOUNCE_MS = 150
 
 
 class CTkListFrame(ctk.CTkScrollableFrame): 
@@ -96,12 +120,11 @@ class CTkListFrame(ctk.CTkScrollableFrame):
         self.checked_vars.clear() 
         self.selected_key = None
         
-        sorted_keys = sorted(data.keys())
-        
-        for index, key in enumerate(sorted_keys):
+        # 按 data 的顺序显示 (由调用方排序)
+        for index, key in enumerate(data):
             self._create_list_item(key, index)
             
-        if reselect_key and reselect_key in sorted_keys:
+        if reselect_key and reselect_key in data:
             self._on_select(reselect_key)
 
     def get_checked_keys(self) -> List[str]:
@@ -176,15 +199,155 @@ class OneClickTranslateDialog(ctk.CTkToplevel):
         self.callback(choice)
         self.destroy()
 
+class BulkEditDialog(ctk.CTkToplevel):
+    """批量编辑：组合若干操作，选择范围后先预览差异，确认后再写入。"""
+
+    OPERATIONS = ["正则替换名称", "设置字段", "清空字段", "去除名称中的地区/版本标记", "规范化评分", "规范化发行日期"]
+
+    def __init__(self, master, scopes: Dict[str, List[GameRecord]], apply_callback: Callable[[BulkEditPreview], None]):
+        super().__init__(master)
+        self.title("批量编辑")
+        self.geometry("720x620")
+        self.scopes = scopes
+        self.apply_callback = apply_callback
+        self.operations: List[BulkOperation] = []
+        self.preview: Optional[BulkEditPreview] = None
+
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(9, weight=1)
+
+        ctk.CTkLabel(self, text="操作:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        self.operation_var = ctk.StringVar(value=self.OPERATIONS[0])
+        ctk.CTkOptionMenu(self, values=self.OPERATIONS, variable=self.operation_var,
+                          command=lambda _: self._invalidate_preview()).grid(row=0, column=1, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(self, text="字段 (设置/清空):").grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        self.field_var = ctk.StringVar(value="genre")
+        ctk.CTkOptionMenu(self, values=list(RECORD_FIELDS), variable=self.field_var).grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(self, text="查找 (正则):").grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        self.pattern_var = ctk.StringVar()
+        ctk.CTkEntry(self, textvariable=self.pattern_var).grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(self, text="替换为 / 新值:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.value_var = ctk.StringVar()
+        ctk.CTkEntry(self, textvariable=self.value_var).grid(row=3, column=1, padx=10, pady=5, sticky="ew")
+
+        self.ignore_case_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self, text="忽略大小写", variable=self.ignore_case_var).grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+        op_btn_frame = ctk.CTkFrame(self, fg_color="transparent")
+        op_btn_frame.grid(row=5, column=0, columnspan=2, sticky="ew", padx=10, pady=5)
+        op_btn_frame.columnconfigure((0, 1), weight=1)
+        ctk.CTkButton(op_btn_frame, text="添加操作", command=self._add_operation,
+                      fg_color="#3498DB").grid(row=0, column=0, sticky="ew", padx=(0, 5))
+        ctk.CTkButton(op_btn_frame, text="清空操作", command=self._clear_operations,
+                      fg_color="gray").grid(row=0, column=1, sticky="ew", padx=(5, 0))
+
+        self.operations_label = ctk.CTkLabel(self, text="已添加的操作: (无，预览时使用上面的设置)", anchor="w", justify="left")
+        self.operations_label.grid(row=6, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
+
+        ctk.CTkLabel(self, text="范围:").grid(row=7, column=0, padx=10, pady=5, sticky="w")
+        scope_names = list(scopes.keys())
+        self.scope_var = ctk.StringVar(value=scope_names[0])
+        ctk.CTkOptionMenu(self, values=scope_names, variable=self.scope_var,
+                          command=lambda _: self._invalidate_preview()).grid(row=7, column=1, padx=10, pady=5, sticky="ew")
+
+        action_frame = ctk.CTkFrame(self, fg_color="transparent")
+        action_frame.grid(row=8, column=0, columnspan=2, sticky="ew", padx=10, pady=5)
+        action_frame.columnconfigure(2, weight=1)
+        ctk.CTkButton(action_frame, text="预览", command=self._run_preview,
+                      fg_color="#3498DB").grid(row=0, column=0, padx=(0, 5))
+        self.apply_btn = ctk.CTkButton(action_frame, text="应用", command=self._apply,
+                                       fg_color="#27AE60", state="disabled")
+        self.apply_btn.grid(row=0, column=1, padx=5)
+        self.summary_label = ctk.CTkLabel(action_frame, text="", anchor="w")
+        self.summary_label.grid(row=0, column=2, padx=5, sticky="ew")
+
+        self.preview_textbox = ctk.CTkTextbox(self, wrap="none")
+        self.preview_textbox.grid(row=9, column=0, columnspan=2, sticky="nsew", padx=10, pady=(5, 10))
+        self.preview_textbox.configure(state="disabled")
+
+        self.grab_set()
+
+    def _build_operation(self) -> BulkOperation:
+        operation = self.operation_var.get()
+        if operation == "正则替换名称":
+            if not self.pattern_var.get():
+                raise ValueError("请输入要查找的正则表达式。")
+            return gamelist_bulk_edit.regex_rename(self.pattern_var.get(), self.value_var.get(),
+                                                   ignore_case=self.ignore_case_var.get())
+        if operation == "设置字段":
+            return gamelist_bulk_edit.set_field(self.field_var.get(), self.value_var.get())
+        if operation == "清空字段":
+            return gamelist_bulk_edit.clear_field(self.field_var.get())
+        if operation == "规范化评分":
+            return gamelist_bulk_edit.normalize_rating_field()
+        if operation == "规范化发行日期":
+            return gamelist_bulk_edit.normalize_releasedate_field()
+        return gamelist_bulk_edit.strip_region_tags()
+
+    def _add_operation(self):
+        try:
+            self.operations.append(self._build_operation())
+        except (ValueError, re.error) as e:
+            messagebox.showerror("操作无效", str(e), parent=self)
+            return
+        self.operations_label.configure(
+            text="已添加的操作:\n" + "\n".join(f"{i}. {op.label}" for i, op in enumerate(self.operations, start=1)))
+        self._invalidate_preview()
+
+    def _clear_operations(self):
+        self.operations.clear()
+        self.operations_label.configure(text="已添加的操作: (无，预览时使用上面的设置)")
+        self._invalidate_preview()
+
+    def _invalidate_preview(self):
+        self.preview = None
+        self.apply_btn.configure(state="disabled")
+
+    def _show_preview_text(self, text: str):
+        self.preview_textbox.configure(state="normal")
+        self.preview_textbox.delete("1.0", "end")
+        self.preview_textbox.insert("1.0", text)
+        self.preview_textbox.configure(state="disabled")
+
+    def _run_preview(self):
+        try:
+            operations = self.operations or [self._build_operation()]
+            started = time.perf_counter()
+            preview = gamelist_bulk_edit.compute_bulk_edit(self.scopes[self.scope_var.get()], operations)
+        except (ValueError, re.error) as e:
+            messagebox.showerror("操作无效", str(e), parent=self)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.preview = preview
+        self.summary_label.configure(
+            text=f"{preview.record_count} 个条目中 {preview.affected_records} 个将被修改，"
+                 f"共 {len(preview.changes)} 处 ({elapsed_ms:.0f} ms)")
+        self._show_preview_text("\n".join(preview.format_lines(BULK_PREVIEW_MAX_LINES)) or "没有需要修改的条目。")
+        self.apply_btn.configure(state="normal" if preview.changes else "disabled")
+
+    def _apply(self):
+        if self.preview is None:
+            return
+        preview = self.preview
+        self.grab_release()
+        self.destroy()
+        self.apply_callback(preview)
+
 class LocalConfigLoader:
     CONFIG_DIR_NAME = "config"
     CONFIG_FILE_NAME = "esde_toolkit_config.json"
+    # 本页面自己的选项 (基础设置保存时只写入已知的路径字段，不能放在主配置文件里)
+    EDITOR_SETTINGS_FILE_NAME = "gamelist_editor_settings.json"
 
     def __init__(self):
         # 使用 os.path.dirname(os.path.abspath(__file__))
         # 这种方式在打包环境中对__file__的解析通常比单纯的 Path(__file__).parent 更可靠
         base_path = Path(os.path.dirname(os.path.abspath(__file__)))
         self.config_path: Path = base_path / self.CONFIG_DIR_NAME / self.CONFIG_FILE_NAME
+        self.editor_settings_path: Path = base_path / self.CONFIG_DIR_NAME / self.EDITOR_SETTINGS_FILE_NAME
         
         self.gamelist_base_dir: Path = Path('.').resolve()
         self.esde_root_path: Path = Path('.').resolve()
@@ -208,6 +371,21 @@ class LocalConfigLoader:
             
         except Exception:
             pass
+
+    def load_editor_settings(self) -> Dict[str, Any]:
+        try:
+            with open(self.editor_settings_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_editor_settings(self, settings: Dict[str, Any]):
+        try:
+            self.editor_settings_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.editor_settings_path, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            print(f"警告: 保存游戏列表编辑器设置失败: {e}", file=sys.stderr)
         
 class GamelistEditorPlugin(ctk.CTkFrame): 
 
@@ -216,8 +394,10 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         self.app_ref = app_ref
         
         local_config = LocalConfigLoader()
+        self.local_config = local_config
         self.gamelist_base_dir: Path = local_config.gamelist_base_dir
         self.esde_root_dir: Path = local_config.esde_root_path
+        self.editor_settings: Dict[str, Any] = local_config.load_editor_settings()
         
         self.available_lists: Dict[str, Path] = {}
         self.selected_system_name_var = ctk.StringVar(value="(未加载列表)")
@@ -225,13 +405,43 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         
         self.is_system_selected = False 
         self.system_name = "未选择/自动加载"
+        self.library_scan = get_library_scan_service()
+        self.library_scan.add_listener(lambda name, summary: self.after(10, self._refresh_system_menu_labels))
+        # 最近一次由本页面加载/保存时 gamelist.xml 的 mtime，用于区分外部修改
+        self.gamelist_mtime_ns: Optional[int] = None
+        get_fs_watcher().add_listener(
+            lambda key, root, events: self.after(10, lambda: self._on_fs_events(key, root, events)))
         self.system_rom_path = "N/A"
             
         self.xml_tree: Optional[ET.ElementTree] = None
         self.gamelist_path: Optional[Path] = None
-        self.games_data: Dict[str, ET.Element] = {} 
-        self.current_game_element: Optional[ET.Element] = None
+        # 与名称编辑器、媒体预览共享的文档；generation 记录本页面最后一次看到的修改计数
+        self.gamelist_repository = get_gamelist_repository()
+        self.gamelist_document: Optional[GamelistDocument] = None
+        self.gamelist_generation = 0
+        # 条目记录 (与名称编辑器共享)；列表的 key 为记录 id 的字符串
+        self.game_records: Optional[GameRecordIndex] = None
+        self.games_data: Dict[str, GameRecord] = {} 
+        # 上次加载/保存时各条目的名称，用于找出用户确认过的改名
+        self.saved_names: Dict[GameRecord, str] = {}
+        self.current_record: Optional[GameRecord] = None
+        # 列表的搜索索引 (按列表显示顺序) 和当前过滤结果；没有过滤条件时 filtered_records 为 None
+        self.search_index: Optional[GamelistSearchIndex] = None
+        self.filtered_records: Optional[List[GameRecord]] = None
+        self.list_filter_var = ctk.StringVar(value="")
+        self.list_filter_job: Optional[str] = None
+        # 后台加载 gamelist 的取消标志；开始新的加载时取消上一次
+        self.gamelist_load_cancel: Optional[threading.Event] = None
+        # 保存在后台写入线程中进行；进行中再次保存时记下，完成后补存一次
+        self.save_requested_again = False
+        self.last_saved_at: Optional[str] = None
+        self.autosave_var = ctk.BooleanVar(value=bool(self.editor_settings.get("autosave", False)))
+        self.autosave_job: Optional[str] = None
         self.is_updating_ui = False
+        # 尚未写入记录的字段修改 (属于 pending_edit_record)，由 _flush_field_edits 统一写入
+        self.pending_field_edits: Set[str] = set()
+        self.pending_edit_record: Optional[GameRecord] = None
+        self.edit_flush_job: Optional[str] = None
         self.es_settings_content: Optional[str] = None
         
         self.progress_dialog: Optional[CTkProgressDialog] = None
@@ -247,6 +457,19 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         self.game_genre_var = ctk.StringVar()
         self.game_players_var = ctk.StringVar()
         self.game_playcount_var = ctk.StringVar()
+        self.field_vars: Dict[str, ctk.StringVar] = {
+            'name': self.game_name_var,
+            'path': self.game_path_var,
+            'image': self.game_image_var,
+            'video': self.game_video_var,
+            'rating': self.game_rating_var,
+            'releasedate': self.game_releasedate_var,
+            'developer': self.game_developer_var,
+            'publisher': self.game_publisher_var,
+            'genre': self.game_genre_var,
+            'players': self.game_players_var,
+            'playcount': self.game_playcount_var,
+        }
         
         self.api_results_raw_data: Optional[Dict[str, Any]] = None 
         self.api_current_games_list: List[Dict[str, Any]] = [] 
@@ -304,6 +527,14 @@ class GamelistEditorPlugin(ctk.CTkFrame):
                                                      command=self.open_one_click_translate_dialog, 
                                                      fg_color="#E67E22")
         self.one_click_translate_btn.grid(row=0, column=4, padx=5, pady=5, sticky="e") 
+
+        self.autosave_checkbox = ctk.CTkCheckBox(selection_frame, text="自动保存", variable=self.autosave_var,
+                                                 command=self._on_autosave_toggled)
+        self.autosave_checkbox.grid(row=0, column=5, padx=5, pady=5, sticky="e")
+
+        # 保存状态 (不弹窗)：未保存 / 正在保存 / 已保存
+        self.save_status_label = ctk.CTkLabel(selection_frame, text="", width=120, anchor="w")
+        self.save_status_label.grid(row=0, column=6, padx=5, pady=5, sticky="w")
         
         main_frame = ctk.CTkFrame(self)
         main_frame.grid(row=2, column=0, sticky="nsew", padx=20, pady=(5, 20))
@@ -313,23 +544,31 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         
         list_frame = ctk.CTkFrame(main_frame)
         list_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 10), pady=0)
-        list_frame.rowconfigure(1, weight=1) 
+        list_frame.rowconfigure(2, weight=1) 
         list_frame.columnconfigure(0, weight=1)
 
         ctk.CTkLabel(list_frame, text="游戏列表 (勾选以批量操作)", font=ctk.CTkFont(weight="bold", size=15)).grid(row=0, column=0, columnspan=2, sticky="ew", pady=(5, 5))
+
+        self.list_filter_entry = ctk.CTkEntry(list_frame, textvariable=self.list_filter_var,
+                                              placeholder_text="搜索名称/路径，如 mario genre:rpg missing:image")
+        self.list_filter_entry.grid(row=1, column=0, columnspan=2, sticky="ew", padx=5, pady=(0, 5))
+        self.list_filter_var.trace_add("write", lambda n, i, m: self._on_list_filter_changed())
         
         self.game_list = CTkListFrame(list_frame, self, 'game', fg_color=LIST_FRAME_BG_COLOR)
-        self.game_list.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=5, pady=(0, 5))
+        self.game_list.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=5, pady=(0, 5))
 
         btn_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
-        btn_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=5, pady=(0, 5))
-        btn_frame.columnconfigure((0, 1), weight=1)
+        btn_frame.grid(row=3, column=0, columnspan=2, sticky="ew", padx=5, pady=(0, 5))
+        btn_frame.columnconfigure((0, 1, 2), weight=1)
         
         self.add_btn = ctk.CTkButton(btn_frame, text="新建游戏", command=self.add_game, fg_color="#3498DB")
         self.add_btn.grid(row=0, column=0, sticky="ew", padx=(0, 5))
         
         self.del_btn = ctk.CTkButton(btn_frame, text="删除游戏", command=self.del_game, fg_color="red") 
-        self.del_btn.grid(row=0, column=1, sticky="ew", padx=(5, 0))
+        self.del_btn.grid(row=0, column=1, sticky="ew", padx=5)
+
+        self.bulk_edit_btn = ctk.CTkButton(btn_frame, text="批量编辑", command=self.open_bulk_edit_dialog, fg_color="#27AE60")
+        self.bulk_edit_btn.grid(row=0, column=2, sticky="ew", padx=(5, 0))
 
         self.details_frame = ctk.CTkScrollableFrame(main_frame)
         self.details_frame.grid(row=0, column=1, sticky="nsew", padx=(10, 0), pady=0)
@@ -424,6 +663,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         
         self.desc_textbox = ctk.CTkTextbox(self.details_frame, height=150)
         self.desc_textbox.grid(row=row_idx, column=0, columnspan=3, sticky="ew", padx=5, pady=2) 
+        self.desc_textbox.bind("<KeyRelease>", self._on_desc_changed)
         self.desc_textbox.bind("<FocusOut>", self._on_desc_changed)
         row_idx += 1
         
@@ -435,17 +675,8 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         self._initial_load_settings() 
         self._set_controls_state("disabled")
         
-        self.game_name_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_path_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_image_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_video_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_rating_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_releasedate_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_developer_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_publisher_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_genre_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_players_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
-        self.game_playcount_var.trace_add("write", lambda n, i, m: self.after(50, self._do_update))
+        for tag, var in self.field_vars.items():
+            var.trace_add("write", lambda n, i, m, tag=tag: self._on_field_edited(tag))
 
 
     def _set_var_safe(self, var: ctk.StringVar, value: str):
@@ -455,59 +686,126 @@ class GamelistEditorPlugin(ctk.CTkFrame):
             self.is_updating_ui = False
             
     def _on_desc_changed(self, event):
-        if self.is_updating_ui or self.current_game_element is None:
+        self._on_field_edited('desc')
+
+    def _on_field_edited(self, tag: str):
+        """输入框被用户修改：只记下字段名，间隔结束、切换条目或保存时再写入记录。"""
+        if self.is_updating_ui or self.current_record is None:
             return
-        
-        new_text = self.desc_textbox.get("1.0", "end-1c").strip()
-        self._update_xml_tag(self.current_game_element, 'desc', new_text)
+        if self.pending_edit_record is not self.current_record:
+            self._flush_field_edits()
+            self.pending_edit_record = self.current_record
+        self.pending_field_edits.add(tag)
+        if self.edit_flush_job is None:
+            self.edit_flush_job = self.after(FIELD_EDIT_DEBOUNCE_MS, self._flush_field_edits)
+
+    def _field_value(self, tag: str) -> str:
+        if tag == 'desc':
+            return self.desc_textbox.get("1.0", "end-1c").strip()
+        return self.field_vars[tag].get()
+
+    def _flush_field_edits(self):
+        """把记下的字段修改写入记录，只写改动过的字段。必须在输入框切换到其他条目之前调用。"""
+        if self.edit_flush_job is not None:
+            self.after_cancel(self.edit_flush_job)
+            self.edit_flush_job = None
+        tags, self.pending_field_edits = self.pending_field_edits, set()
+        record, self.pending_edit_record = self.pending_edit_record, None
+        if record is None or not tags:
+            return
+        for tag in RECORD_FIELDS:
+            if tag in tags:
+                self._update_record_field(record, tag, self._field_value(tag))
 
-    def _do_update(self):
-        if self.is_updating_ui or self.current_game_element is None:
+    def _update_record_field(self, record: GameRecord, tag: str, value: str):
+        """修改只写入条目记录，保存前才写回 XML；名称和路径的变化会通知其他插件刷新列表。"""
+        if self.game_records is None or not self.game_records.set(record, tag, value):
             return
-            
-        updates = {
-            'name': self.game_name_var.get(),
-            'path': self.game_path_var.get(),
-            'image': self.game_image_var.get(),
-            'video': self.game_video_var.get(),
-            'rating': self.game_rating_var.get(),
-            'releasedate': self.game_releasedate_var.get(),
-            'developer': self.game_developer_var.get(),
-            'publisher': self.game_publisher_var.get(),
-            'genre': self.game_genre_var.get(),
-            'players': self.game_players_var.get(),
-            'playcount': self.game_playcount_var.get(),
-        }
-        
-        for tag, value in updates.items():
-            self._update_xml_tag(self.current_game_element, tag, value)
-            
-        new_name = self.game_name_var.get()
-        if new_name and self.current_game_element in self.games_data.values():
-            old_key = next((k for k, v in self.games_data.items() if v == self.current_game_element), None)
-            
-            if old_key and old_key != new_name:
-                pass
-            
-    def _update_xml_tag(self, element: ET.Element, tag: str, value: str):
-        child = element.find(tag)
-        clean_value = value.strip() if value is not None else ""
-        
-        if clean_value:
-            if child is None:
-                new_child = ET.SubElement(element, tag)
-                new_child.text = clean_value
-            else:
-                child.text = clean_value
+        if tag in LIST_FIELDS and self.search_index is not None:
+            self.search_index.update_record(record)
+        if self.gamelist_document is not None:
+            self.gamelist_generation = self.gamelist_document.generation
+            try:
+                journal_for(self.gamelist_document).record_fields(record.element, {tag: record.get(tag)})
+            except OSError as e:
+                print(f"警告: 写入编辑日志失败: {e}", file=sys.stderr)
+        self.after(10, self._on_unsaved_change)
+
+    def _mark_document_dirty(self, element: Optional[ET.Element] = None):
+        if self.gamelist_document is not None:
+            self.gamelist_document.mark_dirty(element)
+            self._journal_change(element)
+
+    def _mark_document_modified(self, element: Optional[ET.Element] = None, removed: Tuple[ET.Element, ...] = ()):
+        if self.gamelist_document is not None:
+            self.gamelist_document.mark_modified(element)
+            self.gamelist_generation = self.gamelist_document.generation
+            self._journal_change(element, removed)
+
+    def _journal_change(self, element: Optional[ET.Element], removed: Tuple[ET.Element, ...] = ()):
+        """修改写入树后立即记入编辑日志，然后回到主线程更新保存状态 (批量翻译在后台线程中修改)。"""
+        journal = journal_for(self.gamelist_document)
+        try:
+            if element is not None:
+                journal.record_put(element)
+            for elem in removed:
+                journal.record_remove(elem)
+        except OSError as e:
+            print(f"警告: 写入编辑日志失败: {e}", file=sys.stderr)
+        self.after(10, self._on_unsaved_change)
+
+    def _on_unsaved_change(self):
+        self._update_save_status()
+        if self.autosave_var.get() and self.gamelist_document is not None and self.gamelist_document.dirty:
+            if self.autosave_job is not None:
+                self.after_cancel(self.autosave_job)
+            self.autosave_job = self.after(AUTOSAVE_DELAY_MS, self._run_autosave)
+
+    def _cancel_autosave(self):
+        if self.autosave_job is not None:
+            self.after_cancel(self.autosave_job)
+            self.autosave_job = None
+
+    def _run_autosave(self):
+        self.autosave_job = None
+        self.save_gamelist(autosave=True)
+
+    def _flush_autosave(self):
+        """离开当前列表前：有等待中的自动保存时立即开始保存。"""
+        if self.autosave_job is not None:
+            self._cancel_autosave()
+            self.save_gamelist(autosave=True)
+
+    def _on_autosave_toggled(self):
+        self.editor_settings["autosave"] = bool(self.autosave_var.get())
+        self.local_config.save_editor_settings(self.editor_settings)
+        if self.autosave_var.get():
+            self._on_unsaved_change()
+        else:
+            self._cancel_autosave()
+
+    def _update_save_status(self, error: bool = False):
+        document = self.gamelist_document
+        if error:
+            text, color = "保存失败", SAVE_STATUS_ERROR_COLOR
+        elif document is None:
+            text, color = "", SAVE_STATUS_CLEAN_COLOR
+        elif self.gamelist_repository.is_saving(document.path):
+            text, color = "正在保存...", SAVE_STATUS_DIRTY_COLOR
+        elif document.dirty:
+            text, color = "● 未保存", SAVE_STATUS_DIRTY_COLOR
+        elif self.last_saved_at:
+            text, color = f"已保存 {self.last_saved_at}", SAVE_STATUS_CLEAN_COLOR
         else:
-            if child is not None:
-                element.remove(child)
+            text, color = "无修改", SAVE_STATUS_CLEAN_COLOR
+        self.save_status_label.configure(text=text, text_color=color)
 
     def _set_controls_state(self, state: str):
         self.save_btn.configure(state=state)
         self.one_click_translate_btn.configure(state=state) 
         self.del_btn.configure(state=state)
         self.add_btn.configure(state=state)
+        self.bulk_edit_btn.configure(state=state)
         
         self.scrape_button.configure(state=state)
         self.search_query_entry.configure(state=state)
@@ -516,7 +814,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         for entry in self.detail_entries:
             entry.configure(state=state)
 
-        if self.current_game_element or state == "normal":
+        if self.current_record or state == "normal":
             self.desc_textbox.configure(state="normal")
         else:
             self.desc_textbox.configure(state="disabled")
@@ -531,9 +829,9 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         system_names = sorted(self.available_lists.keys())
         
         if system_names:
-            self.list_select_menu.configure(values=system_names)
+            self.list_select_menu.configure(values=[self.library_scan.label(name) for name in system_names])
             first_system = system_names[0]
-            self.selected_system_name_var.set(first_system)
+            self.selected_system_name_var.set(self.library_scan.label(first_system))
             self._on_list_selected_by_dropdown(first_system)
         else:
             self.selected_system_name_var.set("(未找到 gamelist.xml)")
@@ -551,7 +849,16 @@ class GamelistEditorPlugin(ctk.CTkFrame):
                     lists[system_dir.name] = gamelist_path
         return lists
 
+    def _refresh_system_menu_labels(self):
+        system_names = sorted(self.available_lists.keys())
+        if not system_names:
+            return
+        self.list_select_menu.configure(values=[self.library_scan.label(name) for name in system_names])
+        if self.is_system_selected and self.system_name in self.available_lists:
+            self.selected_system_name_var.set(self.library_scan.label(self.system_name))
+
     def _on_list_selected_by_dropdown(self, selected_system_name: str):
+        selected_system_name = system_from_label(selected_system_name)
         if selected_system_name.startswith("(") or selected_system_name == "未选择/自动加载":
             self.is_system_selected = False
             self.game_list.update_list({})
@@ -588,118 +895,161 @@ class GamelistEditorPlugin(ctk.CTkFrame):
             self.is_system_selected = True
             self._set_controls_state("normal")
     
-    def _load_gamelist(self, path: Path):
+    def _load_gamelist(self, path: Path, on_loaded: Optional[Callable[[], None]] = None):
+        """从共享仓库取得 gamelist 文档：已缓存时直接填充列表，否则在后台解析，完成后回到主线程并调用 on_loaded。"""
+        self._flush_field_edits()
+        self._flush_autosave()
         self.gamelist_path = path
+        self.xml_tree = None
+        self.gamelist_document = None
+        self.game_records = None
         self.games_data = {}
-        self.current_game_element = None
+        self.search_index = None
+        self.filtered_records = None
+        self.current_record = None
         self._clear_details()
-        
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
-            xml_content = xml_content.lstrip('\ufeff')
-            
-            self.xml_tree = ET.ElementTree(ET.fromstring(xml_content))
-            root = self.xml_tree.getroot()
+        self.game_list.update_list({})
+        self.last_saved_at = None
+        self._update_save_status()
 
-            if root.find("path") is not None:
-                self.system_rom_path = root.find("path").text.strip()
-            else:
-                self.system_rom_path = "N/A"
-            self.rom_path_label.configure(text=f"系统 ROM 路径 (Path Tag): {self.system_rom_path}")
+        if self.gamelist_load_cancel is not None:
+            self.gamelist_load_cancel.set()
+        cancel = threading.Event()
+        self.gamelist_load_cancel = cancel
 
+        document = self.gamelist_repository.peek(path)
+        if document is not None:
+            self._on_gamelist_loaded(document, cancel, on_loaded)
+            return
+        self.rom_path_label.configure(text=f"正在加载 {path.parent.name}/{path.name}...")
 
-            for elem in root.findall('./game') + root.findall('./folder'):
-                path_tag = elem.find('path')
-                key = path_tag.text.strip() if path_tag is not None and path_tag.text else elem.findtext('name', 'Unknown')
-                
-                original_key = key
-                count = 1
-                while key in self.games_data:
-                    key = f"{original_key}_{count}"
-                    count += 1
-                
-                self.games_data[key] = elem
-            
-            display_data = {
-                key: elem.findtext('name', key) 
-                for key, elem in self.games_data.items()
-            }
-            self.game_list.update_list(display_data)
+        def report_progress(done: int, read_bytes: int, total_bytes: int):
+            percent = read_bytes * 100 // total_bytes if total_bytes else 100
+            self.after(10, lambda: cancel.is_set() or self.rom_path_label.configure(
+                text=f"正在加载 {path.parent.name}/{path.name}: {done} 个条目 ({percent}%)"))
 
-        except ET.ParseError as e:
-            messagebox.showerror("XML 解析错误", f"无法解析 {path.name}: {e}")
-            self.game_list.update_list({})
-        except Exception as e:
-            messagebox.showerror("加载错误", f"加载 {path.name} 时发生错误: {e}")
-            self.game_list.update_list({})
+        def worker():
+            try:
+                document = self.gamelist_repository.get(path, progress=report_progress, cancel=cancel)
+            except GamelistLoadCancelled:
+                return
+            except Exception as e:
+                self.after(10, lambda err=e: self._on_gamelist_load_failed(path, err, cancel))
+                return
+            self.after(10, lambda: self._on_gamelist_loaded(document, cancel, on_loaded))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_gamelist_loaded(self, document: GamelistDocument, cancel: threading.Event,
+                            on_loaded: Optional[Callable[[], None]]):
+        # 共享文档的 path 是首次加载它的插件传入的路径，不一定与本页面的写法相同，只按取消标志判断
+        if cancel.is_set():
+            return
+        self.gamelist_load_cancel = None
+        self.gamelist_document = document
+        self.gamelist_generation = document.generation
+        self.xml_tree = document.tree
+        self.system_rom_path = document.root_path_text or "N/A"
+        self.rom_path_label.configure(text=f"系统 ROM 路径 (Path Tag): {self.system_rom_path}")
+        self.game_records = records_for(document)
+        self._populate_game_list()
+        # 共享文档中可能有尚未保存的改名，已记录过的条目保留原来的基准名称
+        self.saved_names = {record: self.saved_names.get(record, record.name) for record in self.games_data.values()}
+        self.gamelist_mtime_ns = document.mtime_ns
+        self._update_save_status()
+        if on_loaded:
+            on_loaded()
+
+    def _on_gamelist_load_failed(self, path: Path, error: Exception, cancel: threading.Event):
+        if cancel.is_set() or path != self.gamelist_path:
+            return
+        self.gamelist_load_cancel = None
+        self.rom_path_label.configure(text="系统 ROM 路径 (Path Tag): N/A")
+        if isinstance(error, xml_backend.PARSE_ERRORS):
+            messagebox.showerror("XML 解析错误", f"无法解析 {path.name}: {error}")
+        else:
+            messagebox.showerror("加载错误", f"加载 {path.name} 时发生错误: {error}")
+        self.game_list.update_list({})
             
+    def _populate_game_list(self, reselect_key: Optional[str] = None):
+        """按记录重建列表：key 为记录 id，按路径 (没有路径时按名称) 排序显示，只显示符合过滤条件的条目。"""
+        records = self.game_records.records if self.game_records is not None else []
+        ordered = sorted(records, key=lambda record: record.path.strip() or record.name or 'Unknown')
+        self.games_data = {str(record.id): record for record in ordered}
+        # 搜索索引的 n-gram 倒排表在后台建立，建好之前的查询逐条比较
+        index = GamelistSearchIndex(ordered)
+        self.search_index = index
+        threading.Thread(target=index.build_ngrams, daemon=True).start()
+        self._filter_game_list()
+        self._show_game_list(reselect_key)
+
+    def _filter_game_list(self):
+        query = self.list_filter_var.get() or ""
+        if self.search_index is None or not query.strip():
+            self.filtered_records = None
+        else:
+            self.filtered_records = self.search_index.search(query)
+
+    def _show_game_list(self, reselect_key: Optional[str] = None):
+        records = self.filtered_records if self.filtered_records is not None else self.games_data.values()
+        display_data = {str(record.id): record.name or str(record.id) for record in records}
+        self.game_list.update_list(display_data, reselect_key=reselect_key)
+
+    def _on_list_filter_changed(self):
+        # 每次按键都在索引上过滤 (增量缩小结果)，列表控件停止输入后再重建
+        self._filter_game_list()
+        if self.list_filter_job is not None:
+            self.after_cancel(self.list_filter_job)
+        self.list_filter_job = self.after(LIST_FILTER_DEBOUNCE_MS, self._apply_list_filter)
+
+    def _apply_list_filter(self):
+        self.list_filter_job = None
+        self._show_game_list(reselect_key=self.game_list.selected_key)
+
     def _refresh_gamelist(self, reselect_key: Optional[str] = None):
-        if self.xml_tree is None:
+        if self.game_records is None:
              return
-             
-        new_games_data = {}
-        try:
-            root = self.xml_tree.getroot()
-            
-            for elem in root.findall('./game') + root.findall('./folder'):
-                path_tag = elem.find('path')
-                key = path_tag.text.strip() if path_tag is not None and path_tag.text else elem.findtext('name', 'Unknown')
-                original_key = key
-                count = 1
-                while key in new_games_data:
-                    key = f"{original_key}_{count}"
-                    count += 1
-                new_games_data[key] = elem
-                
-            self.games_data = new_games_data 
-            
-            display_data = {
-                key: elem.findtext('name', key) 
-                for key, elem in self.games_data.items()
-            }
-            self.game_list.update_list(display_data, reselect_key=reselect_key)
-
-        except Exception as e:
-            messagebox.showwarning("刷新警告", f"刷新游戏列表时发生错误: {e}")
+        self._populate_game_list(reselect_key)
             
     def listbox_selected(self, key: str, list_id: str):
         if list_id == 'game':
-            elem = self.games_data.get(key)
-            self._load_details_from_selection(elem)
+            record = self.games_data.get(key)
+            self._load_details_from_selection(record)
             
-    def _load_details_from_selection(self, elem: ET.Element):
-        self.current_game_element = elem
+    def _load_details_from_selection(self, record: Optional[GameRecord]):
+        self._flush_field_edits()
+        self.current_record = record
         self._set_controls_state("normal")
         
-        if elem is not None:
+        if record is not None:
             
-            self._set_var_safe(self.game_name_var, elem.findtext('name', ''))
-            self._set_var_safe(self.game_path_var, elem.findtext('path', ''))
-            self._set_var_safe(self.game_image_var, elem.findtext('image', ''))
-            self._set_var_safe(self.game_video_var, elem.findtext('video', ''))
-            self._set_var_safe(self.game_rating_var, elem.findtext('rating', ''))
-            self._set_var_safe(self.game_releasedate_var, elem.findtext('releasedate', ''))
-            self._set_var_safe(self.game_developer_var, elem.findtext('developer', ''))
-            self._set_var_safe(self.game_publisher_var, elem.findtext('publisher', ''))
-            self._set_var_safe(self.game_genre_var, elem.findtext('genre', ''))
-            self._set_var_safe(self.game_players_var, elem.findtext('players', ''))
-            self._set_var_safe(self.game_playcount_var, elem.findtext('playcount', ''))
+            self._set_var_safe(self.game_name_var, record.name)
+            self._set_var_safe(self.game_path_var, record.path)
+            self._set_var_safe(self.game_image_var, record.image)
+            self._set_var_safe(self.game_video_var, record.video)
+            self._set_var_safe(self.game_rating_var, record.rating)
+            self._set_var_safe(self.game_releasedate_var, record.releasedate)
+            self._set_var_safe(self.game_developer_var, record.developer)
+            self._set_var_safe(self.game_publisher_var, record.publisher)
+            self._set_var_safe(self.game_genre_var, record.genre)
+            self._set_var_safe(self.game_players_var, record.players)
+            self._set_var_safe(self.game_playcount_var, record.playcount)
             
-            desc_text = elem.findtext('desc', '').strip()
+            desc_text = record.desc.strip()
             self.is_updating_ui = True
             self.desc_textbox.configure(state="normal")
             self.desc_textbox.delete("1.0", "end")
             self.desc_textbox.insert("1.0", desc_text)
             self.is_updating_ui = False
             
-            game_name = elem.findtext('name', '').strip()
+            game_name = record.name.strip()
             cleaned_name = self._clean_game_name(game_name)
             self.search_query_var.set(cleaned_name)
             self._clear_api_results()
 
     def _clear_details(self):
-        self.current_game_element = None
+        self._flush_field_edits()
+        self.current_record = None
         self._set_var_safe(self.game_name_var, "")
         self._set_var_safe(self.game_path_var, "")
         self._set_var_safe(self.game_image_var, "")
@@ -722,22 +1072,165 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         self._clear_api_results()
         self._set_controls_state("disabled")
         
-    def save_gamelist(self):
-        if self.xml_tree is None or self.gamelist_path is None:
-            messagebox.showwarning("保存警告", "未加载有效的游戏列表。")
+    def save_gamelist(self, autosave: bool = False, force: bool = False, full: bool = False):
+        """在后台写入线程保存，结果显示在保存状态中；autosave 为 True 时不弹出提示。
+
+        文件在加载后被外部修改时，手动保存询问是否覆盖 (force)，自动保存直接放弃。
+        """
+        if self.gamelist_document is None or self.gamelist_path is None:
+            if not autosave:
+                messagebox.showwarning("保存警告", "未加载有效的游戏列表。")
+            return
+        self._cancel_autosave()
+        self._flush_field_edits()
+
+        document = self.gamelist_document
+        if self.gamelist_repository.is_saving(document.path):
+            self.save_requested_again = True
             return
-            
         try:
-            self._on_desc_changed(None)
-            self._do_update()
-            
-            self.xml_tree.write(self.gamelist_path, encoding='utf-8', xml_declaration=True)
-            messagebox.showinfo("保存成功", "游戏列表已保存成功！")
+            # 没有修改时不重写文件
+            queued = self.gamelist_repository.save_document_async(
+                document,
+                lambda mode, error: self.after(10, lambda: self._on_save_finished(document, mode, error, autosave)),
+                force=force, full=full)
+        except GamelistChangedError:
+            self._update_save_status(error=True)
+            if not autosave and messagebox.askyesno(
+                    "文件已变化", f"{document.path.parent.name}/gamelist.xml 在加载后已被外部程序修改。\n"
+                                  f"是否用当前列表覆盖？(外部程序的修改将丢失)"):
+                self.save_gamelist(force=True, full=full)
+            return
         except Exception as e:
+            self._update_save_status(error=True)
             messagebox.showerror("保存失败", f"保存 gamelist.xml 时发生错误: {e}")
+            return
+        if queued:
+            self._record_confirmed_names()
+        self._update_save_status()
+
+    def _on_save_finished(self, document: GamelistDocument, mode: Optional[str], error: Optional[BaseException],
+                          autosave: bool):
+        if mode == SAVE_MODE_REPLAN:
+            # 计划之后源文件无法局部保存，回到界面线程完整序列化后重新保存；已离开该列表时保留未保存标记
+            if document is self.gamelist_document:
+                self.save_gamelist(autosave=autosave, full=True)
+            else:
+                self.save_requested_again = False
+                self._update_save_status()
+            return
+        if error is not None:
+            self._update_save_status(error=True)
+            messagebox.showerror("保存失败", f"保存 {document.path.parent.name}/gamelist.xml 时发生错误: {error}")
+            self.save_requested_again = False
+            return
+        try:
+            # 已写入磁盘的修改从日志中去掉，只保留保存期间新的修改
+            journal_for(document).rewrite()
+        except OSError as e:
+            print(f"警告: 重写编辑日志失败: {e}", file=sys.stderr)
+        if document is self.gamelist_document:
+            self.gamelist_mtime_ns = document.mtime_ns
+            self.last_saved_at = time.strftime("%H:%M:%S")
+            self._update_save_status()
+        if self.save_requested_again:
+            self.save_requested_again = False
+            self.save_gamelist(autosave=True)
+        elif document is self.gamelist_document and document.dirty:
+            self._on_unsaved_change()
+
+    def _gamelist_mtime_ns(self) -> Optional[int]:
+        try:
+            return self.gamelist_path.stat().st_mtime_ns if self.gamelist_path else None
+        except OSError:
+            return None
+
+    def _on_fs_events(self, root_key: str, root: Path, events: List[FsEvent]):
+        if root_key != ROOT_GAMELISTS:
+            return
+        changed_systems = {event.relative_parts(root)[0] for event in events
+                           if event.path.name == "gamelist.xml" and event.relative_parts(root)}
+        if not changed_systems:
+            return
+
+        # gamelist.xml 新增/删除时更新下拉框中的可选系统
+        if any(event.kind != "modified" for event in events if event.path.name == "gamelist.xml"):
+            self.available_lists = self._find_available_gamelists()
+            self._refresh_system_menu_labels()
+
+        current_mtime_ns = self._gamelist_mtime_ns()
+        if (self.gamelist_path is None or self.gamelist_path.parent.name not in changed_systems
+                or current_mtime_ns in (None, self.gamelist_mtime_ns)):
+            return
+        # 本页面的后台保存尚未完成，完成后会更新 gamelist_mtime_ns
+        if self.gamelist_repository.is_saving(self.gamelist_path):
+            return
+        # 其他插件保存了同一份共享文档，内容与本页面一致
+        if self.gamelist_document is not None and current_mtime_ns == self.gamelist_document.mtime_ns:
+            self.gamelist_mtime_ns = current_mtime_ns
+            return
+        self.gamelist_mtime_ns = self._gamelist_mtime_ns()
+        # 页面不可见时无需提示，切换回来时会重新加载
+        if self.winfo_ismapped() and messagebox.askyesno(
+                "文件已变化", f"{self.gamelist_path.parent.name}/gamelist.xml 已被外部程序修改。\n"
+                              f"是否重新加载？(当前未保存的修改将丢失)"):
+            if self.gamelist_document is not None:
+                self._cancel_autosave()
+                journal_for(self.gamelist_document).discard()
+            self._reload_keeping_selection()
+
+    def _reload_keeping_selection(self):
+        # 重新加载后记录 id 会变化，按路径找回原来选中的条目
+        selected = self.games_data.get(self.game_list.selected_key) if self.game_list.selected_key else None
+        reselect_path = selected.path if selected is not None else None
+
+        def reselect():
+            reselect_key = next((key for key, record in self.games_data.items() if record.path == reselect_path), None)
+            if reselect_path and reselect_key is not None:
+                self._refresh_gamelist(reselect_key=reselect_key)
+                self.listbox_selected(reselect_key, 'game')
+        self._load_gamelist(self.gamelist_path, on_loaded=reselect)
+
+    def _record_confirmed_names(self):
+        """把本次保存中被修改过的名称写入本地覆盖库，之后数据库命名不会再覆盖它们。"""
+        confirmed = []
+        for record in self.games_data.values():
+            name = record.name.strip()
+            old_name = self.saved_names.get(record)
+            rom_path = record.path.strip()
+            if old_name is not None and name and name != old_name.strip() and rom_path:
+                confirmed.append((rom_path, name))
+        self.saved_names = {record: record.name for record in self.games_data.values()}
+
+        if not confirmed:
+            return
+        # 需要时计算 ROM 哈希，在后台线程中进行
+        threading.Thread(target=self._store_confirmed_names,
+                         args=(self.gamelist_path.parent.name, confirmed), daemon=True).start()
+
+    @staticmethod
+    def _store_confirmed_names(system_name: str, confirmed: List[Tuple[str, str]]):
+        """按文件名和哈希记录确认的名称：哈希键在 ROM 改名或移动后仍然有效。
+
+        名称编辑器查询时算过的哈希直接使用，否则读取 ROM 文件计算 (找不到文件时只按文件名记录)。
+        """
+        rom_root = load_library_settings().rom_root
+        system_path = rom_root / system_name if rom_root else None
+        entries = []
+        for path_text, name in confirmed:
+            relative = relative_rom_path(path_text, system_path)
+            rom_path = system_path / relative if system_path is not None and relative else Path(path_text)
+            hashes = None
+            if rom_path.is_absolute() and rom_path.is_file():
+                hashes = recall_rom_hashes(rom_path) or calculate_rom_hashes(rom_path, skip_nes_header=True)
+            entries.append((Path(path_text).name, name, hashes))
+        try:
+            UserOverrideStore().record_names(system_name, entries)
+        except Exception as e:
+            print(f"警告: 写入本地名称覆盖库失败: {e}", file=sys.stderr)
 
     def add_game(self):
-        if self.xml_tree is None:
+        if self.game_records is None:
             messagebox.showwarning("警告", "请先加载一个游戏列表。")
             return
 
@@ -745,20 +1238,16 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         if not new_name:
             return
 
-        new_key = new_name
-        count = 1
-        while new_key in self.games_data:
-            new_key = f"{new_name}_{count}"
-            count += 1
-            
         root = self.xml_tree.getroot()
-        new_elem = ET.SubElement(root, 'game')
+        new_elem = xml_backend.SubElement(root, 'game')
         
-        ET.SubElement(new_elem, 'path').text = f"./{new_key}.zip"
-        ET.SubElement(new_elem, 'name').text = new_name
+        xml_backend.SubElement(new_elem, 'path').text = f"./{new_name}.zip"
+        xml_backend.SubElement(new_elem, 'name').text = new_name
+        self._mark_document_modified(new_elem)
         
-        self.games_data[new_key] = new_elem
-        self.current_game_element = new_elem
+        record = self.game_records.record_for(new_elem)
+        new_key = str(record.id)
+        self.current_record = record
         
         self._refresh_gamelist(reselect_key=new_key)
         self.listbox_selected(new_key, 'game') 
@@ -773,15 +1262,19 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         if not messagebox.askyesno("确认删除", f"确定要从 XML 中删除选中的 {len(checked_keys)} 个条目吗？(操作不可逆)"):
             return
             
+        self._flush_field_edits()
         root = self.xml_tree.getroot()
+        removed = []
         
         for key in checked_keys:
-            elem = self.games_data.get(key)
-            if elem is not None and root is not None:
-                root.remove(elem)
+            record = self.games_data.get(key)
+            if record is not None and root is not None:
+                root.remove(record.element)
+                removed.append(record.element)
                 del self.games_data[key]
-                if self.current_game_element == elem:
-                    self.current_game_element = None
+                if self.current_record is record:
+                    self.current_record = None
+        self._mark_document_modified(removed=tuple(removed))
                     
         self._refresh_gamelist()
         self._clear_details()
@@ -790,7 +1283,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         if not TRANSLATOR_AVAILABLE:
             messagebox.showerror("错误", "请先安装翻译库：pip install deep-translator")
             return
-        if not self.current_game_element:
+        if not self.current_record:
             messagebox.showwarning("警告", "请先选择一个游戏条目。")
             return
             
@@ -810,7 +1303,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         if not TRANSLATOR_AVAILABLE:
             messagebox.showerror("错误", "请先安装翻译库：pip install deep-translator")
             return
-        if not self.current_game_element:
+        if not self.current_record:
             messagebox.showwarning("警告", "请先选择一个游戏条目。")
             return
             
@@ -837,6 +1330,46 @@ class GamelistEditorPlugin(ctk.CTkFrame):
             self.is_updating_ui = False
             self._on_desc_changed(None) 
 
+    def open_bulk_edit_dialog(self):
+        if self.game_records is None or not self.games_data:
+            messagebox.showwarning("警告", "列表为空，无法进行批量编辑。")
+            return
+        self._flush_field_edits()
+        checked = [self.games_data[key] for key in self.game_list.get_checked_keys() if key in self.games_data]
+        scopes: Dict[str, List[GameRecord]] = {}
+        if checked:
+            scopes[f"勾选的条目 ({len(checked)})"] = checked
+        if self.filtered_records is not None:
+            scopes[f"筛选结果 ({len(self.filtered_records)})"] = list(self.filtered_records)
+        scopes[f"列表中的全部条目 ({len(self.games_data)})"] = list(self.games_data.values())
+        BulkEditDialog(self, scopes, self._apply_bulk_edit)
+
+    def _apply_bulk_edit(self, preview: BulkEditPreview):
+        document = self.gamelist_document
+        if self.game_records is None or document is None:
+            return
+        self._flush_field_edits()
+        applied, skipped = gamelist_bulk_edit.apply_bulk_edit(self.game_records, preview)
+        self.gamelist_generation = document.generation
+        if not applied:
+            messagebox.showinfo("批量编辑", "没有写入任何修改 (条目在预览后已被修改)。")
+            return
+        try:
+            # 一次重写日志，不逐条追加
+            journal_for(document).rewrite()
+        except OSError as e:
+            print(f"警告: 重写编辑日志失败: {e}", file=sys.stderr)
+        reselect_key = self.game_list.selected_key
+        if any(field in ('name', 'path') for _, field, _, _ in preview.changes):
+            self._refresh_gamelist(reselect_key=reselect_key)
+        if self.current_record is not None:
+            self._load_details_from_selection(self.current_record)
+        self._on_unsaved_change()
+        message = f"已修改 {applied} 处。"
+        if skipped:
+            message += f"\n{skipped} 处在预览后已被修改，已跳过。"
+        messagebox.showinfo("批量编辑完成", message)
+
     def open_one_click_translate_dialog(self):
         if not TRANSLATOR_AVAILABLE:
             messagebox.showerror("错误", "请先安装翻译库：pip install deep-translator")
@@ -848,6 +1381,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         OneClickTranslateDialog(self, self._start_mass_translate_thread)
         
     def _start_mass_translate_thread(self, field: str):
+        self._flush_field_edits()
         target_keys = list(self.games_data.keys())
         total = len(target_keys)
         
@@ -864,19 +1398,19 @@ class GamelistEditorPlugin(ctk.CTkFrame):
             translator = GoogleTranslator(source='auto', target='zh-CN')
             
             for i, key in enumerate(keys):
-                elem = self.games_data.get(key)
-                if elem is None:
+                record = self.games_data.get(key)
+                if record is None:
                     continue
                     
-                original_text = elem.findtext(field, '').strip()
+                original_text = record.get(field).strip()
                 if not original_text:
                     continue
                     
                 translated_text = translator.translate(original_text)
-                self._update_xml_tag(elem, field, translated_text)
+                self._update_record_field(record, field, translated_text)
                 count += 1
                 
-                game_name_for_display = elem.findtext('name', key) 
+                game_name_for_display = record.name or key
                 self.after(10, lambda i=i, name=game_name_for_display: self.progress_dialog.update_progress(i + 1, f"正在翻译 {field}: {name}"))
                 time.sleep(0.05) 
 
@@ -890,13 +1424,13 @@ class GamelistEditorPlugin(ctk.CTkFrame):
                  
         if field == 'name':
              self._refresh_gamelist(reselect_key=reselect_key)
-             self.current_game_element = self.games_data.get(reselect_key) if reselect_key else None
+             self.current_record = self.games_data.get(reselect_key) if reselect_key else None
              self._clear_details()
-             if self.current_game_element:
-                 self._load_details_from_selection(self.current_game_element)
+             if self.current_record:
+                 self._load_details_from_selection(self.current_record)
         
         elif field == 'desc':
-            if self.current_game_element and reselect_key in self.games_data:
+            if self.current_record and reselect_key in self.games_data:
                  self._load_details_from_selection(self.games_data[reselect_key])
             
         
@@ -907,8 +1441,8 @@ class GamelistEditorPlugin(ctk.CTkFrame):
     def _clean_game_name(self, game_name: str) -> str:
         if not game_name:
             return ""
-        cleaned_name = re.sub(r'\[.*?\]', '', game_name).strip()
-        cleaned_name = re.sub(r'\s*\([^)]*\)$', '', cleaned_name).strip()
+        # 地区/版本标记的规则与批量编辑相同
+        cleaned_name = gamelist_bulk_edit.strip_name_tags(game_name)
         cleaned_name = cleaned_name.replace(' - ', ' ').replace(' / ', ' ')
         return cleaned_name.strip() if cleaned_name else game_name
 
@@ -951,7 +1485,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
 
 
     def _handle_scrape_button_click(self):
-        if not self.current_game_element:
+        if not self.current_record:
             messagebox.showwarning("警告", "请先选择一个游戏条目才能开始刮削。")
             return
             
@@ -1104,7 +1638,7 @@ class GamelistEditorPlugin(ctk.CTkFrame):
 
 
     def _populate_metadata_with_scraped_data(self, scraped_data: Dict[str, Any]):
-        if self.current_game_element is None: return
+        if self.current_record is None: return
             
         self._set_var_safe(self.game_developer_var, scraped_data.get("developer", ""))
         self._set_var_safe(self.game_publisher_var, scraped_data.get("publisher", ""))
@@ -1119,21 +1653,39 @@ class GamelistEditorPlugin(ctk.CTkFrame):
         self.desc_textbox.insert("1.0", desc_text)
         self.is_updating_ui = False
         
-        self._on_desc_changed(None) 
-        self._do_update() 
+        for tag in ('developer', 'publisher', 'genre', 'players', 'releasedate', 'rating', 'desc'):
+            self._on_field_edited(tag)
+        self._flush_field_edits()
 
 
+    def save_config(self):
+        """Ctrl+S：保存当前游戏列表。"""
+        self.save_gamelist()
+
     def on_switch_to(self):
+        if self.is_system_selected and self.gamelist_path is not None and self.gamelist_document is not None:
+            document = self.gamelist_repository.peek(self.gamelist_path)
+            # 共享文档未被替换，也没有被其他插件修改：保留当前列表和选中项
+            if document is self.gamelist_document and document.generation == self.gamelist_generation:
+                self._refresh_system_menu_labels()
+                return
+            if self.gamelist_path.is_file():
+                self._reload_keeping_selection()
+                return
         self._initial_load_settings()
 
     def on_switch_away(self):
-        self._clear_details()
-        self.game_list.update_list({})
-        self.selected_system_name_var.set("(未加载列表)")
-        self.xml_tree = None
-        self.gamelist_path = None
-        self.games_data = {}
-        self.is_system_selected = False
+        # 列表和文档保留在共享仓库中，切换回来时无需重新加载
+        self._flush_field_edits()
+        self._flush_autosave()
+        # 其他插件直接读取 XML 元素，离开前写回尚未写回的修改
+        if self.game_records is not None and self.gamelist_document is not None:
+            self.game_records.write_back()
+            self.gamelist_generation = self.gamelist_document.generation
+        if self.gamelist_load_cancel is not None:
+            self.gamelist_load_cancel.set()
+            self.gamelist_load_cancel = None
+            self.is_system_selected = False
 
 
 register_interface(GamelistEditorPlugin.get_title(), GamelistEditorPlugin.get_order(), GamelistEditorPlugin)
\ No newline at end of file
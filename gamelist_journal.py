@@ -0,0 +1,273 @@
+"""gamelist 编辑日志 (预写日志)。
+
+保存放到后台线程之后，界面上的修改在写盘完成前只存在于内存中。为了在程序崩溃或被强制关闭时不丢失修改，
+每次修改条目后立即把该条目的完整 XML 追加到 config/gamelist_journal/ 下对应的日志文件 (只 flush，不 fsync)；
+保存完成后按文档剩余的未保存修改重写日志，没有剩余修改时删除日志。
+
+下次启动时 load_pending_journals() / recover_document() 把日志重放到共享文档中 (只修改内存，不写盘)，文档保持"未保存"状态，
+由用户在游戏列表编辑器中确认保存。日志第一行记录了 gamelist.xml 当时的 (mtime, 大小)，
+文件之后被外部程序改写过时日志不再适用，改名为 .stale 保留，不做重放。
+
+每行一条 JSON 记录:
+    {"path": ..., "mtime_ns": ..., "size": ...}          第一行，日志对应的文件及其签名
+    {"op": "put", "id": 3, "xml": "<game>...</game>"}     条目的最新内容；id 为条目在磁盘文件中的序号
+    {"op": "put", "id": "n0", "xml": "..."}               新增的条目，重放时按出现顺序追加到末尾
+    {"op": "set", "id": 3, "fields": {"genre": "RPG"}}    尚未写回 XML 的字段修改 (见 gamelist_records)
+    {"op": "remove", "id": 3}                             删除的条目
+"""
+import hashlib
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple, Union
+
+import xml_backend
+from gamelist_loader import GAMELIST_ENTRY_TAGS, GamelistDocument, file_signature
+from gamelist_records import set_entry_text
+
+JOURNAL_DIR = Path(__file__).parent / "config" / "gamelist_journal"
+JOURNAL_SUFFIX = ".jsonl"
+STALE_SUFFIX = ".stale"
+
+_journals_lock = threading.Lock()
+
+
+def journal_path_for(path: Union[str, Path], directory: Path = JOURNAL_DIR) -> Path:
+    key = os.path.normcase(os.path.abspath(os.fspath(path)))
+    return directory / (hashlib.sha1(key.encode("utf-8")).hexdigest() + JOURNAL_SUFFIX)
+
+
+def _entry_xml(element: ET.Element) -> str:
+    tail = element.tail
+    element.tail = None
+    try:
+        return xml_backend.tostring(element).decode("utf-8")
+    finally:
+        element.tail = tail
+
+
+class GamelistJournal:
+    """一个共享文档的编辑日志，线程安全。通过 journal_for(document) 取得。"""
+
+    def __init__(self, document: GamelistDocument, directory: Path = JOURNAL_DIR):
+        self.document = document
+        self.journal_path = journal_path_for(document.path, directory)
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        # 新增条目的日志 id，每次重写日志时重新编号
+        self._new_ids: Dict[ET.Element, str] = {}
+
+    def _entry_id(self, element: ET.Element) -> Union[int, str]:
+        index = self.document.source_order.get(element)
+        if index is not None:
+            return index
+        new_id = self._new_ids.get(element)
+        if new_id is None:
+            new_id = f"n{len(self._new_ids)}"
+            self._new_ids[element] = new_id
+        return new_id
+
+    def _write_locked(self, record: dict):
+        if self._file is None:
+            # 第一次记录时写入文档当前的全部未保存修改 (已包含本条记录)，日志从此与文档保持一致
+            self._rewrite_locked(keep_open=True)
+            return
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record_put(self, element: ET.Element):
+        """条目被修改或新增、并已通过 document.mark_dirty/mark_modified 标记后调用。"""
+        with self._lock:
+            self._write_locked({"op": "put", "id": self._entry_id(element), "xml": _entry_xml(element)})
+
+    def record_fields(self, element: ET.Element, fields: Dict[str, str]):
+        """条目记录的字段被修改 (尚未写回 XML) 后调用。"""
+        with self._lock:
+            self._write_locked({"op": "set", "id": self._entry_id(element), "fields": fields})
+
+    def record_remove(self, element: ET.Element):
+        """条目从树中删除后调用。"""
+        with self._lock:
+            self._write_locked({"op": "remove", "id": self._entry_id(element)})
+
+    def rewrite(self):
+        """保存完成后调用：按文档剩余的未保存修改重写日志，没有修改时删除日志。"""
+        with self._lock:
+            self._rewrite_locked()
+
+    def discard(self):
+        """放弃文档的未保存修改 (例如重新加载) 时删除日志。"""
+        with self._lock:
+            self._close_locked()
+            try:
+                self.journal_path.unlink()
+            except OSError:
+                pass
+
+    def _close_locked(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rewrite_locked(self, keep_open: bool = False):
+        self._close_locked()
+        self._new_ids = {}
+        document = self.document
+        records: List[dict] = []
+        current = set()
+        for element in document.root:
+            if element.tag not in GAMELIST_ENTRY_TAGS:
+                continue
+            current.add(element)
+            if element in document.dirty_elements or element not in document.source_order:
+                records.append({"op": "put", "id": self._entry_id(element), "xml": _entry_xml(element)})
+        for element, index in document.source_order.items():
+            if element not in current:
+                records.append({"op": "remove", "id": index})
+        if document.records is not None:
+            for element, fields in document.records.pending_changes():
+                if element in current and fields:
+                    records.append({"op": "set", "id": self._entry_id(element), "fields": fields})
+        if not records and not keep_open:
+            try:
+                self.journal_path.unlink()
+            except OSError:
+                pass
+            return
+
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，重写过程中崩溃时旧日志仍然完整
+        temp_path = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        f = open(temp_path, 'w', encoding='utf-8')
+        try:
+            f.write(json.dumps({"path": os.fspath(document.path), "mtime_ns": document.mtime_ns,
+                                "size": document.size_bytes}, ensure_ascii=False) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+        os.replace(temp_path, self.journal_path)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+
+def journal_for(document: GamelistDocument) -> GamelistJournal:
+    """文档的编辑日志，第一次调用时创建。"""
+    with _journals_lock:
+        journal = document.journal
+        if journal is None:
+            journal = GamelistJournal(document)
+            document.journal = journal
+        return journal
+
+
+def _read_journal(journal_file: Path) -> Tuple[Optional[dict], List[dict]]:
+    header: Optional[dict] = None
+    records: List[dict] = []
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # 崩溃时最后一行可能只写了一半
+                break
+            if header is None:
+                header = item
+            else:
+                records.append(item)
+    return header, records
+
+
+def _replace_content(target: ET.Element, source: ET.Element):
+    tail = target.tail
+    target.clear()
+    target.attrib.update(source.attrib)
+    target.text = source.text
+    target.extend(list(source))
+    target.tail = tail
+
+
+def apply_journal(document: GamelistDocument, records: List[dict]) -> int:
+    """把日志记录应用到刚加载的文档上，返回受影响的条目数。"""
+    by_id: Dict[Union[int, str], ET.Element] = {entry.index: entry.element for entry in document.entries}
+    touched = set()
+    for record in records:
+        entry_id = record.get("id")
+        op = record.get("op")
+        if op == "remove":
+            element = by_id.pop(entry_id, None)
+            if element is not None:
+                document.root.remove(element)
+                touched.add(entry_id)
+            continue
+        if op == "set":
+            element = by_id.get(entry_id)
+            if element is not None and isinstance(record.get("fields"), dict):
+                for field, value in record["fields"].items():
+                    set_entry_text(element, field, value)
+                document.mark_dirty(element)
+                touched.add(entry_id)
+            continue
+        if op != "put" or not record.get("xml"):
+            continue
+        source = xml_backend.fromstring(record["xml"])
+        element = by_id.get(entry_id)
+        if element is None:
+            if isinstance(entry_id, int):
+                continue
+            element = xml_backend.SubElement(document.root, source.tag)
+            by_id[entry_id] = element
+        _replace_content(element, source)
+        document.mark_dirty(element)
+        touched.add(entry_id)
+    if touched:
+        document.mark_modified()
+        # 文档已被其他插件建立了条目记录时，重新读取被修改的条目
+        if document.records is not None:
+            document.records.reload(by_id[entry_id] for entry_id in touched if entry_id in by_id)
+    return len(touched)
+
+
+def load_pending_journals(repository, directory: Path = JOURNAL_DIR
+                          ) -> Tuple[List[Tuple[GamelistDocument, List[dict]]], List[Path]]:
+    """读取上次未完成保存的日志并加载对应的文档 (可在后台线程调用)，返回 ([(文档, 记录)], 已作废的日志)。
+
+    repository 为 GamelistRepository。文件已被外部改写或无法加载的日志改名为 .stale 保留，供手动检查。
+    """
+    pending: List[Tuple[GamelistDocument, List[dict]]] = []
+    stale: List[Path] = []
+    if not directory.is_dir():
+        return pending, stale
+    for journal_file in sorted(directory.glob("*" + JOURNAL_SUFFIX)):
+        try:
+            header, records = _read_journal(journal_file)
+        except OSError:
+            continue
+        if not records:
+            journal_file.unlink()
+            continue
+        path = Path(header["path"]) if header and header.get("path") else None
+        document = None
+        if path is not None and path.is_file() and file_signature(path) == (header.get("mtime_ns"), header.get("size")):
+            try:
+                document = repository.get(path)
+            except Exception:
+                document = None
+        if document is None:
+            stale_path = journal_file.with_suffix(STALE_SUFFIX)
+            os.replace(journal_file, stale_path)
+            stale.append(stale_path)
+            continue
+        pending.append((document, records))
+    return pending, stale
+
+
+def recover_document(document: GamelistDocument, records: List[dict]) -> bool:
+    """在修改树的线程 (界面线程) 中重放日志，并按重放后的文档重写日志 (条目 id 与当前文档一致)。"""
+    recovered = apply_journal(document, records) > 0
+    journal_for(document).rewrite()
+    return recovered
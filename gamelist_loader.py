@@ -0,0 +1,247 @@
+"""gamelist.xml 流式加载。
+
+基于 iterparse (xml_backend，lxml 或 ElementTree) 直接从文件读取，不先把整个文件读成字符串；每个 <game>/<folder> 解析完成后
+立即提取列表需要的字段 (path、name、类型)，并按间隔回报进度、检查取消标志。
+
+keep_elements=False 时条目元素在提取字段后立刻释放，内存只与条目数成正比；需要完整的
+<game> 子树时再通过 GamelistDocument.element()/materialize() 按需重新读取。
+keep_elements=True 时需要整棵树，改为按块 feed 给增量解析器 (没有逐事件的 Python 开销)，
+同样可以回报进度和取消。
+游戏列表编辑器、名称编辑器和媒体预览通过 gamelist_repository 共享同一份加载结果。
+"""
+import os
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import xml_backend
+
+GAMELIST_ENTRY_TAGS = ("game", "folder")
+# 每解析这么多个条目回报一次进度并检查取消
+PROGRESS_INTERVAL = 500
+# 整树加载时每次 feed 的字节数
+FEED_CHUNK_SIZE = 1 << 20
+
+# 进度回调: (已解析条目数, 已读取字节数, 文件总字节数)
+ProgressCallback = Callable[[int, int, int], None]
+
+
+class GamelistLoadCancelled(Exception):
+    pass
+
+
+class GamelistEntry:
+    """列表级字段；element 在 keep_elements=False 时为 None，直到被按需读取。"""
+
+    __slots__ = ("index", "tag", "path", "name", "element")
+
+    def __init__(self, index: int, tag: str, path: str, name: str, element: Optional[ET.Element] = None):
+        self.index = index
+        self.tag = tag
+        self.path = path
+        self.name = name
+        self.element = element
+
+
+class GamelistDocument:
+    def __init__(self, path: Path, root: ET.Element, entries: List[GamelistEntry], mtime_ns: Optional[int],
+                 root_path_text: Optional[str] = None, size_bytes: Optional[int] = None,
+                 keeps_elements: bool = False):
+        self.path = path
+        self.root = root
+        self._entries = entries
+        self.mtime_ns = mtime_ns
+        self.size_bytes = size_bytes
+        # 根节点下的 <path> (部分工具会写入系统 ROM 目录)
+        self.root_path_text = root_path_text
+        # 完整树文档：root 下保留所有条目，条目列表可以随时从 root 重建
+        self.keeps_elements = keeps_elements
+        # 修改计数：插件修改树后调用 mark_modified()，其他插件据此判断列表是否需要刷新
+        self.generation = 0
+        self._entries_generation = 0
+        # 自加载/上次保存以来是否有修改；dirty_elements 记录被修改过的 <game>/<folder>
+        self.dirty = False
+        self.dirty_elements: Set[ET.Element] = set()
+        # 局部保存用 (见 gamelist_writer)：条目元素在磁盘文件中的序号，以及各条目的字节范围 (首次保存时才扫描)
+        self.source_order: Dict[ET.Element, int] = (
+            {entry.element: entry.index for entry in entries} if keeps_elements else {})
+        self.source_spans: Optional[List[Tuple[int, int]]] = None
+        # 编辑日志 (gamelist_journal.journal_for) 和条目记录 (gamelist_records.records_for)，第一次使用时创建
+        self.journal = None
+        self.records = None
+
+    @property
+    def entries(self) -> List[GamelistEntry]:
+        if self.keeps_elements and self._entries_generation != self.generation:
+            self._entries = _entries_from_root(self.root)
+            self._entries_generation = self.generation
+        return self._entries
+
+    def mark_dirty(self, element: Optional[ET.Element] = None):
+        """条目内容被修改后调用；element 为被修改的 <game>/<folder>，增删条目时省略。"""
+        self.dirty = True
+        if element is not None:
+            self.dirty_elements.add(element)
+
+    def mark_modified(self, element: Optional[ET.Element] = None):
+        """树中的条目被增删或改名后调用：除了标记为已修改，还会让其他插件刷新列表。"""
+        self.mark_dirty(element)
+        self.generation += 1
+
+    def is_dirty(self, element: ET.Element) -> bool:
+        return element in self.dirty_elements
+
+    def clear_dirty(self):
+        self.dirty = False
+        self.dirty_elements.clear()
+
+    @property
+    def tree(self) -> ET.ElementTree:
+        return xml_backend.ElementTree(self.root)
+
+    def element(self, entry: GamelistEntry) -> Optional[ET.Element]:
+        if entry.element is None:
+            self.materialize([entry])
+        return entry.element
+
+    def materialize(self, entries: Iterable[GamelistEntry], cancel: Optional[threading.Event] = None):
+        """一次流式读取为多个条目补齐完整子树；读到最后一个需要的条目即停止。
+
+        文件在加载后被修改时，只接受 path 仍然一致的条目，其余保持 None。
+        """
+        wanted: Dict[int, GamelistEntry] = {entry.index: entry for entry in entries if entry.element is None}
+        if not wanted:
+            return
+        last_index = max(wanted)
+        for index, elem in _iter_entry_elements(self.path, cancel=cancel):
+            entry = wanted.get(index)
+            if entry is not None and _text(elem, "path") == entry.path:
+                entry.element = elem
+            if index >= last_index:
+                break
+
+
+def _text(elem: ET.Element, tag: str) -> str:
+    child = elem.find(tag)
+    return child.text.strip() if child is not None and child.text else ""
+
+
+def _entry_fields(elem: ET.Element) -> Tuple[str, str]:
+    """返回第一个 <path> 和 <name> 的文本。直接遍历子节点，比两次 find() 快 (lxml 的 find 走 Python 实现)。"""
+    path = name = None
+    for child in elem:
+        tag = child.tag
+        if tag == "path" and path is None:
+            path = (child.text or "").strip()
+        elif tag == "name" and name is None:
+            name = (child.text or "").strip()
+    return path or "", name or ""
+
+
+def _entries_from_root(root: ET.Element) -> List[GamelistEntry]:
+    entries: List[GamelistEntry] = []
+    for elem in root:
+        if elem.tag in GAMELIST_ENTRY_TAGS:
+            entries.append(GamelistEntry(len(entries), elem.tag, *_entry_fields(elem), elem))
+    return entries
+
+
+def _root_path_text(root: ET.Element) -> Optional[str]:
+    for elem in root:
+        if elem.tag == "path" and elem.text:
+            return elem.text.strip()
+    return None
+
+
+def file_signature(path: Union[str, Path]) -> Tuple[Optional[int], Optional[int]]:
+    """(mtime_ns, 字节数)；文件不存在时为 (None, None)。两者都一致才认为文件未被改写。"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _iter_entry_elements(path: Union[str, Path], progress: Optional[ProgressCallback] = None,
+                         cancel: Optional[threading.Event] = None, info: Optional[dict] = None):
+    """逐个返回 (序号, <game>/<folder> 元素)。调用方处理完后元素即被释放。
+
+    传入 info 时写入根节点 ("root") 和根节点下 <path> 的文本 ("root_path")。
+    """
+    info = info if info is not None else {}
+    total_bytes = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        depth = 0
+        index = 0
+        root: Optional[ET.Element] = None
+        for event, elem in xml_backend.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if depth == 0:
+                    root = elem
+                    info["root"] = root
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if elem.tag == "path" and elem.text:
+                info["root_path"] = elem.text.strip()
+            if elem.tag in GAMELIST_ENTRY_TAGS:
+                yield index, elem
+                index += 1
+                if index % PROGRESS_INTERVAL == 0:
+                    if cancel is not None and cancel.is_set():
+                        raise GamelistLoadCancelled()
+                    if progress:
+                        progress(index, f.tell(), total_bytes)
+                # 丢弃已处理的子节点，避免根节点上积累空壳
+                del root[:]
+        if progress:
+            progress(index, total_bytes, total_bytes)
+
+
+def _parse_full_tree(path: Path, progress: Optional[ProgressCallback],
+                     cancel: Optional[threading.Event]) -> ET.Element:
+    total_bytes = os.path.getsize(path)
+    parser = xml_backend.XMLParser()
+    read_bytes = 0
+    # 进度中的条目数按 "<game"/"<folder" 出现次数估算
+    approx_entries = 0
+    with open(path, 'rb') as f:
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise GamelistLoadCancelled()
+            chunk = f.read(FEED_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            read_bytes += len(chunk)
+            approx_entries += chunk.count(b"<game") + chunk.count(b"<folder")
+            if progress:
+                progress(approx_entries, read_bytes, total_bytes)
+    return parser.close()
+
+
+def load_gamelist(path: Union[str, Path], keep_elements: bool = True, progress: Optional[ProgressCallback] = None,
+                  cancel: Optional[threading.Event] = None) -> GamelistDocument:
+    """流式加载 gamelist.xml。解析失败抛出 xml_backend.PARSE_ERRORS 之一，被取消时抛出 GamelistLoadCancelled。"""
+    path = Path(path)
+    # 在读取之前取签名：读取期间文件被改写时，签名与新内容不符，下次检查会重新加载
+    mtime_ns, size_bytes = file_signature(path)
+    if keep_elements:
+        root = _parse_full_tree(path, progress, cancel)
+        entries = _entries_from_root(root)
+        if progress:
+            total_bytes = os.path.getsize(path)
+            progress(len(entries), total_bytes, total_bytes)
+        return GamelistDocument(path, root, entries, mtime_ns, _root_path_text(root), size_bytes,
+                                keeps_elements=True)
+
+    entries = []
+    info: dict = {}
+    for index, elem in _iter_entry_elements(path, progress, cancel, info):
+        entries.append(GamelistEntry(index, elem.tag, *_entry_fields(elem)))
+    root = info.get("root")
+    return GamelistDocument(path, root if root is not None else xml_backend.Element("gameList"), entries, mtime_ns,
+                            info.get("root_path"), size_bytes)
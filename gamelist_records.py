@@ -0,0 +1,216 @@
+"""gamelist 条目的紧凑记录模型。
+
+界面需要的字段 (名称、路径、图片、描述等) 在建立记录时一次遍历 <game> 的子节点取出，之后选择条目、
+刷新列表都直接读属性，不再对每个字段调用 findtext (每次都要线性扫描子节点)。
+GameRecord 使用 __slots__，没有逐条目的 dict；开发商、发行商、类型等大量重复的取值经过 sys.intern，
+相同的字符串只保存一份。每个记录有一个在文档生命周期内不变的整数 id，可直接作为列表的 key。
+
+修改只写入记录并记下改动的字段，文档同时被标记为未保存；改动在保存前 (gamelist_repository 生成保存计划前)
+或切换到其他插件前由 write_back() 写回 XML 元素。尚未写回的改动由编辑日志按字段记录。
+"""
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import xml_backend
+from gamelist_loader import GAMELIST_ENTRY_TAGS, GamelistDocument
+
+RECORD_FIELDS = ("name", "path", "image", "video", "rating", "releasedate", "developer", "publisher",
+                 "genre", "players", "playcount", "desc")
+# 名称和路径显示在各插件的列表中，修改后需要通知其他插件刷新
+LIST_FIELDS = frozenset(("name", "path"))
+# 取值大量重复的字段
+INTERNED_FIELDS = frozenset(("rating", "releasedate", "developer", "publisher", "genre", "players", "playcount"))
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+
+def set_entry_text(element: ET.Element, tag: str, value: str):
+    """写入条目的子节点文本：有值时写入 (没有该子节点则追加)，空值时删除子节点。"""
+    child = element.find(tag)
+    if value:
+        if child is None:
+            xml_backend.SubElement(element, tag).text = value
+        else:
+            child.text = value
+    elif child is not None:
+        element.remove(child)
+
+
+class GameRecord:
+    """一个 <game>/<folder> 的字段。未设置的字段为空字符串，取值与 element.findtext(字段, '') 相同。"""
+
+    __slots__ = ("id", "tag", "element", "changed") + RECORD_FIELDS
+
+    def __init__(self, record_id: int, element: ET.Element):
+        self.id = record_id
+        self.element = element
+        # 尚未写回 element 的字段
+        self.changed: Optional[Set[str]] = None
+        self.load()
+
+    def load(self):
+        """从 element 重新读取全部字段。"""
+        element = self.element
+        self.tag = element.tag
+        for field in RECORD_FIELDS:
+            setattr(self, field, "")
+        # 倒序遍历，同名子节点以第一个为准 (与 findtext 一致)
+        for child in reversed(element):
+            tag = child.tag
+            if tag in _FIELD_SET:
+                text = child.text or ""
+                setattr(self, tag, sys.intern(text) if tag in INTERNED_FIELDS else text)
+
+    def get(self, field: str) -> str:
+        return getattr(self, field)
+
+    def set(self, field: str, value: Optional[str]) -> bool:
+        """设置字段 (去掉首尾空白)，与原值相同时返回 False。"""
+        value = value.strip() if value else ""
+        if value == getattr(self, field).strip():
+            return False
+        setattr(self, field, sys.intern(value) if field in INTERNED_FIELDS else value)
+        if self.changed is None:
+            self.changed = set()
+        self.changed.add(field)
+        return True
+
+    def pending_fields(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in self.changed} if self.changed else {}
+
+    def write_back(self) -> Set[str]:
+        """把改动的字段写回 element，返回写回的字段。"""
+        changed = self.changed
+        if not changed:
+            return set()
+        self.changed = None
+        for field in RECORD_FIELDS:
+            if field in changed:
+                set_entry_text(self.element, field, getattr(self, field))
+        return changed
+
+
+class GameRecordIndex:
+    """一个 gamelist 的全部记录 (按文档中的顺序)，线程安全。
+
+    共享文档的记录通过 records_for(document) 取得，各插件共用同一份；文档的条目被增删
+    (document.generation 变化) 后下次访问时重新核对，已有条目沿用原来的记录和 id。
+    没有对应文档的树 (尚未保存过的新 gamelist) 每次访问都重新核对。
+    """
+
+    def __init__(self, root: ET.Element, document: Optional[GamelistDocument] = None):
+        self.root = root
+        self.document = document
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self._records: List[GameRecord] = []
+        self._by_element: Dict[ET.Element, GameRecord] = {}
+        self._by_id: Dict[int, GameRecord] = {}
+        self._pending: Set[GameRecord] = set()
+        self._synced_generation: Optional[int] = None
+
+    def _sync_locked(self):
+        if self.document is not None and self._synced_generation == self.document.generation:
+            return
+        records: List[GameRecord] = []
+        by_element: Dict[ET.Element, GameRecord] = {}
+        for element in self.root:
+            if element.tag not in GAMELIST_ENTRY_TAGS:
+                continue
+            record = self._by_element.get(element)
+            if record is None:
+                record = GameRecord(self._next_id, element)
+                self._next_id += 1
+            records.append(record)
+            by_element[element] = record
+        self._records = records
+        self._by_element = by_element
+        self._by_id = {record.id: record for record in records}
+        # 已删除条目上尚未写回的改动随条目一起丢弃
+        self._pending = {record for record in self._pending if record.element in by_element}
+        if self.document is not None:
+            self._synced_generation = self.document.generation
+
+    @property
+    def records(self) -> List[GameRecord]:
+        with self._lock:
+            self._sync_locked()
+            return self._records
+
+    def get(self, record_id: int) -> Optional[GameRecord]:
+        with self._lock:
+            self._sync_locked()
+            return self._by_id.get(record_id)
+
+    def record_for(self, element: ET.Element) -> Optional[GameRecord]:
+        with self._lock:
+            self._sync_locked()
+            return self._by_element.get(element)
+
+    def records_for_elements(self, elements: Iterable[ET.Element]) -> List[GameRecord]:
+        """一批新增条目的记录 (只核对一次)；不在树中的元素被跳过。"""
+        with self._lock:
+            self._sync_locked()
+            by_element = self._by_element
+            return [by_element[element] for element in elements if element in by_element]
+
+    def _mark_locked(self, element: ET.Element, list_changed: bool):
+        document = self.document
+        if document is None:
+            return
+        if not list_changed:
+            document.mark_dirty(element)
+            return
+        # 只有字段变化，条目没有增删，记录无需重新核对
+        in_sync = self._synced_generation == document.generation
+        document.mark_modified(element)
+        if in_sync:
+            self._synced_generation = document.generation
+
+    def set(self, record: GameRecord, field: str, value: Optional[str]) -> bool:
+        """修改记录的字段并把文档标记为未保存 (名称/路径还会通知其他插件刷新列表)。值未变化时返回 False。"""
+        with self._lock:
+            if not record.set(field, value):
+                return False
+            self._pending.add(record)
+            self._mark_locked(record.element, field in LIST_FIELDS)
+            return True
+
+    def reload(self, elements: Iterable[ET.Element]):
+        """element 被直接修改后 (例如重放编辑日志) 重新读取对应记录，丢弃其未写回的改动。"""
+        with self._lock:
+            for element in elements:
+                record = self._by_element.get(element)
+                if record is not None:
+                    record.changed = None
+                    self._pending.discard(record)
+                    record.load()
+
+    def pending_changes(self) -> List[Tuple[ET.Element, Dict[str, str]]]:
+        """尚未写回的改动：[(条目元素, {字段: 新值})]。"""
+        with self._lock:
+            return [(record.element, record.pending_fields()) for record in self._pending]
+
+    def write_back(self) -> int:
+        """把所有尚未写回的改动写入 XML 元素，返回写回的记录数。需在修改树的线程 (界面线程) 中调用。"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            for record in pending:
+                fields = record.write_back()
+                if fields:
+                    self._mark_locked(record.element, bool(fields & LIST_FIELDS))
+            return len(pending)
+
+
+_records_lock = threading.Lock()
+
+
+def records_for(document: GamelistDocument) -> GameRecordIndex:
+    """共享文档的记录索引，第一次调用时创建。"""
+    with _records_lock:
+        records = document.records
+        if records is None:
+            records = GameRecordIndex(document.root, document)
+            document.records = records
+        return records
@@ -0,0 +1,286 @@
+"""进程内共享的 gamelist 文档。
+
+游戏列表编辑器、名称编辑器和媒体预览都通过 get_gamelist_repository().get(path) 取得 gamelist.xml，
+同一个文件只解析一次，各插件拿到的是同一个 GamelistDocument (完整树)：一个插件修改条目并调用
+document.mark_modified() 后，其他插件下次显示时即可看到，无需重新解析。
+
+缓存按路径保存，文件的 (mtime, 大小) 与加载时不一致即视为被外部修改并重新加载；
+文件监视器报告 gamelist.xml 变化时也会立即丢弃过期的文档。缓存总量按源文件字节数做 LRU 限制，
+最近使用的文档和有未保存修改的文档总是保留。
+
+保存时没有修改的文档直接跳过 (磁盘文件被外部修改过也不会用内存中的旧树覆盖)，否则只重写修改过的条目
+(gamelist_writer)；有修改而磁盘文件已被外部修改时抛出 GamelistChangedError，由调用方询问用户后以 force=True
+覆盖。写入经过临时文件 + fsync + os.replace，不会留下半截文件。save_document_async 把读取源文件和写盘交给唯一的后台写入线程，
+界面线程只负责序列化修改过的条目；保存进行中的文档不会因为磁盘文件变化而被当作过期丢弃。
+"""
+import os
+import queue
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Union
+
+import xml_backend
+from fs_watcher import ROOT_GAMELISTS, FsEvent, get_fs_watcher
+from gamelist_loader import GamelistDocument, ProgressCallback, file_signature, load_gamelist
+from gamelist_writer import SAVE_MODE_REPLAN, SavePlan, abort_save, commit_save, execute_save, plan_save
+
+MAX_CACHED_DOCUMENTS = 16
+# 按源文件大小计算；完整树在内存中约为文件大小的 1.5 倍
+MAX_CACHED_BYTES = 256 * 1024 * 1024
+
+# 后台保存完成回调: (写出方式 SAVE_MODE_PARTIAL/SAVE_MODE_FULL，失败时为 None；异常，成功时为 None)。
+# 在写入线程中调用。写出方式为 SAVE_MODE_REPLAN 时没有写盘、未保存标记已恢复，
+# 调用方应回到界面线程以 full=True 重新调用 save_document_async
+SaveCallback = Callable[[Optional[str], Optional[BaseException]], None]
+
+
+class GamelistChangedError(Exception):
+    """文档有未保存的修改，而磁盘文件在加载 (或上次保存) 之后已被外部修改。"""
+
+
+def _cache_key(path: Union[str, Path]) -> str:
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+class GamelistRepository:
+    """按路径缓存完整的 gamelist 文档，线程安全。"""
+
+    def __init__(self, max_documents: int = MAX_CACHED_DOCUMENTS, max_bytes: int = MAX_CACHED_BYTES):
+        self.max_documents = max(1, max_documents)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._documents: "OrderedDict[str, GamelistDocument]" = OrderedDict()
+        # 每个路径一把加载锁：多个插件同时请求同一文件时只解析一次
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # 正在保存的文档 (按路径)；保存结束时通知 wait_for_saves
+        self._saving: Set[str] = set()
+        self._saves_done = threading.Condition(self._lock)
+        self._save_queue: "queue.Queue[Callable[[], None]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._load_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._load_locks[key] = lock
+            return lock
+
+    def peek(self, path: Union[str, Path]) -> Optional[GamelistDocument]:
+        """返回仍与磁盘一致的缓存文档，不解析文件；没有或已过期时返回 None。"""
+        key = _cache_key(path)
+        with self._lock:
+            document = self._documents.get(key)
+        if document is None:
+            return None
+        # 保存进行中时磁盘文件已被替换而文档的签名还没有更新，此时文档仍然是最新的
+        if key not in self._saving and file_signature(path) != (document.mtime_ns, document.size_bytes):
+            self._discard(key, document)
+            return None
+        with self._lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+        return document
+
+    def get(self, path: Union[str, Path], progress: Optional[ProgressCallback] = None,
+            cancel: Optional[threading.Event] = None) -> GamelistDocument:
+        """取得共享文档，必要时加载。异常与 load_gamelist 相同。"""
+        path = Path(path)
+        document = self.peek(path)
+        if document is not None:
+            return document
+        key = _cache_key(path)
+        with self._load_lock(key):
+            # 等锁期间可能已由其他线程加载完成
+            document = self.peek(path)
+            if document is None:
+                document = load_gamelist(path, keep_elements=True, progress=progress, cancel=cancel)
+                self._store(key, document)
+        return document
+
+    @staticmethod
+    def _needs_save(document: GamelistDocument, force: bool) -> bool:
+        """有修改时返回 True；磁盘文件已被外部修改且 force 为 False 时抛出 GamelistChangedError。"""
+        if not (force or document.dirty):
+            return False
+        if not force and file_signature(document.path) != (document.mtime_ns, document.size_bytes):
+            raise GamelistChangedError(f"{document.path} 在加载后已被外部程序修改")
+        return True
+
+    def save_document(self, document: GamelistDocument, force: bool = False) -> bool:
+        """在当前线程写出文档并返回 True。文档没有修改时不写入，返回 False。
+
+        磁盘文件已被外部修改时抛出 GamelistChangedError，force 为 True 时直接覆盖。同一文档有后台保存在进行时先等待其完成。文档有编辑日志时按保存后的状态重写日志。
+        """
+        key = _cache_key(document.path)
+        with self._lock:
+            self._saves_done.wait_for(lambda: key not in self._saving)
+        self._write_back_records(document)
+        with self._lock:
+            if not self._needs_save(document, force):
+                return False
+            self._saving.add(key)
+        try:
+            plan = plan_save(document)
+            try:
+                if execute_save(plan) == SAVE_MODE_REPLAN:
+                    # 在调用线程中保存，可以直接重新生成完整写出的计划
+                    abort_save(document, plan)
+                    plan = plan_save(document, full=True)
+                    execute_save(plan)
+            except BaseException:
+                abort_save(document, plan)
+                raise
+            commit_save(document, plan)
+            # 写出后文档与磁盘一致，重新放回缓存 (可能已被 LRU 淘汰)
+            self._store(key, document)
+        finally:
+            self._finish_save(key)
+        if document.journal is not None:
+            document.journal.rewrite()
+        return True
+
+    def save_document_async(self, document: GamelistDocument, on_done: SaveCallback, force: bool = False,
+                            full: bool = False) -> bool:
+        """在后台写入线程保存文档，已排队返回 True；没有需要保存的内容时返回 False，不调用 on_done。
+        磁盘文件已被外部修改时同 save_document。
+
+        必须在修改树的线程 (界面线程) 中调用：修改过的条目在这里序列化，未保存标记随之转移到保存计划中，
+        写出失败时恢复。同一文档已有保存在进行时抛出 RuntimeError，调用方应先检查 is_saving()。
+        编辑日志由调用方在 on_done 之后回到界面线程重写。full 为 True 时序列化整棵树 (见 SaveCallback)。
+        """
+        key = _cache_key(document.path)
+        with self._lock:
+            if key in self._saving:
+                raise RuntimeError(f"{document.path} 正在保存")
+        self._write_back_records(document)
+        if not self._needs_save(document, force):
+            return False
+        plan = plan_save(document, full=full)
+        with self._lock:
+            self._saving.add(key)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, name="gamelist-writer", daemon=True)
+                self._writer.start()
+        self._save_queue.put(lambda: self._run_save(key, document, plan, on_done))
+        return True
+
+    @staticmethod
+    def _write_back_records(document: GamelistDocument):
+        # 界面对条目记录的修改在保存前才写回 XML (见 gamelist_records)
+        if document.records is not None:
+            document.records.write_back()
+
+    def _writer_loop(self):
+        while True:
+            job = self._save_queue.get()
+            job()
+
+    def _run_save(self, key: str, document: GamelistDocument, plan: SavePlan, on_done: SaveCallback):
+        try:
+            mode = execute_save(plan)
+        except Exception as e:
+            abort_save(document, plan)
+            self._finish_save(key)
+            on_done(None, e)
+            return
+        if mode == SAVE_MODE_REPLAN:
+            abort_save(document, plan)
+            self._finish_save(key)
+            on_done(mode, None)
+            return
+        commit_save(document, plan)
+        self._store(key, document)
+        self._finish_save(key)
+        on_done(mode, None)
+
+    def _finish_save(self, key: str):
+        with self._lock:
+            self._saving.discard(key)
+            self._saves_done.notify_all()
+
+    def is_saving(self, path: Union[str, Path]) -> bool:
+        with self._lock:
+            return _cache_key(path) in self._saving
+
+    def wait_for_save(self, path: Union[str, Path], timeout: Optional[float] = None) -> bool:
+        """等待该文件正在进行的保存结束，超时返回 False。"""
+        key = _cache_key(path)
+        with self._lock:
+            return self._saves_done.wait_for(lambda: key not in self._saving, timeout)
+
+    def wait_for_saves(self, timeout: Optional[float] = None) -> bool:
+        """等待所有后台保存结束 (程序退出前调用)，超时返回 False。"""
+        with self._lock:
+            return self._saves_done.wait_for(lambda: not self._saving, timeout)
+
+    def save(self, path: Union[str, Path], root: ET.Element, force: bool = False) -> bool:
+        """保存 root。root 属于缓存中的文档时同 save_document；否则直接写出并丢弃该路径的缓存。"""
+        path = Path(path)
+        key = _cache_key(path)
+        with self._lock:
+            document = self._documents.get(key)
+        if document is not None and document.root is root:
+            return self.save_document(document, force)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        xml_backend.write_xml(root, path)
+        self.invalidate(path)
+        return True
+
+    def invalidate(self, path: Union[str, Path]):
+        with self._lock:
+            self._documents.pop(_cache_key(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def discard_stale(self, paths: List[Path]):
+        """丢弃磁盘上已变化的文档 (文件监视器回调)。"""
+        for path in paths:
+            key = _cache_key(path)
+            with self._lock:
+                document = self._documents.get(key)
+            if (document is not None and key not in self._saving
+                    and file_signature(path) != (document.mtime_ns, document.size_bytes)):
+                self._discard(key, document)
+
+    def _discard(self, key: str, document: GamelistDocument):
+        with self._lock:
+            if self._documents.get(key) is document:
+                del self._documents[key]
+
+    def _store(self, key: str, document: GamelistDocument):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """从最久未使用的文档开始淘汰；有未保存修改的文档和最近使用的文档不淘汰。"""
+        total_bytes = sum(document.size_bytes or 0 for document in self._documents.values())
+        candidates = [key for key, document in list(self._documents.items())[:-1] if not document.dirty]
+        for key in candidates:
+            if len(self._documents) <= self.max_documents and total_bytes <= self.max_bytes:
+                break
+            total_bytes -= self._documents.pop(key).size_bytes or 0
+
+    def _on_fs_events(self, root_key: str, root: Path, events: List[FsEvent]):
+        if root_key == ROOT_GAMELISTS:
+            self.discard_stale([event.path for event in events if event.path.name == "gamelist.xml"])
+
+
+_shared_repository: Optional[GamelistRepository] = None
+_shared_repository_lock = threading.Lock()
+
+
+def get_gamelist_repository() -> GamelistRepository:
+    """进程内共享的 gamelist 文档仓库。"""
+    global _shared_repository
+    with _shared_repository_lock:
+        if _shared_repository is None:
+            _shared_repository = GamelistRepository()
+            get_fs_watcher().add_listener(_shared_repository._on_fs_events)
+        return _shared_repository
@@ -0,0 +1,202 @@
+"""ROM 目录与 gamelist 的增量同步。
+
+compute_sync_delta 把系统目录的快照 (rom_scanner.RomSnapshot) 与条目记录的 <path> 做集合比较，得到：
+    added     目录中有、gamelist 中没有条目的 ROM (新增 <game> 条目)
+    relinks   ROM 已不存在、但同名文件恰好出现在系统目录的另一处 (移动到其他子目录)，只修改 <path>
+    missing   ROM 已不存在且无法重新关联的条目 (保留、标记为隐藏或删除)
+计算只读取记录，不修改任何东西；用户确认后由 apply_sync_delta 只修改涉及的条目。快照由目录快照缓存提供，
+目录未变化时只需逐目录 stat 一次，所以每次复制完成后都可以自动执行 (自动同步只应用新增和重新关联)。
+"""
+import posixpath
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+import xml_backend
+from gamelist_records import GameRecord, GameRecordIndex, set_entry_text
+from library_health import relative_rom_path, rom_path_exists
+from rom_scanner import RomSnapshot
+
+# ROM 已不存在的条目的处理方式
+MISSING_KEEP = "keep"
+MISSING_HIDE = "hide"
+MISSING_REMOVE = "remove"
+MISSING_ACTIONS = {
+    MISSING_KEEP: "保留条目",
+    MISSING_HIDE: "标记为隐藏 (<hidden>true</hidden>)",
+    MISSING_REMOVE: "删除条目",
+}
+
+
+class SyncRelink(NamedTuple):
+    record: GameRecord
+    old_path: str
+    # 新的 <path> (以 "./" 开头)
+    new_path: str
+
+
+class SyncDelta:
+    """一次同步的差异。added 为相对于系统目录的 posix 路径 (按扫描顺序)，其余按条目在文档中的顺序。"""
+
+    __slots__ = ("snapshot", "added", "relinks", "missing")
+
+    def __init__(self, snapshot: RomSnapshot):
+        self.snapshot = snapshot
+        self.added: List[str] = []
+        self.relinks: List[SyncRelink] = []
+        self.missing: List[GameRecord] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.relinks or self.missing)
+
+    def summary_line(self) -> str:
+        return f"新增 {len(self.added)} 个条目，重新关联 {len(self.relinks)} 个，ROM 已不存在 {len(self.missing)} 个"
+
+    def format_lines(self, limit: int) -> List[str]:
+        """按类别列出差异，每类最多 limit 行。"""
+        lines: List[str] = []
+
+        def section(title: str, items: List[str]):
+            if not items:
+                return
+            lines.append(f"{title} ({len(items)}):")
+            lines.extend(f"  {item}" for item in items[:limit])
+            if len(items) > limit:
+                lines.append(f"  ... 另有 {len(items) - limit} 项未显示")
+
+        section("新增", [f"./{path}" for path in self.added])
+        section("重新关联", [f"[{relink.record.name.strip() or 'Unknown Game'}] {relink.old_path} -> {relink.new_path}"
+                         for relink in self.relinks])
+        section("ROM 已不存在", [f"[{record.name.strip() or 'Unknown Game'}] {record.path.strip()}"
+                              + (" (已隐藏)" if is_hidden(record) else "") for record in self.missing])
+        return lines
+
+
+class SyncResult(NamedTuple):
+    added: List[GameRecord]
+    relinked: List[GameRecord]
+    hidden: List[GameRecord]
+    removed: List[GameRecord]
+    # 计算差异之后条目又被修改或删除、因而没有应用的项数
+    skipped: int
+
+
+def is_hidden(record: GameRecord) -> bool:
+    return (record.element.findtext("hidden") or "").strip().lower() == "true"
+
+
+def _basename_key(snapshot: RomSnapshot, relative_path: str) -> str:
+    return snapshot.key(posixpath.basename(relative_path))
+
+
+def compute_sync_delta(records: Iterable[GameRecord], snapshot: RomSnapshot) -> SyncDelta:
+    """比较快照与条目记录。路径按快照的大小写规则比较；指向系统目录之外的路径按原文比较，不会被重新关联。
+
+    只有文件名在 ROM 已不存在的条目和未收录的 ROM 两边都唯一时才重新关联，否则分别计入 missing 和 added。
+    """
+    system_path = snapshot.root
+    delta = SyncDelta(snapshot)
+    key_of = snapshot.key
+    listed_keys: Set[str] = set()
+    missing: List[GameRecord] = []
+    for record in records:
+        path_text = record.path.strip()
+        if not path_text:
+            continue
+        relative = relative_rom_path(path_text, system_path)
+        listed_keys.add(key_of(relative) if relative is not None else path_text)
+        if not rom_path_exists(snapshot, path_text, relative):
+            missing.append(record)
+
+    unlisted = [rom for rom in snapshot.roms if key_of(rom) not in listed_keys]
+    if missing and unlisted:
+        unlisted_by_name: Dict[str, List[str]] = {}
+        for rom in unlisted:
+            unlisted_by_name.setdefault(_basename_key(snapshot, rom), []).append(rom)
+        missing_by_name: Dict[str, List[GameRecord]] = {}
+        for record in missing:
+            if record.tag == "game":
+                relative = relative_rom_path(record.path, system_path)
+                if relative:
+                    missing_by_name.setdefault(_basename_key(snapshot, relative), []).append(record)
+        targets_by_record: Dict[GameRecord, str] = {}
+        for name, candidates in missing_by_name.items():
+            targets = unlisted_by_name.get(name)
+            if len(candidates) == 1 and targets is not None and len(targets) == 1:
+                targets_by_record[candidates[0]] = targets[0]
+        if targets_by_record:
+            delta.relinks = [SyncRelink(record, record.path.strip(), f"./{targets_by_record[record]}")
+                             for record in missing if record in targets_by_record]
+            missing = [record for record in missing if record not in targets_by_record]
+            moved = set(targets_by_record.values())
+            unlisted = [rom for rom in unlisted if rom not in moved]
+
+    delta.added = unlisted
+    delta.missing = missing
+    return delta
+
+
+def apply_sync_delta(index: GameRecordIndex, delta: SyncDelta, missing_action: str = MISSING_KEEP,
+                     include_missing: bool = True) -> SyncResult:
+    """应用差异，只修改涉及的条目并把文档标记为未保存。需在修改树的线程 (界面线程) 中调用。
+
+    计算差异之后被改过路径或已删除的条目、已有条目的新增路径都会被跳过 (计入 skipped)。
+    include_missing 为 False 时不处理 ROM 已不存在的条目 (自动同步)。
+    """
+    if missing_action not in MISSING_ACTIONS:
+        raise ValueError(f"未知的处理方式: {missing_action}")
+    root = index.root
+    document = index.document
+    current = index.records
+    alive = set(current)
+    skipped = 0
+
+    relinked: List[GameRecord] = []
+    for relink in delta.relinks:
+        record = relink.record
+        if record not in alive or record.path.strip() != relink.old_path:
+            skipped += 1
+        elif index.set(record, "path", relink.new_path):
+            relinked.append(record)
+
+    hidden: List[GameRecord] = []
+    removed: List[GameRecord] = []
+    if include_missing and missing_action != MISSING_KEEP:
+        for record in delta.missing:
+            if record not in alive:
+                skipped += 1
+            elif missing_action == MISSING_REMOVE:
+                root.remove(record.element)
+                removed.append(record)
+            elif not is_hidden(record):
+                set_entry_text(record.element, "hidden", "true")
+                if document is not None:
+                    document.mark_dirty(record.element)
+                hidden.append(record)
+
+    new_elements = []
+    if delta.added:
+        # 自动同步与手动同步可能先后应用同一份差异，已有条目的路径不再新增
+        snapshot = delta.snapshot
+        existing = set()
+        for record in current:
+            relative = relative_rom_path(record.path, snapshot.root) if record.path.strip() else None
+            if relative is not None:
+                existing.add(snapshot.key(relative))
+        for relative_path in delta.added:
+            key = snapshot.key(relative_path)
+            if key in existing:
+                skipped += 1
+                continue
+            existing.add(key)
+            element = xml_backend.SubElement(root, "game")
+            xml_backend.SubElement(element, "path").text = f"./{relative_path}"
+            xml_backend.SubElement(element, "name").text = PurePosixPath(relative_path).stem
+            new_elements.append(element)
+
+    if document is not None and (new_elements or removed):
+        for element in new_elements:
+            document.mark_dirty(element)
+        document.mark_modified()
+    added = index.records_for_elements(new_elements)
+    return SyncResult(added, relinked, hidden, removed, skipped)
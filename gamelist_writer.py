@@ -0,0 +1,307 @@
+"""gamelist.xml 局部保存。
+
+完整重新序列化会丢掉文件原有的排版，耗时也与文件大小成正比。这里只重新序列化被修改过的
+<game>/<folder>：未修改条目的字节原样从磁盘文件复制，被修改的条目替换为新的序列化结果，
+新增条目插入在相应位置，删除的条目连同它前面的空白一起去掉。这样版本管理中的 diff 只包含
+真正修改过的条目。
+
+条目的字节范围在第一次保存时用正则扫描源文件得到 (只匹配 <game>/<folder> 标签、注释、CDATA
+和处理指令，不逐个处理子元素)；保存后直接根据拼接结果更新，之后的保存无需再扫描。
+文件在加载后被外部改写、条目顺序被调整、文件不是 UTF-8 或扫描结果与加载时的条目对不上时，
+退回到完整写出。
+
+保存分为两步：plan_save 在界面线程中序列化修改过的条目，execute_save 读取源文件、拼接并写盘，
+可以交给后台写入线程 (见 gamelist_repository.save_document_async)。execute_save 不接触树：
+无法局部保存而计划中又没有完整内容时不写盘，返回 SAVE_MODE_REPLAN，由调用方在界面线程中
+用 plan_save(document, full=True) 重新生成计划。
+"""
+import io
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import xml_backend
+from gamelist_loader import GAMELIST_ENTRY_TAGS, GamelistDocument, file_signature
+
+SAVE_MODE_PARTIAL = "partial"
+SAVE_MODE_FULL = "full"
+# 计划无法执行，需要在界面线程中重新生成完整保存的计划
+SAVE_MODE_REPLAN = "replan"
+# 新增条目前的缩进，源文件中找不到可参照的空白时使用
+DEFAULT_ENTRY_GAP = b"\n\t"
+
+_ENTRY_TOKEN = re.compile(
+    rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>'
+    rb'|<(game|folder)(?=[\s/>])((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>'
+    rb'|</(game|folder)\s*>',
+    re.S)
+_XML_DECLARATION_ENCODING = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+_WHITESPACE = b" \t\r\n"
+
+
+def scan_entry_spans(data: bytes) -> Optional[List[Tuple[str, int, int]]]:
+    """返回根节点下每个 <game>/<folder> 的 (标签, 起始字节, 结束字节)；标签不成对时返回 None。"""
+    spans: List[Tuple[str, int, int]] = []
+    open_tag: Optional[bytes] = None
+    open_start = 0
+    for match in _ENTRY_TOKEN.finditer(data):
+        tag = match.group(1)
+        if tag:
+            if open_tag is not None:
+                return None
+            if match.group(2).endswith(b"/"):
+                spans.append((tag.decode("ascii"), match.start(), match.end()))
+            else:
+                open_tag, open_start = tag, match.start()
+        elif match.group(3):
+            if match.group(3) != open_tag:
+                return None
+            spans.append((open_tag.decode("ascii"), open_start, match.end()))
+            open_tag = None
+    return spans if open_tag is None else None
+
+
+def _is_utf8(data: bytes) -> bool:
+    match = _XML_DECLARATION_ENCODING.search(data, 0, 200)
+    return match is None or match.group(1).lower() in (b"utf-8", b"utf8")
+
+
+def _entry_indent(root: ET.Element) -> Tuple[str, str]:
+    """取文件中已有条目的子元素缩进：(子元素前的空白, 结束标签前的空白)。"""
+    for element in root:
+        if element.tag in GAMELIST_ENTRY_TAGS and len(element):
+            text, closing = element.text, element[-1].tail
+            if text and closing and "\n" in text and not text.strip() and not closing.strip():
+                return text, closing
+    gap = root.text if root.text and "\n" in root.text and not root.text.strip() else DEFAULT_ENTRY_GAP.decode()
+    return gap + "\t", gap
+
+
+def _indent_entry(element: ET.Element, child_indent: str, closing_indent: str):
+    # SubElement 新增的子元素没有前后空白，按文件原有的缩进补上；已有的空白不变
+    if not len(element):
+        return
+    if not element.text:
+        element.text = child_indent
+    last = len(element) - 1
+    for position, child in enumerate(element):
+        if position < last:
+            if not child.tail or child.tail == closing_indent:
+                child.tail = child_indent
+        elif not child.tail or child.tail == child_indent:
+            child.tail = closing_indent
+
+
+def _serialize_entry(element: ET.Element) -> bytes:
+    # tostring 会带上 tail (条目后的空白)，拼接时空白取自源文件
+    tail = element.tail
+    element.tail = None
+    try:
+        return xml_backend.tostring(element)
+    finally:
+        element.tail = tail
+
+
+def _serialize_document(root: ET.Element) -> bytes:
+    buffer = io.BytesIO()
+    xml_backend.write_xml(root, buffer)
+    return buffer.getvalue()
+
+
+class SavePlan:
+    """一次保存要写出的内容。
+
+    plan_save 在修改树的线程 (界面线程) 中调用：只遍历根节点的直接子节点并序列化修改过的条目，
+    同时把文档的未保存标记转移到计划中。读取源文件、拼接和写盘由 execute_save 完成，可以放到后台线程；
+    写出期间界面继续修改的条目会重新标记为未保存，由下一次保存写出。
+    """
+
+    __slots__ = ("path", "root", "signature", "source_order", "source_spans", "elements", "blocks",
+                 "content", "was_dirty", "dirty_elements", "mode", "new_order", "new_spans", "written_signature")
+
+    def __init__(self, document: GamelistDocument):
+        self.path = document.path
+        self.root = document.root
+        self.signature = (document.mtime_ns, document.size_bytes)
+        self.source_order = document.source_order
+        self.source_spans = document.source_spans
+        self.elements: List[ET.Element] = []
+        # 需要重新序列化的条目 (修改过的和新增的)；为 None 表示无法局部保存
+        self.blocks: Optional[Dict[ET.Element, bytes]] = None
+        # 完整写出的内容，只在无法局部保存时生成
+        self.content: Optional[bytes] = None
+        self.was_dirty = document.dirty
+        self.dirty_elements = document.dirty_elements
+        self.mode: Optional[str] = None
+        self.new_order: Dict[ET.Element, int] = {}
+        self.new_spans: Optional[List[Tuple[int, int]]] = None
+        self.written_signature: Tuple[Optional[int], Optional[int]] = (None, None)
+
+
+def plan_save(document: GamelistDocument, full: bool = False) -> SavePlan:
+    """生成保存计划并清除文档的未保存标记；写出失败时用 abort_save 恢复。full 为 True 时直接序列化整棵树。"""
+    plan = SavePlan(document)
+    document.dirty = False
+    document.dirty_elements = set()
+    plan.elements = [element for element in document.root if element.tag in GAMELIST_ENTRY_TAGS]
+
+    source_order = document.source_order
+    if source_order and not full:
+        last_index = -1
+        blocks: Optional[Dict[ET.Element, bytes]] = {}
+        indent: Optional[Tuple[str, str]] = None
+        for element in plan.elements:
+            index = source_order.get(element)
+            if index is not None:
+                # 原有条目被调整了顺序
+                if index <= last_index:
+                    blocks = None
+                    break
+                last_index = index
+                if element not in plan.dirty_elements:
+                    continue
+            if indent is None:
+                indent = _entry_indent(document.root)
+            _indent_entry(element, *indent)
+            blocks[element] = _serialize_entry(element)
+        plan.blocks = blocks
+    if plan.blocks is None:
+        plan.content = _serialize_document(document.root)
+    return plan
+
+
+def _source_spans(plan: SavePlan, data: bytes) -> Optional[List[Tuple[int, int]]]:
+    if plan.source_spans is not None:
+        return plan.source_spans
+    scanned = scan_entry_spans(data)
+    if scanned is None or len(scanned) != len(plan.source_order):
+        return None
+    if any(scanned[index][0] != element.tag for element, index in plan.source_order.items()):
+        return None
+    return [(start, end) for _, start, end in scanned]
+
+
+def splice_plan(plan: SavePlan, data: bytes) -> Optional[Tuple[bytes, Dict[ET.Element, int], List[Tuple[int, int]]]]:
+    """用源文件内容 data 拼接出新文件，返回 (新内容, 新的条目序号, 新的字节范围)；无法局部保存时返回 None。"""
+    if plan.blocks is None or not _is_utf8(data):
+        return None
+    spans = _source_spans(plan, data)
+    if not spans:
+        return None
+
+    header_end = spans[0][0]
+    while header_end > 0 and data[header_end - 1] in _WHITESPACE:
+        header_end -= 1
+    blocks = plan.blocks
+    source_order = plan.source_order
+    chunks: List[bytes] = []
+    length = 0
+    # 待复制的源文件区间 [copy_from, copy_to)：相邻的未修改条目合并为一次切片复制；
+    # shift 为该区间内的字节在新文件中的偏移量变化
+    copy_from, copy_to, shift = 0, header_end, 0
+    # 最近一个原有条目前的空白，新增条目使用相同的缩进
+    gap_range = (header_end, spans[0][0])
+    new_order: Dict[ET.Element, int] = {}
+    new_spans: List[Tuple[int, int]] = []
+    for element in plan.elements:
+        index = source_order.get(element)
+        if index is None:
+            gap = data[gap_range[0]:gap_range[1]]
+            gap = gap if gap and not gap.strip(_WHITESPACE) else DEFAULT_ENTRY_GAP
+            block = blocks[element]
+        else:
+            gap_start = spans[index - 1][1] if index else header_end
+            gap_range = (gap_start, spans[index][0])
+            if copy_to != gap_start:
+                chunks.append(data[copy_from:copy_to])
+                length += copy_to - copy_from
+                copy_from, shift = gap_start, length - gap_start
+            block = blocks.get(element)
+            if block is None:
+                copy_to = spans[index][1]
+                new_order[element] = len(new_spans)
+                new_spans.append((spans[index][0] + shift, copy_to + shift))
+                continue
+            copy_to = spans[index][0]
+            gap = b""
+        chunks.append(data[copy_from:copy_to])
+        length += copy_to - copy_from
+        chunks.append(gap)
+        chunks.append(block)
+        start = length + len(gap)
+        length = start + len(block)
+        new_order[element] = len(new_spans)
+        new_spans.append((start, length))
+        # 下一段复制从一个不可能相邻的位置开始，保证先输出当前内容
+        copy_from = copy_to = -1
+
+    trailer_start = spans[-1][1]
+    if copy_to == trailer_start:
+        chunks.append(data[copy_from:])
+    else:
+        if copy_from >= 0:
+            chunks.append(data[copy_from:copy_to])
+        chunks.append(data[trailer_start:])
+    return b"".join(chunks), new_order, new_spans
+
+
+def execute_save(plan: SavePlan) -> str:
+    """按计划写出文件 (可在后台线程调用)，返回 SAVE_MODE_PARTIAL 或 SAVE_MODE_FULL。
+
+    需要完整写出而计划中没有完整内容时不写盘，返回 SAVE_MODE_REPLAN (见模块说明)。
+    """
+    result = None
+    if plan.blocks is not None and file_signature(plan.path) == plan.signature:
+        try:
+            with open(plan.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = None
+        if data is not None and len(data) == plan.signature[1]:
+            result = splice_plan(plan, data)
+
+    if result is not None:
+        content, plan.new_order, plan.new_spans = result
+        plan.mode = SAVE_MODE_PARTIAL
+    elif plan.content is None:
+        # 源文件被外部改写等少见情况：树可能正被界面线程修改，不能在这里序列化
+        plan.mode = SAVE_MODE_REPLAN
+        return plan.mode
+    else:
+        content = plan.content
+        plan.new_order = {element: index for index, element in enumerate(plan.elements)}
+        plan.new_spans = None
+        plan.mode = SAVE_MODE_FULL
+    plan.path.parent.mkdir(parents=True, exist_ok=True)
+    with xml_backend.atomic_write(plan.path) as f:
+        f.write(content)
+    plan.written_signature = file_signature(plan.path)
+    return plan.mode
+
+
+def commit_save(document: GamelistDocument, plan: SavePlan):
+    """写出成功后更新文档记录的磁盘状态。"""
+    document.source_order, document.source_spans = plan.new_order, plan.new_spans
+    document.mtime_ns, document.size_bytes = plan.written_signature
+
+
+def abort_save(document: GamelistDocument, plan: SavePlan):
+    """写出失败时恢复计划取走的未保存标记。"""
+    document.dirty_elements.update(plan.dirty_elements)
+    document.dirty = document.dirty or plan.was_dirty
+
+
+def write_document(document: GamelistDocument) -> str:
+    """同步保存完整树文档，能局部保存时只重写修改过的条目。返回 SAVE_MODE_PARTIAL 或 SAVE_MODE_FULL。"""
+    plan = plan_save(document)
+    try:
+        mode = execute_save(plan)
+        if mode == SAVE_MODE_REPLAN:
+            abort_save(document, plan)
+            plan = plan_save(document, full=True)
+            mode = execute_save(plan)
+    except BaseException:
+        abort_save(document, plan)
+        raise
+    commit_save(document, plan)
+    return mode
@@ -0,0 +1,292 @@
+"""ROM 目录与 gamelist.xml 的一致性检查 (库健康报告)。
+
+每个系统只做一次目录快照 (rom_scanner.take_rom_snapshot，目录未变化时直接使用目录快照缓存) 和一次
+gamelist.xml 流式读取，之后全部通过集合运算得出以下问题：
+    unlisted_rom     ROM 文件在 gamelist 中没有条目
+    missing_rom      条目指向的 ROM 文件已不存在
+    duplicate_path   多个条目使用同一路径
+    empty_name       条目的名称为空
+只有快照无法判断的路径 (位于被 .esdeignore 或深度限制剪掉的目录中，或在系统目录之外) 才单独检查是否存在。
+检查的是磁盘上的 gamelist.xml，界面中尚未保存的修改不计入。
+
+所有系统在线程池中并发检查，结果可导出为 JSON 或 CSV (每行一个问题)，供维护脚本使用。
+
+命令行:
+    python library_health.py                          检查配置中的全部系统并打印摘要
+    python library_health.py snes nes --json r.json   只检查指定系统，并导出 JSON (--csv 导出 CSV)
+"""
+import argparse
+import csv
+import json
+import os
+import posixpath
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import xml_backend
+from gamelist_loader import load_gamelist
+from library_scan import LIBRARY_SCAN_WORKERS, LibrarySettings, load_library_settings
+from rom_scanner import DirectorySnapshotCache, RomSnapshot, get_snapshot_cache, load_scan_rules, take_rom_snapshot
+
+ISSUE_LABELS = {
+    "unlisted_rom": "gamelist 中没有条目的 ROM",
+    "missing_rom": "ROM 文件已不存在的条目",
+    "duplicate_path": "路径重复的条目",
+    "empty_name": "名称为空的条目",
+}
+CSV_COLUMNS = ("system", "issue", "path", "detail")
+HEALTH_LOG_DIR = Path(__file__).parent / "logs"
+
+# 每个系统检查完成后的回调: (系统名, 报告)，在工作线程中调用
+HealthListener = Callable[[str, "SystemHealth"], None]
+
+
+def relative_rom_path(path_text: str, system_path: Optional[Path]) -> Optional[str]:
+    """把 gamelist 中的 <path> 转为相对于系统目录的 posix 路径 (不含 "./")；指向系统目录之外时返回 None。"""
+    value = path_text.strip().replace("\\", "/")
+    is_absolute = value.startswith("/") or (len(value) > 2 and value[1] == ":" and value[2] == "/")
+    if is_absolute:
+        if system_path is None:
+            return None
+        prefix = system_path.as_posix().rstrip("/") + "/"
+        if os.name == "nt":
+            matched = value.casefold().startswith(prefix.casefold())
+        else:
+            matched = value.startswith(prefix)
+        if not matched:
+            return None
+        value = value[len(prefix):]
+    value = posixpath.normpath(value) if value else "."
+    if value == ".":
+        return ""
+    if value == ".." or value.startswith("../"):
+        return None
+    return value
+
+
+class SystemHealth:
+    """一个系统的检查结果。rom_count/entry_count 为 None 表示没有 ROM 目录/gamelist.xml。"""
+
+    __slots__ = ("system", "rom_count", "entry_count", "unlisted_roms", "missing_roms", "duplicate_paths",
+                 "empty_names", "error", "seconds")
+
+    def __init__(self, system: str):
+        self.system = system
+        self.rom_count: Optional[int] = None
+        self.entry_count: Optional[int] = None
+        # ROM 路径，写法与同步 ROM 时生成的 <path> 相同 (./sub/game.zip)
+        self.unlisted_roms: List[str] = []
+        # (条目的 <path>, 名称)
+        self.missing_roms: List[Tuple[str, str]] = []
+        # (<path>, 使用该路径的条目数)
+        self.duplicate_paths: List[Tuple[str, int]] = []
+        # 名称为空的条目的 <path>
+        self.empty_names: List[str] = []
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+
+    @property
+    def issue_count(self) -> int:
+        return len(self.unlisted_roms) + len(self.missing_roms) + len(self.duplicate_paths) + len(self.empty_names)
+
+    def issues(self) -> Iterator[Tuple[str, str, str]]:
+        """逐个返回 (问题类型, 路径, 说明)。"""
+        for path in self.unlisted_roms:
+            yield "unlisted_rom", path, ""
+        for path, name in self.missing_roms:
+            yield "missing_rom", path, name
+        for path, count in self.duplicate_paths:
+            yield "duplicate_path", path, str(count)
+        for path in self.empty_names:
+            yield "empty_name", path, ""
+
+    def summary_line(self) -> str:
+        roms = "无 ROM 目录" if self.rom_count is None else f"ROM {self.rom_count}"
+        entries = "无 gamelist" if self.entry_count is None else f"条目 {self.entry_count}"
+        line = (f"{self.system}: {roms}, {entries} - 未收录 {len(self.unlisted_roms)}, "
+                f"文件缺失 {len(self.missing_roms)}, 路径重复 {len(self.duplicate_paths)}, "
+                f"名称为空 {len(self.empty_names)}")
+        if self.error:
+            line += f" ({self.error})"
+        return line
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "system": self.system,
+            "rom_count": self.rom_count,
+            "entry_count": self.entry_count,
+            "unlisted_roms": self.unlisted_roms,
+            "missing_roms": [{"path": path, "name": name} for path, name in self.missing_roms],
+            "duplicate_paths": [{"path": path, "count": count} for path, count in self.duplicate_paths],
+            "empty_names": self.empty_names,
+            "error": self.error,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def rom_path_exists(snapshot: RomSnapshot, path_text: str, relative: Optional[str]) -> bool:
+    """条目的 <path> 是否仍然存在。relative 为 relative_rom_path() 的结果；
+    只有快照无法判断的路径 (所在目录未被列出、在系统目录之外) 才访问文件系统。
+    """
+    if relative is not None:
+        exists = snapshot.contains(relative)
+        if exists is not None:
+            return exists
+        return os.path.exists(snapshot.root / relative)
+    value = path_text.strip()
+    if not os.path.isabs(value):
+        value = os.path.join(snapshot.root, value)
+    return os.path.exists(value)
+
+
+def check_system(system_name: str, settings: LibrarySettings,
+                 cache: Optional[DirectorySnapshotCache] = None) -> SystemHealth:
+    """检查一个系统。gamelist.xml 无法解析时只报告 ROM 数量，error 说明原因。"""
+    started = time.perf_counter()
+    report = SystemHealth(system_name)
+    system_path = Path(settings.rom_root) / system_name if settings.rom_root else None
+    gamelist_path = Path(settings.gamelist_base) / system_name / "gamelist.xml" if settings.gamelist_base else None
+
+    snapshot: Optional[RomSnapshot] = None
+    if system_path is not None and system_path.is_dir():
+        rules = load_scan_rules(system_path, settings.rom_root, max_depth=settings.max_depth)
+        snapshot = take_rom_snapshot(system_path, settings.extensions_for(system_name), cache=cache, rules=rules,
+                                     workers=settings.scan_concurrency)
+        report.rom_count = len(snapshot.roms)
+
+    entries = []
+    if gamelist_path is not None and gamelist_path.is_file():
+        try:
+            entries = load_gamelist(gamelist_path, keep_elements=False).entries
+            report.entry_count = len(entries)
+        except xml_backend.PARSE_ERRORS + (OSError,) as e:
+            report.error = f"gamelist.xml 读取失败: {e}"
+
+    # 条目路径按快照的大小写规则比较；指向系统目录之外的路径按原文比较
+    listed_keys = set()
+    path_counts: Counter = Counter()
+    first_path_text: Dict[str, str] = {}
+    for entry in entries:
+        if not entry.name:
+            report.empty_names.append(entry.path)
+        if not entry.path:
+            continue
+        relative = relative_rom_path(entry.path, system_path)
+        if relative is not None:
+            key = snapshot.key(relative) if snapshot is not None else relative
+        else:
+            key = entry.path
+        listed_keys.add(key)
+        path_counts[key] += 1
+        first_path_text.setdefault(key, entry.path)
+        if snapshot is not None and not rom_path_exists(snapshot, entry.path, relative):
+            report.missing_roms.append((entry.path, entry.name))
+
+    report.duplicate_paths = [(first_path_text[key], count) for key, count in path_counts.items() if count > 1]
+    if snapshot is not None:
+        key_of = snapshot.key
+        report.unlisted_roms = [f"./{rom}" for rom in snapshot.roms if key_of(rom) not in listed_keys]
+    elif entries and not report.error:
+        report.error = "没有对应的 ROM 目录，无法检查文件是否存在"
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def check_library(settings: Optional[LibrarySettings] = None, systems: Optional[Sequence[str]] = None,
+                  listener: Optional[HealthListener] = None,
+                  max_workers: int = LIBRARY_SCAN_WORKERS) -> List[SystemHealth]:
+    """并发检查所有 (或指定的) 系统，按系统名排序返回。单个系统出错时记入该系统的 error，不中断其他系统。"""
+    settings = settings or load_library_settings()
+    names = list(systems) if systems else settings.system_names()
+    cache = get_snapshot_cache()
+    reports: List[SystemHealth] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(check_system, name, settings, cache): name for name in names}
+            for future in as_completed(futures):
+                system_name = futures[future]
+                try:
+                    report = future.result()
+                except Exception as e:
+                    report = SystemHealth(system_name)
+                    report.error = str(e)
+                reports.append(report)
+                if listener is not None:
+                    listener(system_name, report)
+    finally:
+        cache.save()
+    reports.sort(key=lambda report: report.system)
+    return reports
+
+
+def format_report(reports: List[SystemHealth]) -> str:
+    lines = [report.summary_line() for report in reports]
+    totals = Counter()
+    for report in reports:
+        for kind, _, _ in report.issues():
+            totals[kind] += 1
+    lines.append("")
+    lines.append("合计: " + ", ".join(f"{label} {totals[kind]}" for kind, label in ISSUE_LABELS.items()))
+    return "\n".join(lines)
+
+
+def export_json(reports: List[SystemHealth], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {"generated_at": datetime.now().isoformat(timespec="seconds"),
+            "systems": [report.as_dict() for report in reports]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def export_csv(reports: List[SystemHealth], path: Path):
+    """每行一个问题: system, issue (问题类型), path, detail (缺失条目的名称 / 重复次数)。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for report in reports:
+            for kind, issue_path, detail in report.issues():
+                writer.writerow((report.system, kind, issue_path, detail))
+
+
+def write_reports(reports: List[SystemHealth], log_dir: Path = HEALTH_LOG_DIR) -> Tuple[Path, Path]:
+    """把报告同时写为 logs/library_health_<时间>.json 和 .csv，返回两个路径。"""
+    stem = f"library_health_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    json_path = log_dir / f"{stem}.json"
+    csv_path = log_dir / f"{stem}.csv"
+    export_json(reports, json_path)
+    export_csv(reports, csv_path)
+    return json_path, csv_path
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="检查 ROM 目录与 gamelist.xml 是否一致")
+    parser.add_argument("systems", nargs="*", help="只检查这些系统 (默认全部)")
+    parser.add_argument("--json", type=Path, help="导出 JSON 报告")
+    parser.add_argument("--csv", type=Path, help="导出 CSV 报告 (每行一个问题)")
+    args = parser.parse_args(argv)
+
+    settings = load_library_settings()
+    if not settings.rom_root and not settings.gamelist_base:
+        print("错误: 配置中没有 ROM 根目录和 gamelist 目录。", file=sys.stderr)
+        return 1
+
+    start_time = time.perf_counter()
+    reports = check_library(settings, args.systems)
+    elapsed = time.perf_counter() - start_time
+    print(format_report(reports))
+    print(f"完成: {len(reports)} 个系统，耗时 {elapsed:.1f} 秒。")
+    if args.json:
+        export_json(reports, args.json)
+    if args.csv:
+        export_csv(reports, args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
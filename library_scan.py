@@ -0,0 +1,270 @@
+"""全库后台扫描。
+
+程序启动时在有界线程池中并发扫描所有系统目录，统计 ROM 数量、总字节数和 gamelist 条目数；
+每个系统完成后立即通知监听者，名称编辑器、游戏列表编辑器和媒体预览据此更新系统下拉框。
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import xml_backend
+from rom_scanner import AUTO_SCAN_WORKERS, ExtensionProfile, ScanRules, load_scan_rules, load_system_extension_profiles
+
+TOOLKIT_CONFIG_PATH = Path(__file__).parent / "config" / "esde_toolkit_config.json"
+EXTENSION_OVERRIDES_PATH = Path(__file__).parent / "config" / "system_extension_overrides.json"
+LIBRARY_SCAN_WORKERS = max(2, min(8, os.cpu_count() or 4))
+ROM_COUNT_EXTENSIONS = [".zip", ".7z", ".nes", ".sfc", ".n64", ".iso", ".cue", ".chd"]
+# 下拉框显示文本中系统名与统计信息之间的分隔符
+LABEL_SEPARATOR = "  ·  "
+
+# 监听回调: (系统名, 统计信息)
+SummaryListener = Callable[[str, Dict[str, Any]], None]
+
+
+def count_gamelist_entries(gamelist_path: Path) -> int:
+    """流式统计 gamelist.xml 中 <game>/<folder> 的数量，不保留整棵树。"""
+    count = 0
+    depth = 0
+    for event, elem in xml_backend.iterparse(gamelist_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            if elem.tag in ("game", "folder"):
+                count += 1
+            elem.clear()
+    return count
+
+
+def scan_system_folder(system_path: Path, extensions: Iterable[str],
+                       rules: Optional[ScanRules] = None) -> Tuple[int, int]:
+    """返回 (ROM 数量, 总字节数)。rules 与名称编辑器扫描时使用的剪枝规则相同。
+
+    后缀不匹配的文件在 stat 之前就被排除。
+    """
+    allowed = extensions if isinstance(extensions, ExtensionProfile) else ExtensionProfile(extensions)
+    rom_count = 0
+    total_bytes = 0
+    pending_dirs = [(os.fspath(system_path), "", 0)]
+    while pending_dirs:
+        current_dir, relative_dir, depth = pending_dirs.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    relative_path = f"{relative_dir}{entry.name}"
+                    try:
+                        if entry.is_dir():
+                            if rules is None or rules.allows_dir(entry.name, relative_path, depth + 1):
+                                pending_dirs.append((entry.path, relative_path + "/", depth + 1))
+                        elif (allowed.matches(entry.name) and entry.is_file()
+                              and (rules is None or rules.allows_file(entry.name, relative_path))):
+                            rom_count += 1
+                            total_bytes += entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return rom_count, total_bytes
+
+
+def format_size(byte_count: int) -> str:
+    size = float(byte_count)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def list_system_names(rom_root: Optional[Path], gamelist_base: Optional[Path]) -> List[str]:
+    """ROM 根目录和 gamelist 目录下的所有系统目录名。"""
+    names = set()
+    for base in (rom_root, gamelist_base):
+        if base and Path(base).is_dir():
+            try:
+                names.update(entry.name for entry in os.scandir(base) if entry.is_dir())
+            except OSError:
+                continue
+    return sorted(names)
+
+
+def system_from_label(label: str) -> str:
+    """从下拉框显示文本还原系统名。"""
+    return label.split(LABEL_SEPARATOR, 1)[0]
+
+
+class LibraryScanService:
+    """后台统计各系统规模，结果按系统逐个推送给监听者。"""
+
+    def __init__(self, max_workers: int = LIBRARY_SCAN_WORKERS, extensions: Optional[List[str]] = None):
+        self.max_workers = max(1, max_workers)
+        self.extensions = list(extensions or ROM_COUNT_EXTENSIONS)
+        self.max_depth: Optional[int] = None
+        # 系统名 -> 后缀表 (来自 es_systems.xml 及手动覆盖)；未列出的系统使用 extensions
+        self.extension_profiles: Dict[str, ExtensionProfile] = {}
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[SummaryListener] = []
+        self._roots: Optional[Tuple[Optional[str], Optional[str]]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, listener: SummaryListener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: SummaryListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def get(self, system_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._summaries.get(system_name)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def label(self, system_name: str) -> str:
+        summary = self.get(system_name)
+        if not summary:
+            return system_name
+        parts = []
+        if summary.get("rom_count") is not None:
+            parts.append(f"{summary['rom_count']} ROM, {format_size(summary['total_bytes'])}")
+        if summary.get("gamelist_entries") is not None:
+            parts.append(f"{summary['gamelist_entries']} 条目")
+        return f"{system_name}{LABEL_SEPARATOR}{' / '.join(parts)}" if parts else system_name
+
+    def start(self, rom_root: Optional[Path], gamelist_base: Optional[Path], force: bool = False):
+        """在后台开始扫描。正在扫描时不会重复启动；相同目录已扫描过时只有 force=True 才重新扫描。"""
+        roots = (str(rom_root) if rom_root else None, str(gamelist_base) if gamelist_base else None)
+        with self._lock:
+            if self.is_running() or (not force and self._roots == roots):
+                return
+            if force or roots != self._roots:
+                self._summaries.clear()
+            self._roots = roots
+        self._thread = threading.Thread(target=self._run, args=(rom_root, gamelist_base), daemon=True)
+        self._thread.start()
+
+    def _run(self, rom_root: Optional[Path], gamelist_base: Optional[Path]):
+        system_names = list_system_names(rom_root, gamelist_base)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._summarize_system, name, rom_root, gamelist_base): name
+                for name in system_names
+            }
+            for future in as_completed(futures):
+                system_name = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = {"rom_count": None, "total_bytes": 0, "gamelist_entries": None, "error": str(e)}
+                with self._lock:
+                    self._summaries[system_name] = summary
+                    listeners = list(self._listeners)
+                for listener in listeners:
+                    try:
+                        listener(system_name, summary)
+                    except Exception as e:
+                        print(f"警告: 系统统计回调失败: {e}")
+
+    def _summarize_system(self, system_name: str, rom_root: Optional[Path],
+                          gamelist_base: Optional[Path]) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"rom_count": None, "total_bytes": 0, "gamelist_entries": None}
+        system_path = Path(rom_root) / system_name if rom_root else None
+        if system_path and system_path.is_dir():
+            extensions = self.extension_profiles.get(system_name, self.extensions)
+            rules = load_scan_rules(system_path, rom_root, max_depth=self.max_depth)
+            summary["rom_count"], summary["total_bytes"] = scan_system_folder(system_path, extensions, rules)
+        if gamelist_base:
+            gamelist_path = Path(gamelist_base) / system_name / "gamelist.xml"
+            if gamelist_path.is_file():
+                try:
+                    summary["gamelist_entries"] = count_gamelist_entries(gamelist_path)
+                except xml_backend.PARSE_ERRORS:
+                    summary["gamelist_entries"] = None
+        return summary
+
+
+_shared_service: Optional[LibraryScanService] = None
+_shared_service_lock = threading.Lock()
+
+
+def get_library_scan_service() -> LibraryScanService:
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = LibraryScanService()
+        return _shared_service
+
+
+def _load_extension_profiles(systems_file: Optional[str]) -> Dict[str, ExtensionProfile]:
+    """与名称编辑器相同的后缀来源：es_systems.xml 中的 <extension>，再由手动覆盖替换。"""
+    profiles: Dict[str, ExtensionProfile] = {}
+    if systems_file and Path(systems_file).is_file():
+        try:
+            profiles = load_system_extension_profiles(systems_file)
+        except xml_backend.PARSE_ERRORS + (OSError,):
+            profiles = {}
+    if EXTENSION_OVERRIDES_PATH.is_file():
+        try:
+            with open(EXTENSION_OVERRIDES_PATH, 'r', encoding='utf-8') as f:
+                for system_name, extensions in json.load(f).items():
+                    if extensions:
+                        profiles[system_name] = ExtensionProfile(extensions)
+        except (OSError, ValueError, AttributeError, TypeError):
+            pass
+    return profiles
+
+
+class LibrarySettings(NamedTuple):
+    rom_root: Optional[Path]
+    gamelist_base: Optional[Path]
+    # 系统名 -> 后缀表；未列出的系统使用 ROM_COUNT_EXTENSIONS
+    extension_profiles: Dict[str, ExtensionProfile]
+    max_depth: Optional[int]
+    scan_concurrency: Any
+
+    def system_names(self) -> List[str]:
+        return list_system_names(self.rom_root, self.gamelist_base)
+
+    def extensions_for(self, system_name: str) -> ExtensionProfile:
+        profile = self.extension_profiles.get(system_name)
+        return profile if profile is not None else ExtensionProfile(ROM_COUNT_EXTENSIONS)
+
+
+def load_library_settings() -> LibrarySettings:
+    """读取 ROM 根目录、gamelist 目录、各系统后缀和扫描设置 (与名称编辑器相同的来源)。"""
+    config: Dict[str, Any] = {}
+    if TOOLKIT_CONFIG_PATH.is_file():
+        try:
+            with open(TOOLKIT_CONFIG_PATH, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            config = {}
+
+    max_depth = config.get("scan_max_depth")
+    return LibrarySettings(
+        rom_root=Path(config["rom_files_dir"]) if config.get("rom_files_dir") else None,
+        gamelist_base=Path(config["gamelist_base_dir"]) if config.get("gamelist_base_dir") else None,
+        extension_profiles=_load_extension_profiles(config.get("systems_config_file_found_path")),
+        max_depth=int(max_depth) if isinstance(max_depth, (int, str)) and str(max_depth).isdigit() else None,
+        scan_concurrency=config.get("scan_concurrency", AUTO_SCAN_WORKERS),
+    )
+
+
+def start_library_scan_from_config(force: bool = False) -> LibraryScanService:
+    """读取 ROM 根目录和 gamelist 目录配置并启动后台扫描。"""
+    service = get_library_scan_service()
+    settings = load_library_settings()
+    service.extension_profiles = settings.extension_profiles
+    service.max_depth = settings.max_depth
+    if settings.rom_root or settings.gamelist_base:
+        service.start(settings.rom_root, settings.gamelist_base, force=force)
+    return service
@@ -3,11 +3,19 @@ import tkinter as tk
 from tkinter import messagebox, filedialog, simpledialog
 from pathlib import Path
 from typing import Optional, Dict, Any, List
-import xml.etree.ElementTree as ET
 import sys
 import os
 import json 
 import shutil 
+import threading
+
+from fs_watcher import ROOT_GAMELISTS, ROOT_MEDIA, FsEvent, get_fs_watcher
+from gamelist_loader import GamelistDocument
+from gamelist_records import GameRecord, records_for
+from gamelist_repository import get_gamelist_repository
+from gamelist_search import GamelistSearchIndex
+from library_scan import get_library_scan_service, system_from_label
+from rom_scanner import get_snapshot_cache
 
 VLC_AVAILABLE = False
 try:
@@ -39,6 +47,8 @@ SELECTED_COLOR = "#1F6AA5"
 NORMAL_COLOR = "#2A2A2A"  
 
 VIDEO_EXTENSIONS = [".mp4", ".mkv", ".avi", ".flv", ".wmv"] 
+# 游戏列表的搜索：每次按键都立即过滤，停止输入这么久之后再重建列表按钮
+GAME_FILTER_DEBOUNCE_MS = 150
 
 
 class ToolkitConfigLoader:
@@ -63,9 +73,13 @@ class ToolkitConfigLoader:
         if not roms_root_path.is_dir(): return False 
         self.rom_path = roms_root_path
         self.system_map.clear()
-        for system_dir in roms_root_path.iterdir():
-            if system_dir.is_dir() and (system_dir / "gamelist.xml").is_file():
+        cache = get_snapshot_cache()
+        listing = cache.listing(roms_root_path)
+        for system_dir_name in (listing[1] if listing else ()):
+            system_dir = roms_root_path / system_dir_name
+            if "gamelist.xml" in cache.file_names(system_dir):
                 self.system_map[system_dir.name] = system_dir / "gamelist.xml"
+        cache.save()
         return bool(self.system_map)
     
     def get_system_names(self) -> List[str]:
@@ -176,14 +190,27 @@ class MediaPreviewPlugin(ctk.CTkFrame):
         self.app_ref = app_ref 
         self.toolkit_loader = ToolkitConfigLoader() 
         self.game_data: Dict[str, Dict[str, Any]] = {} 
+        self.gamelist_document: Optional[GamelistDocument] = None
+        # 列表对应的共享文档修改计数；其他插件修改条目后重新生成列表
+        self.gamelist_generation = 0
         self.system_select_var = ctk.StringVar(value="等待配置加载系统...")
         self.current_system_name: Optional[str] = None 
         self.current_root_path: Optional[str] = None 
+        self.library_scan = get_library_scan_service()
+        self.library_scan.add_listener(lambda name, summary: self.after(10, self._refresh_system_menu_labels))
+        get_fs_watcher().add_listener(
+            lambda key, root, events: self.after(10, lambda: self._on_fs_events(key, root, events)))
         self.media_photo_references: Dict[str, Optional[ImageTk.PhotoImage]] = {}
         self.media_labels: Dict[str, tk.Label] = {}
         self.preview_frames: Dict[str, ctk.CTkFrame] = {} 
         
         self.list_widgets: Dict[str, ctk.CTkButton] = {} 
+        # 列表中各游戏记录的显示名称 (按列表顺序)、搜索索引和当前过滤结果 (None 表示不过滤)
+        self.game_display_names: Dict[GameRecord, str] = {}
+        self.game_search_index: Optional[GamelistSearchIndex] = None
+        self.game_filter_records: Optional[List[GameRecord]] = None
+        self.game_filter_var = ctk.StringVar(value="")
+        self.game_filter_job: Optional[str] = None
         self.selected_game_button: Optional[ctk.CTkButton] = None 
         self.current_game_display_name: Optional[str] = None 
         
@@ -196,12 +223,16 @@ class MediaPreviewPlugin(ctk.CTkFrame):
         
         left_frame = ctk.CTkFrame(self)
         left_frame.grid(row=0, column=0, sticky="nsew", padx=(10, 5), pady=10)
-        left_frame.grid_rowconfigure(2, weight=1) 
+        left_frame.grid_rowconfigure(3, weight=1) 
         left_frame.grid_columnconfigure(0, weight=1)
         
         self._create_config_controls(left_frame) 
 
         ctk.CTkLabel(left_frame, text="游戏列表 (当前系统)", anchor="w").grid(row=1, column=0, sticky="nw", padx=5, pady=(10, 0))
+
+        ctk.CTkEntry(left_frame, textvariable=self.game_filter_var,
+                     placeholder_text="搜索，如 mario missing:video").grid(row=2, column=0, sticky="ew", padx=5, pady=(0, 5))
+        self.game_filter_var.trace_add("write", lambda n, i, m: self._on_game_filter_changed())
         
         self.list_scroll_frame = ctk.CTkScrollableFrame(
             left_frame, 
@@ -209,7 +240,7 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             fg_color="#242424", 
             border_width=0
         )
-        self.list_scroll_frame.grid(row=2, column=0, sticky="nsew", padx=5, pady=(0, 5))
+        self.list_scroll_frame.grid(row=3, column=0, sticky="nsew", padx=5, pady=(0, 5))
         self.list_scroll_frame.columnconfigure(0, weight=1)
 
         right_frame = ctk.CTkFrame(self)
@@ -426,8 +457,13 @@ class MediaPreviewPlugin(ctk.CTkFrame):
         frame = ctk.CTkFrame(master_frame)
         frame.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
         frame.columnconfigure(0, weight=1)
+        frame.columnconfigure(1, weight=0)
 
         ctk.CTkLabel(frame, text="已加载系统:").grid(row=0, column=0, sticky="w", padx=5, pady=0)
+
+        ctk.CTkButton(
+            frame, text="强制重新扫描", command=self._force_rescan, width=90, fg_color="#7F8C8D"
+        ).grid(row=1, column=1, sticky="e", padx=5, pady=(0, 5))
         
         self.system_select_menu = ctk.CTkOptionMenu(
             frame, 
@@ -484,6 +520,9 @@ class MediaPreviewPlugin(ctk.CTkFrame):
     def _clear_list_and_data(self, clear_listbox: bool = False, reset_text: str = "请选择系统"):
         if clear_listbox: self._clear_list_widgets()
         self.game_data.clear()
+        self.game_display_names = {}
+        self.game_search_index = None
+        self.game_filter_records = None
         self.current_system_name = None
         self.current_game_display_name = None 
         self.current_video_path = None 
@@ -547,7 +586,7 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             target_filename = f"{rom_base_path_for_media}{ext}"
             full_path = video_base_path / target_filename # 路径如：.../videos/01/game.mp4
             
-            if full_path.is_file():
+            if self._media_file_exists(full_path):
                 self.current_video_path = full_path
                 video_found = True
                 success_count += 1
@@ -573,7 +612,7 @@ class MediaPreviewPlugin(ctk.CTkFrame):
                 target_filename = f"{rom_base_path_for_media}{ext}"
                 full_path = base_path / target_filename # 路径如：.../media_type/01/game.png
                 
-                if full_path.is_file():
+                if self._media_file_exists(full_path):
                     found_file = full_path
                     break
             
@@ -583,7 +622,13 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             else:
                 pass
                 
+        get_snapshot_cache().save()
         self._update_status(f"完成加载。找到 {success_count} 个媒体。", "#27AE60")
+
+    @staticmethod
+    def _media_file_exists(full_path: Path) -> bool:
+        # 通过目录快照判断，未变化的媒体目录只需一次 stat
+        return full_path.name in get_snapshot_cache().file_names(full_path.parent)
     
     def _initial_load(self):
         config_path = self.toolkit_loader.load_config_base_dir()
@@ -595,14 +640,70 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             self._update_system_menu(None) 
             self._clear_list_and_data(reset_text="配置加载失败，请检查配置文件。")
 
+    def _on_fs_events(self, root_key: str, root: Path, events: List[FsEvent]):
+        if root_key == ROOT_MEDIA:
+            self._apply_media_events(root, events)
+        elif root_key == ROOT_GAMELISTS:
+            self._apply_gamelist_events(root, events)
+
+    def _apply_media_events(self, root: Path, events: List[FsEvent]):
+        """只有当前选中游戏的媒体发生变化时才刷新预览。"""
+        game_info = self.game_data.get(self.current_game_display_name) if self.current_game_display_name else None
+        if not game_info:
+            return
+        for event in events:
+            # downloaded_media/<系统>/<媒体类型>/<子目录.../>ROM 基准名.ext
+            parts = event.relative_parts(root)
+            if len(parts) < 3 or event.is_dir or parts[0] != game_info['system_name']:
+                continue
+            if Path(*parts[2:]).with_suffix('').as_posix() == game_info['rom_base_name']:
+                self.preview_media(rom_base_name=game_info['rom_base_name'], system_name=game_info['system_name'])
+                return
+
+    def _apply_gamelist_events(self, root: Path, events: List[FsEvent]):
+        changed_systems = {event.relative_parts(root)[0] for event in events
+                           if event.path.name == "gamelist.xml" and len(event.relative_parts(root)) == 2}
+        if not changed_systems:
+            return
+
+        if any(event.kind != "modified" for event in events if event.path.name == "gamelist.xml") and self.current_root_path:
+            self.toolkit_loader.scan_systems(self.current_root_path)
+            self._refresh_system_menu_labels()
+
+        # 媒体预览不修改 gamelist，当前系统的列表被外部改写时直接重新加载并保持选中的游戏
+        if self.current_system_name in changed_systems and self.current_system_name in self.toolkit_loader.system_map:
+            reselect_system = self.current_system_name
+            reselect_game = self.current_game_display_name
+            self.current_system_name = None
+            self._load_game_list(reselect_system)
+            if reselect_game:
+                self._select_game_by_name(reselect_game)
+
+    def _force_rescan(self):
+        cache = get_snapshot_cache()
+        rom_path = self.toolkit_loader.rom_path
+        if rom_path:
+            cache.invalidate(rom_path)
+            cache.invalidate(rom_path.parent / "downloaded_media")
+
+        reselect_system = self.current_system_name
+        reselect_game = self.current_game_display_name
+        self.current_system_name = None
+        self._initial_load()
+        if reselect_system and reselect_system in self.toolkit_loader.system_map:
+            self.system_select_var.set(self.library_scan.label(reselect_system))
+            self._load_game_list(reselect_system)
+            if reselect_game:
+                self._select_game_by_name(reselect_game)
+
     def _update_system_menu(self, system_names: Optional[List[str]] = None, current_selection: Optional[str] = None):
         default_value = "未找到任何系统" if not system_names else "等待选择系统"
         if system_names:
-            options = system_names
+            options = [self.library_scan.label(name) for name in system_names]
             if current_selection and current_selection in system_names:
-                 self.system_select_var.set(current_selection)
+                 self.system_select_var.set(self.library_scan.label(current_selection))
             elif system_names:
-                 self.system_select_var.set(system_names[0]) 
+                 self.system_select_var.set(options[0]) 
         else:
             self.system_select_var.set(default_value)
             options = [default_value]
@@ -626,7 +727,16 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             self._update_system_menu(None)
             self._clear_list_and_data()
 
+    def _refresh_system_menu_labels(self):
+        system_names = self.toolkit_loader.get_system_names()
+        if not system_names:
+            return
+        self.system_select_menu.configure(values=[self.library_scan.label(name) for name in system_names])
+        if self.current_system_name in self.toolkit_loader.system_map:
+            self.system_select_var.set(self.library_scan.label(self.current_system_name))
+
     def _on_single_select(self, choice: str):
+        choice = system_from_label(choice)
         if choice in self.toolkit_loader.get_system_names():
             self._load_game_list(choice)
 
@@ -660,31 +770,39 @@ class MediaPreviewPlugin(ctk.CTkFrame):
         self.list_widgets.clear()
         self.selected_game_button = None
 
+    def _report_gamelist_progress(self, done: int, read_bytes: int, total_bytes: int):
+        percent = read_bytes * 100 // total_bytes if total_bytes else 100
+        self._update_status(f"正在加载 gamelist.xml: {done} 个条目 ({percent}%)", "#3498DB")
+        self.update_idletasks()
+
     def _load_game_list(self, system_name: str):
-        if system_name == self.current_system_name: return 
+        gamelist_path = self.toolkit_loader.system_map.get(system_name)
+        if system_name == self.current_system_name and gamelist_path and self.gamelist_document is not None:
+            document = get_gamelist_repository().peek(gamelist_path)
+            if document is self.gamelist_document and document.generation == self.gamelist_generation:
+                return
 
         self.current_system_name = system_name
-        gamelist_path = self.toolkit_loader.system_map.get(system_name)
         if not gamelist_path:
             self._update_status(f"错误：找不到系统 {system_name} 的 gamelist.xml。", "red")
             return
             
         self._clear_list_and_data(clear_listbox=True) 
+        # _clear_list_and_data 会清空当前系统名，需要重新设置
+        self.current_system_name = system_name
+        self.gamelist_document = None
         self._clear_preview(reset_text=f"正在加载系统 {system_name} 的游戏...")
         
         try:
-            tree = ET.parse(gamelist_path)
-            root = tree.getroot()
-            total_games = 0
-            
-            game_names_to_load = []
-
-            for i, game_elem in enumerate(root.findall('game')):
-                path_elem = game_elem.find('path')
-                name_elem = game_elem.find('name')
-                
-                if path_elem is not None and path_elem.text:
-                    rom_path_text = path_elem.text.strip() # e.g., './01/game.sfc'
+            # 与游戏列表编辑器、名称编辑器共享同一份文档，已加载过的系统无需重新解析
+            self.gamelist_document = get_gamelist_repository().get(gamelist_path,
+                                                                   progress=self._report_gamelist_progress)
+            self.gamelist_generation = self.gamelist_document.generation
+            # 读取条目记录 (与其他插件共用)，其他插件尚未保存的改名也能看到
+            game_records = [record for record in records_for(self.gamelist_document).records if record.tag == 'game']
+            for record in game_records:
+                if record.path.strip():
+                    rom_path_text = record.path.strip() # e.g., './01/game.sfc'
 
                     # --- 关键修改：获取包含子目录的媒体基准名 ---
                     # 1. 移除路径前的 './' 或 '.\'
@@ -698,32 +816,23 @@ class MediaPreviewPlugin(ctk.CTkFrame):
                     rom_filename_base = str(relative_path_part.with_suffix('').as_posix()) 
                     # --- 关键修改结束 ---
                     
-                    display_name = name_elem.text if name_elem is not None and name_elem.text else Path(rom_path_text).stem
-                    
-                    game_button = ctk.CTkButton(
-                        self.list_scroll_frame,
-                        text=display_name,
-                        command=lambda name=display_name: self._select_game_by_name(name),
-                        height=LIST_BUTTON_HEIGHT,
-                        fg_color=NORMAL_COLOR,
-                        hover_color=SELECTED_COLOR,
-                        corner_radius=6,
-                        font=ctk.CTkFont(size=12, weight="bold"),
-                        anchor="w" 
-                    )
-                    game_button.grid(row=i, column=0, sticky="ew", padx=0, pady=(1, 1))
-                    
-                    self.list_widgets[display_name] = game_button
-                    game_names_to_load.append(display_name)
+                    display_name = record.name.strip() or Path(rom_path_text).stem
+                    self.game_display_names[record] = display_name
                     
                     self.game_data[display_name] = {
-                        'element': game_elem, 
+                        'entry': record, 
                         'rom_base_name': rom_filename_base, # 包含子目录的基准名
                         'system_name': system_name 
                     }
-                    total_games += 1
 
-            self._update_status(f"成功加载系统 {system_name} 的 {total_games} 个游戏。", "#27AE60")
+            # n-gram 倒排表在后台建立，建好之前的查询逐条比较
+            search_index = GamelistSearchIndex(self.game_display_names)
+            self.game_search_index = search_index
+            threading.Thread(target=search_index.build_ngrams, daemon=True).start()
+            self._filter_game_list()
+            game_names_to_load = self._show_game_list()
+
+            self._update_status(f"成功加载系统 {system_name} 的 {len(self.game_display_names)} 个游戏。", "#27AE60")
             
             if game_names_to_load:
                 self._select_game_by_name(game_names_to_load[0]) 
@@ -732,6 +841,52 @@ class MediaPreviewPlugin(ctk.CTkFrame):
             self._update_status(f"加载系统 {system_name} 的 XML 失败: {e}", "red")
             messagebox.showerror("错误", f"加载系统 {system_name} 的 XML 失败: {e}")
 
+    def _filter_game_list(self):
+        query = self.game_filter_var.get() or ""
+        if self.game_search_index is None or not query.strip():
+            self.game_filter_records = None
+        else:
+            self.game_filter_records = self.game_search_index.search(query)
+
+    def _on_game_filter_changed(self):
+        self._filter_game_list()
+        if self.game_filter_job is not None:
+            self.after_cancel(self.game_filter_job)
+        self.game_filter_job = self.after(GAME_FILTER_DEBOUNCE_MS, self._apply_game_filter)
+
+    def _apply_game_filter(self):
+        self.game_filter_job = None
+        self._show_game_list()
+        # 选中的游戏仍在列表中时保持高亮
+        selected = self.current_game_display_name
+        if selected and selected in self.list_widgets:
+            self.list_widgets[selected].configure(fg_color=SELECTED_COLOR)
+            self.selected_game_button = self.list_widgets[selected]
+
+    def _show_game_list(self) -> List[str]:
+        """为符合搜索条件的游戏创建列表按钮，返回显示的名称 (按列表顺序)。"""
+        self._clear_list_widgets()
+        records = self.game_filter_records if self.game_filter_records is not None else self.game_display_names
+        display_names = []
+        for i, record in enumerate(records):
+            display_name = self.game_display_names[record]
+            game_button = ctk.CTkButton(
+                self.list_scroll_frame,
+                text=display_name,
+                command=lambda name=display_name: self._select_game_by_name(name),
+                height=LIST_BUTTON_HEIGHT,
+                fg_color=NORMAL_COLOR,
+                hover_color=SELECTED_COLOR,
+                corner_radius=6,
+                font=ctk.CTkFont(size=12, weight="bold"),
+                anchor="w" 
+            )
+            game_button.grid(row=i, column=0, sticky="ew", padx=0, pady=(1, 1))
+            
+            self.list_widgets[display_name] = game_button
+            display_names.append(display_name)
+        return display_names
+
     def _on_double_click_preview(self, event, media_type: str):
         if not self.current_game_display_name:
             messagebox.showwarning("操作错误", "请先从左侧列表点击选择一个游戏。")
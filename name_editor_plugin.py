@@ -2,18 +2,38 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Union, Tuple
+from typing import Optional, Dict, Any, List, Union, Tuple, Callable, Iterable, Iterator
 import json 
 import os 
 import shutil 
 import xml.etree.ElementTree as ET 
 from datetime import datetime
 import subprocess
-import zlib 
 import sqlite3 
-import hashlib 
+import time
+import threading
+import bisect
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from library_scan import get_library_scan_service, system_from_label
+from fs_watcher import ROOT_GAMELISTS, ROOT_ROMS, FsEvent, get_fs_watcher
+import xml_backend
+from gamelist_journal import journal_for
+from gamelist_loader import GamelistDocument, GamelistLoadCancelled, ProgressCallback
+from gamelist_records import GameRecord, GameRecordIndex, records_for
+from gamelist_repository import GamelistChangedError, get_gamelist_repository
+from gamelist_search import GamelistSearchIndex
+from gamelist_sync import MISSING_ACTIONS, MISSING_KEEP, SyncDelta, SyncResult, apply_sync_delta, compute_sync_delta
+import library_health
+from rom_scanner import (AUTO_SCAN_WORKERS, ExtensionProfile, RomSnapshot, ScanRules, get_snapshot_cache,
+                         iter_rom_files, load_scan_rules, load_system_extension_profiles, scan_rom_files,
+                         take_rom_snapshot)
+from rom_index_lookup import (LookupStats, RomIndexLookup, UserOverrideStore, calculate_rom_hashes,
+                              is_rom_index_available, remember_rom_hashes)
 
 TOOLKIT_CONFIG_FILE = "esde_toolkit_config.json" 
+# 每个系统手动指定的 ROM 后缀，优先于 es_systems.xml 中的 <extension>
+EXTENSION_OVERRIDES_FILE = "system_extension_overrides.json"
 LIST_BUTTON_HEIGHT = 35
 NORMAL_COLOR = "#2A2A2A"  
 SELECTED_ROM_COLOR = "#1F6AA5"  
@@ -23,104 +43,102 @@ DEFAULT_EXTENSIONS = [".zip", ".7z", ".nes", ".sfc", ".n64", ".iso", ".cue", ".c
 DB_DIR = 'db'
 DB_FILENAME = 'rom_master_index.db'
 SQLITE_DB_PATH = Path(__file__).parent / DB_DIR / DB_FILENAME 
-
-def _calculate_hashes_internal(rom_path: Path, start_offset: int) -> Dict[str, Optional[str]]:
-    BUFFER_SIZE = 65536 
-    
+LOOKUP_BATCH_SIZE = 500
+# 批量命名时同时处理的系统数量 (全局 I/O/CPU 预算)
+BATCH_NAMING_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+BATCH_NAMING_LOG_DIR = Path(__file__).parent / "logs"
+# 游戏目录列表的搜索：每次按键都立即过滤，停止输入这么久之后再重建列表按钮
+GAME_FILTER_DEBOUNCE_MS = 150
+# 同步 ROM 的差异预览中每一类最多显示的行数
+SYNC_PREVIEW_LIMIT = 200
+# 自动同步：ROM 目录最后一次变化之后等待这么久再同步，一次复制大量文件只同步一次
+AUTO_SYNC_DELAY_MS = 2000
+
+def _hash_for_lookup(rom_path: Path, skip_nes_header: bool, stats: LookupStats) -> Dict[str, Optional[str]]:
+    hash_start = time.perf_counter()
+    hashes = calculate_rom_hashes(rom_path, skip_nes_header=skip_nes_header)
+    if hashes.get("Size") is None:
+        stats.record_error(f"无法读取文件: {rom_path.name}")
+    stats.record_hash(int(hashes.get("Size") or 0), time.perf_counter() - hash_start)
+    return hashes
+
+
+def _query_lookup_batch(lookup: RomIndexLookup, lookup_items: List[Tuple[Dict[str, Optional[str]], str]],
+                        stats: LookupStats) -> Optional[List[Optional[Tuple[str, str]]]]:
+    # 单个批次的数据库错误计入统计后继续处理后续批次，返回 None 表示该批次失败
     try:
-        hash_crc = 0
-        hash_md5 = hashlib.md5()
-        hash_sha1 = hashlib.sha1()
-        
-        original_file_size = rom_path.stat().st_size
-        size_for_hash = original_file_size - start_offset
-        
-        with open(rom_path, 'rb') as f:
-            if start_offset > 0:
-                f.seek(start_offset)
-            
-            while True:
-                data = f.read(BUFFER_SIZE)
-                if not data:
-                    break
-                hash_crc = zlib.crc32(data, hash_crc) & 0xFFFFFFFF
-                hash_md5.update(data)
-                hash_sha1.update(data)
-
-        calculated_hashes = {
-            "CRC": f"{hash_crc:08X}",
-            "MD5": hash_md5.hexdigest().upper(),
-            "SHA1": hash_sha1.hexdigest().upper(),
-            "Size": str(size_for_hash) 
-        }
-        
-        return calculated_hashes
-            
-    except Exception as e:
-        return {"CRC": None, "MD5": None, "SHA1": None, "Size": None}
+        return lookup.find_game_names(lookup_items)
+    except sqlite3.Error as e:
+        stats.record_error(f"数据库查询失败 ({len(lookup_items)} 个 ROM): {e}", count=len(lookup_items))
+        return None
 
 
-def _calculate_rom_hashes(rom_path: Path, skip_nes_header: bool = False) -> Dict[str, Optional[str]]:
-    
-    is_nes = rom_path.suffix.lower() == ".nes"
-    file_size = rom_path.stat().st_size
-    start_offset = 0
-    
-    # 仅当明确要求跳过头并且是 NES 文件且文件大小足够时才设置偏移量
-    if is_nes and skip_nes_header and file_size > 16:
-        start_offset = 16
-        
-    return _calculate_hashes_internal(rom_path, start_offset)
+def resolve_rom_names(rom_items: List[Tuple[str, Path]], lookup: RomIndexLookup, stats: LookupStats,
+                      progress: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+    """计算哈希并批量查询游戏名，返回 {ROM 文件名: 游戏名}。progress(消息, 颜色) 为可选的进度回调。"""
+    total_roms = len(rom_items)
+    resolved_names: Dict[str, str] = {}
+    nes_retry_items: List[Tuple[str, Path]] = []
+
+    # --- 步骤 1: 计算哈希并批量查询 (NES 文件先尝试跳过 16 字节 iNES Header) ---
+    for batch_start in range(0, total_roms, LOOKUP_BATCH_SIZE):
+        batch = rom_items[batch_start:batch_start + LOOKUP_BATCH_SIZE]
+        lookup_items = []
+        for i, (rom_filename, rom_path) in enumerate(batch, start=batch_start):
+            if progress:
+                progress(f"查询进度: {i+1}/{total_roms} - 正在处理 {rom_filename} (使用本地 DB)...", "#3498DB")
+            is_nes = rom_path.suffix.lower() == ".nes"
+            hashes = _hash_for_lookup(rom_path, is_nes, stats)
+            # 之后在编辑器中确认名称时，本地覆盖库可同时按哈希记录
+            remember_rom_hashes(rom_path, hashes)
+            lookup_items.append((hashes, rom_filename))
+
+        results = _query_lookup_batch(lookup, lookup_items, stats)
+        if results is None:
+            continue
+        for (rom_filename, rom_path), result in zip(batch, results):
+            if result:
+                resolved_names[rom_filename] = result[0]
+                stats.record_result(result)
+            elif rom_path.suffix.lower() == ".nes":
+                nes_retry_items.append((rom_filename, rom_path))
+            else:
+                stats.record_result(None)
+
+    # --- 步骤 2: NES 文件跳过 header 未命中，则使用完整文件再查询一次 ---
+    for batch_start in range(0, len(nes_retry_items), LOOKUP_BATCH_SIZE):
+        batch = nes_retry_items[batch_start:batch_start + LOOKUP_BATCH_SIZE]
+        lookup_items = []
+        for rom_filename, rom_path in batch:
+            if progress:
+                progress(f"查询进度: {rom_filename} (跳过 header 未命中，尝试完整文件)...", "orange")
+            hashes = _hash_for_lookup(rom_path, False, stats)
+            lookup_items.append((hashes, rom_filename))
+
+        results = _query_lookup_batch(lookup, lookup_items, stats)
+        if results is None:
+            continue
+        for (rom_filename, _), result in zip(batch, results):
+            if result:
+                resolved_names[rom_filename] = result[0]
+            stats.record_result(result)
 
+    return resolved_names
 
-def _get_game_name_by_identifiers(hashes: Dict[str, Optional[str]], rom_filename: str) -> Optional[str]:
-    conn = None
-    game_name = None
-    
-    if not SQLITE_DB_PATH.is_file():
-        return None
-        
+
+def _file_mtime_ns(path: Optional[Path]) -> Optional[int]:
     try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
-        cursor = conn.cursor()
-        
-        crc = hashes.get("CRC")
-        md5 = hashes.get("MD5")
-        sha1 = hashes.get("SHA1")
-        
-        if any([crc, md5, sha1]): 
-            # 移除了 Size 字段的查询
-            sql_query_hash = """
-            SELECT GameName FROM RomIndex 
-            WHERE CRC = ? OR MD5 = ? OR SHA1 = ? 
-            """
-            
-            cursor.execute(
-                sql_query_hash, 
-                (crc, md5, sha1) 
-            )
-            
-            result = cursor.fetchone()
-            if result:
-                conn.close()
-                return result[0]
-        
-        if rom_filename:
-            sql_query_name = "SELECT GameName FROM RomIndex WHERE RomFilename = ?"
-            cursor.execute(sql_query_name, (rom_filename,))
-            result = cursor.fetchone()
-            if result:
-                conn.close()
-                return result[0]
-            
-    except sqlite3.Error as e:
-        pass
-        
-    finally:
-        if conn:
-            conn.close()
-            
-    return None
+        return path.stat().st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def backup_gamelist_file(xml_path: Path) -> Path:
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    backup_path = xml_path.parent / f"{xml_path.stem}_{timestamp}.bak"
+    shutil.copy2(xml_path, backup_path)
+    return backup_path
+
 
 class ToolkitConfigLoader:
     def __init__(self):
@@ -130,6 +148,18 @@ class ToolkitConfigLoader:
         self.system_map: Dict[str, Path] = {}
         self.gamelist_base_path: Optional[Path] = None 
         self.current_xml_path: Optional[Path] = None 
+        # 当前系统的共享 gamelist 文档 (与游戏列表编辑器、媒体预览共用)
+        self.current_document: Optional[GamelistDocument] = None
+        # 最近一次 load_gamelist_xml 是否因文件无法读取或解析而失败 (文件不存在不算失败)
+        self.gamelist_load_failed = False
+        # 扫描 ROM 时进入子目录的最大层级，None 表示不限
+        self.scan_max_depth: Optional[int] = None
+        # 并发列目录的线程数：整数、"auto" 或 {目录: 并发数}
+        self.scan_concurrency: Any = AUTO_SCAN_WORKERS
+        self.systems_file_path: Optional[Path] = None
+        self._extension_profiles: Dict[str, ExtensionProfile] = {}
+        self._extension_profiles_mtime: Optional[int] = None
+        self.extension_overrides: Dict[str, List[str]] = self._load_extension_overrides()
 
     def _load_config(self) -> Dict[str, Any]:
         if not self.config_path.is_file():
@@ -151,6 +181,12 @@ class ToolkitConfigLoader:
         gamelist_base_str = config.get("gamelist_base_dir")
         if gamelist_base_str:
             self.gamelist_base_path = Path(gamelist_base_str).resolve()
+
+        max_depth = config.get("scan_max_depth")
+        self.scan_max_depth = int(max_depth) if isinstance(max_depth, (int, str)) and str(max_depth).isdigit() else None
+        self.scan_concurrency = config.get("scan_concurrency", AUTO_SCAN_WORKERS)
+        systems_file_str = config.get("systems_config_file_found_path")
+        self.systems_file_path = Path(systems_file_str) if systems_file_str else None
         
         return self.rom_root_path
 
@@ -159,23 +195,88 @@ class ToolkitConfigLoader:
             self.system_map.clear()
             return False
         self.system_map.clear()
-        for system_dir in self.rom_root_path.iterdir():
-            if system_dir.is_dir(): 
-                self.system_map[system_dir.name] = system_dir
+        listing = get_snapshot_cache().listing(self.rom_root_path)
+        for system_dir_name in (listing[1] if listing else ()):
+            self.system_map[system_dir_name] = self.rom_root_path / system_dir_name
         return bool(self.system_map)
     
     def get_system_names(self) -> List[str]:
         return sorted(list(self.system_map.keys()))
 
-    def get_rom_files_in_system(self, system_name: str, allowed_extensions: List[str]) -> List[Path]:
+    def get_rom_files_in_system(self, system_name: str,
+                                allowed_extensions: Union[List[str], ExtensionProfile]) -> List[Path]:
         system_path = self.system_map.get(system_name)
         if not system_path or not system_path.is_dir(): return []
-        allowed_extensions_set = {ext.lower() for ext in allowed_extensions}
-        rom_files = []
-        for file_path in system_path.rglob('*'): 
-            if file_path.is_file() and file_path.suffix.lower() in allowed_extensions_set:
-                rom_files.append(file_path)
-        return sorted(rom_files, key=lambda p: p.name)
+        return scan_rom_files(system_path, allowed_extensions, cache=get_snapshot_cache(),
+                              rules=self.get_scan_rules(system_name), workers=self.scan_concurrency)
+
+    def iter_rom_file_chunks(self, system_name: str, allowed_extensions: Union[List[str], ExtensionProfile],
+                             force_rescan: bool = False) -> Iterator[List[Path]]:
+        system_path = self.system_map.get(system_name)
+        if not system_path or not system_path.is_dir(): return iter(())
+        return iter_rom_files(system_path, allowed_extensions, cache=get_snapshot_cache(), force=force_rescan,
+                              rules=self.get_scan_rules(system_name), workers=self.scan_concurrency)
+
+    def take_rom_snapshot(self, system_name: str,
+                          allowed_extensions: Union[List[str], ExtensionProfile]) -> RomSnapshot:
+        """系统目录的快照 (与 gamelist 同步用)，缓存和扫描规则与 ROM 列表相同。"""
+        cache = get_snapshot_cache()
+        snapshot = take_rom_snapshot(self.system_map[system_name], allowed_extensions, cache=cache,
+                                     rules=self.get_scan_rules(system_name), workers=self.scan_concurrency)
+        cache.save()
+        return snapshot
+
+    def _load_extension_overrides(self) -> Dict[str, List[str]]:
+        overrides_path = self.config_dir / EXTENSION_OVERRIDES_FILE
+        if not overrides_path.is_file():
+            return {}
+        try:
+            with open(overrides_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {name: list(exts) for name, exts in data.items() if exts}
+        except (OSError, ValueError, AttributeError, TypeError):
+            return {}
+
+    def set_extension_override(self, system_name: str, extensions: Optional[List[str]]):
+        """extensions 为 None 时恢复使用 es_systems.xml 中的后缀。"""
+        if extensions:
+            self.extension_overrides[system_name] = sorted({ext.lower() for ext in extensions})
+        else:
+            self.extension_overrides.pop(system_name, None)
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.config_dir / EXTENSION_OVERRIDES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.extension_overrides, f, ensure_ascii=False, indent=2)
+
+    def _system_extension_profiles(self) -> Dict[str, ExtensionProfile]:
+        """es_systems.xml 中各系统的后缀表，文件修改后自动重新读取。"""
+        mtime_ns = _file_mtime_ns(self.systems_file_path)
+        if mtime_ns != self._extension_profiles_mtime:
+            self._extension_profiles_mtime = mtime_ns
+            self._extension_profiles = {}
+            if mtime_ns is not None:
+                try:
+                    self._extension_profiles = load_system_extension_profiles(self.systems_file_path)
+                except xml_backend.PARSE_ERRORS + (OSError,) as e:
+                    print(f"警告: 读取 {self.systems_file_path} 中的后缀名失败: {e}")
+        return self._extension_profiles
+
+    def get_extension_source(self, system_name: Optional[str]) -> str:
+        if system_name in self.extension_overrides:
+            return "手动"
+        if system_name in self._system_extension_profiles():
+            return "系统配置"
+        return "全局"
+
+    def get_system_extensions(self, system_name: Optional[str], fallback: List[str]) -> ExtensionProfile:
+        """依次使用：手动指定的后缀 -> es_systems.xml 中该系统的 <extension> -> 全局后缀列表。"""
+        if system_name in self.extension_overrides:
+            return ExtensionProfile(self.extension_overrides[system_name])
+        profile = self._system_extension_profiles().get(system_name)
+        return profile if profile is not None else ExtensionProfile(fallback)
+
+    def get_scan_rules(self, system_name: str) -> ScanRules:
+        """ROM 根目录及系统目录下的 .esdeignore、最大深度和隐藏目录规则。"""
+        return load_scan_rules(self.system_map[system_name], self.rom_root_path, max_depth=self.scan_max_depth)
 
     def _find_gamelist_path(self, system_name: str) -> Union[Path, None]:
         if self.gamelist_base_path:
@@ -186,38 +287,273 @@ class ToolkitConfigLoader:
         self.current_xml_path = None
         return None
 
-    def load_gamelist_xml(self, system_name: str) -> Tuple[Optional[ET.Element], Dict[str, Dict[str, Any]]]:
+    def load_gamelist_xml(self, system_name: str, progress: Optional[ProgressCallback] = None,
+                          cancel: Optional[threading.Event] = None
+                          ) -> Tuple[Optional[ET.Element], Optional[str]]:
+        """返回 (根节点, 提示信息)；文件不存在或加载失败时根节点为 None，提示信息说明原因。"""
         gamelist_path = self._find_gamelist_path(system_name) 
+        self.current_document = None
+        self.gamelist_load_failed = False
         if not gamelist_path:
-            return None, self._create_empty_gamelist_structure()
+            return None, "未找到 gamelist.xml。请使用 '同步 ROM' 创建新文件。"
         try:
-            tree = ET.parse(gamelist_path)
-            root = tree.getroot()
-            game_entries = {}
-            index = 0
-            for element in root.findall('game') + root.findall('folder'):
-                path_element = element.find('path')
-                path_value = path_element.text.strip() if path_element is not None and path_element.text else 'N/A'
-                name_element = element.find('name')
-                name_value = name_element.text.strip() if name_element is not None and name_element.text else 'Unknown Game'
-                entry_key = f"ENTRY_{index}"
-                index += 1
-                game_entries[entry_key] = {
-                    "name": name_value,
-                    "path_in_xml": path_value,
-                    "type": element.tag,
-                    "element": element 
-                }
-            return root, dict(sorted(game_entries.items(), key=lambda item: item[1]["name"]))
-        except ET.ParseError:
+            document = get_gamelist_repository().get(gamelist_path, progress=progress, cancel=cancel)
+            self.current_document = document
+            return document.root, None
+        except xml_backend.PARSE_ERRORS:
             self.current_xml_path = None
-            return None, {"XML_PARSE_ERROR": {"name": "错误：gamelist.xml 文件解析失败，可能格式错误。", "path": gamelist_path.as_posix()}}
+            self.gamelist_load_failed = True
+            return None, "错误：gamelist.xml 文件解析失败，可能格式错误。"
         except Exception as e:
             self.current_xml_path = None
-            return None, {"LOAD_ERROR": {"name": f"加载错误: {str(e)}", "path": gamelist_path.as_posix()}}
+            self.gamelist_load_failed = True
+            return None, f"加载错误: {str(e)}"
+
+    @staticmethod
+    def build_entry_map(records: Iterable[GameRecord]) -> Dict[str, GameRecord]:
+        """条目 key -> 记录，按名称排序 (同名时 <game> 在 <folder> 之前)。key 由记录 id 生成，重建后保持不变。"""
+        ordered = sorted(records, key=lambda record: (record.name.strip() or 'Unknown Game', record.tag != 'game'))
+        return {f"ENTRY_{record.id}": record for record in ordered}
+
+
+
+def _normalize_xml_path(path_in_xml: str) -> str:
+    path_value = path_in_xml.strip().replace("\\", "/")
+    while path_value.startswith("./"):
+        path_value = path_value[2:]
+    return path_value
+
+
+class GamelistIndex:
+    """game_entry_map 的辅助索引：文件名 / 相对路径 / 名称 -> 条目 key 列表 (保持插入顺序)。"""
+
+    def __init__(self):
+        self.by_basename: Dict[str, List[str]] = {}
+        self.by_path: Dict[str, List[str]] = {}
+        self.by_name: Dict[str, List[str]] = {}
+
+    def clear(self):
+        self.by_basename.clear()
+        self.by_path.clear()
+        self.by_name.clear()
+
+    def rebuild(self, entry_map: Dict[str, GameRecord]):
+        self.clear()
+        for entry_key, entry in entry_map.items():
+            self.add(entry_key, entry)
+
+    @staticmethod
+    def _add_key(mapping: Dict[str, List[str]], value: str, entry_key: str):
+        if value:
+            mapping.setdefault(value, []).append(entry_key)
+
+    @staticmethod
+    def _remove_key(mapping: Dict[str, List[str]], value: str, entry_key: str):
+        keys = mapping.get(value)
+        if keys and entry_key in keys:
+            keys.remove(entry_key)
+            if not keys:
+                del mapping[value]
+
+    def add(self, entry_key: str, record: GameRecord):
+        path_value = _normalize_xml_path(record.path)
+        self._add_key(self.by_path, path_value, entry_key)
+        self._add_key(self.by_basename, path_value.rsplit("/", 1)[-1], entry_key)
+        self._add_key(self.by_name, record.name.strip(), entry_key)
+
+    def remove(self, entry_key: str, record: GameRecord):
+        path_value = _normalize_xml_path(record.path)
+        self._remove_key(self.by_path, path_value, entry_key)
+        self._remove_key(self.by_basename, path_value.rsplit("/", 1)[-1], entry_key)
+        self._remove_key(self.by_name, record.name.strip(), entry_key)
+
+    def rename(self, entry_key: str, old_name: str, new_name: str):
+        self._remove_key(self.by_name, old_name, entry_key)
+        self._add_key(self.by_name, new_name, entry_key)
+
+    def first_by_basename(self, rom_filename: str) -> Optional[str]:
+        keys = self.by_basename.get(rom_filename)
+        return keys[0] if keys else None
+
+    def has_basename(self, rom_filename: str) -> bool:
+        return rom_filename in self.by_basename
+
+    def keys_by_path(self, path_in_xml: str) -> List[str]:
+        return list(self.by_path.get(_normalize_xml_path(path_in_xml), []))
+
+    def keys_by_name(self, name: str) -> List[str]:
+        return list(self.by_name.get(name, []))
+
+
+class LibraryNamingJob:
+    """对 system_map 中的所有系统执行: 哈希 -> 查询 -> 导入缺失条目 -> 更新名称 -> 备份并保存 gamelist.xml。
+
+    多个系统在同一个线程池中并发处理，线程数即全局的 I/O/CPU 预算。单个系统失败不会中断整个任务。
+    gamelist 通过共享文档仓库读取和保存，其他插件打开着的文档有未保存的修改时跳过该系统。
+    """
+
+    def __init__(self, loader: "ToolkitConfigLoader", extensions: List[str], max_workers: int = BATCH_NAMING_WORKERS,
+                 progress: Optional[Callable[[str], None]] = None):
+        # 界面线程可能随时重新扫描系统 (清空并重建 system_map)，工作线程只读取创建任务时复制的设置
+        self.system_paths: Dict[str, Path] = dict(loader.system_map)
+        self.system_extensions: Dict[str, ExtensionProfile] = {
+            name: loader.get_system_extensions(name, extensions) for name in self.system_paths}
+        self.rom_root_path = loader.rom_root_path
+        self.gamelist_base_path = loader.gamelist_base_path
+        self.scan_max_depth = loader.scan_max_depth
+        self.scan_concurrency = loader.scan_concurrency
+        self.max_workers = max(1, max_workers)
+        self.progress = progress
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self) -> List[Dict[str, Any]]:
+        system_names = sorted(self.system_paths)
+        summaries: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._name_system_safe, name): name for name in system_names}
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                summary = future.result()
+                summaries.append(summary)
+                if self.progress:
+                    self.progress(f"批量命名进度: {done_count}/{len(system_names)} - {summary['system']} {summary['status']}")
+        return sorted(summaries, key=lambda item: item["system"])
+
+    def _name_system_safe(self, system_name: str) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"system": system_name, "status": "失败", "roms": 0, "imported": 0,
+                                   "renamed": 0, "hits": 0, "misses": 0, "errors": 0,
+                                   "saved_to": None, "backup": None, "error": None}
+        if self._cancelled.is_set():
+            summary["status"] = "已取消"
+            return summary
+        try:
+            self._name_system(system_name, summary)
+        except GamelistLoadCancelled:
+            summary["status"] = "已取消"
+        except Exception as e:
+            summary["status"] = "失败"
+            summary["error"] = str(e)
+        return summary
+
+    def _name_system(self, system_name: str, summary: Dict[str, Any]):
+        system_path = self.system_paths[system_name]
+        rom_files: Dict[str, Path] = {}
+        if system_path.is_dir():
+            rules = load_scan_rules(system_path, self.rom_root_path, max_depth=self.scan_max_depth)
+            rom_files = {p.name: p for p in scan_rom_files(system_path, self.system_extensions[system_name],
+                                                           cache=get_snapshot_cache(), rules=rules,
+                                                           workers=self.scan_concurrency)}
+        summary["roms"] = len(rom_files)
+        if not rom_files:
+            summary["status"] = "跳过 (无 ROM)"
+            return
+        if not self.gamelist_base_path:
+            raise ValueError("Gamelist Base 目录未设置")
+
+        xml_path = self.gamelist_base_path / system_name / "gamelist.xml"
+        repository = get_gamelist_repository()
+        document: Optional[GamelistDocument] = None
+        if xml_path.is_file():
+            repository.wait_for_save(xml_path)
+            document = repository.get(xml_path, cancel=self._cancelled)
+            if document.dirty:
+                summary["status"] = "跳过 (gamelist 有未保存的修改)"
+                return
+            root = document.root
+            records = records_for(document)
+        else:
+            root = xml_backend.Element('gameList')
+            records = GameRecordIndex(root)
+        entry_map = ToolkitConfigLoader.build_entry_map(records.records)
+        game_index = GamelistIndex()
+        game_index.rebuild(entry_map)
+
+        # 1-2. 哈希并查询
+        stats = LookupStats(system_name)
+        try:
+            with RomIndexLookup(system_name, stats=stats) as lookup:
+                resolved_names = resolve_rom_names(list(rom_files.items()), lookup, stats)
+        finally:
+            try:
+                stats.append_to_log()
+            except OSError:
+                pass
+        summary.update(hits=stats.total_hits, misses=stats.misses, errors=stats.errors)
+
+        # 查询期间其他插件可能修改了同一份文档
+        if document is not None and document.dirty:
+            summary["status"] = "跳过 (gamelist 有未保存的修改)"
+            return
+
+        # 3. 导入缺失条目
+        new_elements = []
+        for rom_filename, rom_path in rom_files.items():
+            if game_index.has_basename(rom_filename):
+                continue
+            try:
+                xml_path_value = f"./{rom_path.relative_to(system_path).as_posix()}"
+            except ValueError:
+                continue
+            game_element = xml_backend.SubElement(root, 'game')
+            xml_backend.SubElement(game_element, 'path').text = xml_path_value
+            xml_backend.SubElement(game_element, 'name').text = rom_path.stem
+            new_elements.append(game_element)
+        if new_elements and document is not None:
+            for game_element in new_elements:
+                document.mark_dirty(game_element)
+            document.mark_modified()
+        for record in records.records_for_elements(new_elements):
+            entry_key = f"ENTRY_{record.id}"
+            entry_map[entry_key] = record
+            game_index.add(entry_key, record)
+            summary["imported"] += 1
+
+        # 4. 更新名称
+        for rom_filename, game_name in resolved_names.items():
+            entry_key = game_index.first_by_basename(rom_filename)
+            if entry_key is None:
+                continue
+            record = entry_map[entry_key]
+            old_name = record.name.strip()
+            if records.set(record, 'name', game_name):
+                game_index.rename(entry_key, old_name, record.name)
+                summary["renamed"] += 1
+
+        # 5. 备份并保存
+        if not summary["imported"] and not summary["renamed"]:
+            summary["status"] = "无变化"
+            return
+        if xml_path.is_file():
+            summary["backup"] = backup_gamelist_file(xml_path).as_posix()
+        xml_path.parent.mkdir(parents=True, exist_ok=True)
+        # 已有文件只重写改动过的条目
+        if document is not None:
+            repository.save_document(document)
+        else:
+            repository.save(xml_path, root)
+        summary["saved_to"] = xml_path.as_posix()
+        summary["status"] = "已保存"
+
+    @staticmethod
+    def format_report(summaries: List[Dict[str, Any]]) -> str:
+        lines = []
+        for item in summaries:
+            line = (f"{item['system']}: {item['status']} - ROM {item['roms']}, 导入 {item['imported']}, "
+                    f"更新名称 {item['renamed']}, 命中 {item['hits']}, 未命中 {item['misses']}, 错误 {item['errors']}")
+            if item.get("error"):
+                line += f" ({item['error']})"
+            lines.append(line)
+        return "\n".join(lines)
 
-    def _create_empty_gamelist_structure(self) -> Dict[str, Dict[str, str]]:
-        return {"XML_NOT_FOUND": {"name": "未找到 gamelist.xml。请使用 '导入 ROM' 创建新文件。", "path": "N/A"}}
+    @staticmethod
+    def write_report(summaries: List[Dict[str, Any]], log_dir: Path = BATCH_NAMING_LOG_DIR) -> Path:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        report_path = log_dir / f"batch_naming_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        return report_path
 
 
 try:
@@ -248,7 +584,33 @@ class RomListPlugin(ctk.CTkFrame):
         self.current_system_name: Optional[str] = None 
         self.current_xml_root: Optional[ET.Element] = None 
         
-        self.game_entry_map: Dict[str, Dict[str, Any]] = {} 
+        self.game_entry_map: Dict[str, GameRecord] = {} 
+        # 当前 gamelist 的条目记录 (共享文档时与游戏列表编辑器共用)，以及列表为空时显示的提示
+        self.game_records: Optional[GameRecordIndex] = None
+        self.gamelist_notice: Optional[str] = None
+        # gamelist.xml 存在但加载失败 (如无法解析)；此时不自动同步，避免创建新的 gamelist 后保存时覆盖原文件
+        self.gamelist_load_failed = False
+        self.game_index = GamelistIndex()
+        # 游戏目录列表的搜索索引 (按 game_entry_map 的顺序) 和当前过滤结果 (None 表示不过滤)
+        self.game_search_index: Optional[GamelistSearchIndex] = None
+        self.game_filter_records: Optional[List[GameRecord]] = None
+        self.game_filter_var = ctk.StringVar(value="")
+        self.game_filter_job: Optional[str] = None
+        self.library_naming_job: Optional[LibraryNamingJob] = None
+        self.library_health_running = False
+        self.rom_sync_running = False
+        # ROM 目录变化后自动同步 (只应用新增和重新关联，ROM 已不存在的条目留给手动同步处理)
+        self.auto_sync_var = ctk.BooleanVar(value=False)
+        self.auto_sync_job: Optional[str] = None
+        self.rom_sorted_names: List[str] = []
+        self.rom_scan_generation = 0
+        self.rom_scan_running = False
+        self.library_scan = get_library_scan_service()
+        self.library_scan.add_listener(lambda name, summary: self.after(10, self._refresh_system_menu_labels))
+        # 最近一次由本页面加载/保存时 gamelist.xml 的 mtime，用于区分外部修改
+        self.gamelist_mtime_ns: Optional[int] = None
+        get_fs_watcher().add_listener(
+            lambda key, root, events: self.after(10, lambda: self._on_fs_events(key, root, events)))
         self.game_list_widgets: Dict[str, ctk.CTkButton] = {}
         self.selected_game_button: Optional[ctk.CTkButton] = None
         
@@ -284,6 +646,7 @@ class RomListPlugin(ctk.CTkFrame):
         frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 5))
         frame.columnconfigure(0, weight=1)
         frame.columnconfigure(1, weight=0)
+        frame.columnconfigure(2, weight=0)
 
         ctk.CTkLabel(frame, text="系统选择:", anchor="w").grid(row=0, column=0, sticky="w", padx=0, pady=(0, 0))
         
@@ -294,9 +657,13 @@ class RomListPlugin(ctk.CTkFrame):
         self.system_select_menu.grid(row=1, column=0, sticky="ew", padx=(0, 10), pady=(0, 5))
         
         self.ext_select_button = ctk.CTkButton(
-            frame, textvariable=self.extension_button_var, command=self._open_extension_selector, width=100
+            frame, textvariable=self.extension_button_var, command=self._open_extension_selector, width=140
         )
         self.ext_select_button.grid(row=1, column=1, sticky="e", padx=0, pady=(0, 5))
+
+        ctk.CTkButton(
+            frame, text="强制重新扫描", command=self._force_rescan_rom_list, width=90, fg_color="#7F8C8D"
+        ).grid(row=1, column=2, sticky="e", padx=(5, 0), pady=(0, 5))
         
     def _create_rom_list_frame(self, master_frame: ctk.CTkFrame):
         self.rom_list_scroll_frame = ctk.CTkScrollableFrame( 
@@ -306,9 +673,16 @@ class RomListPlugin(ctk.CTkFrame):
         self.rom_list_scroll_frame.columnconfigure(0, weight=1)
 
     def _create_game_list_frame(self, master_frame: ctk.CTkFrame):
-        ctk.CTkLabel(master_frame, text="游戏目录列表 (gamelist.xml 条目)", font=ctk.CTkFont(weight="bold")).grid(
-            row=0, column=0, sticky="w", padx=10, pady=(10, 5)
+        header = ctk.CTkFrame(master_frame, fg_color="transparent")
+        header.grid(row=0, column=0, sticky="ew", padx=10, pady=(10, 5))
+        header.columnconfigure(1, weight=1)
+        ctk.CTkLabel(header, text="游戏目录列表 (gamelist.xml 条目)", font=ctk.CTkFont(weight="bold")).grid(
+            row=0, column=0, sticky="w"
         )
+        ctk.CTkEntry(
+            header, textvariable=self.game_filter_var, placeholder_text="搜索名称/路径，如 mario missing:image"
+        ).grid(row=0, column=1, sticky="ew", padx=(10, 0))
+        self.game_filter_var.trace_add("write", lambda n, i, m: self._on_game_filter_changed())
         
         self.game_list_scroll_frame = ctk.CTkScrollableFrame(
             master_frame, label_text="请先选择系统"
@@ -327,32 +701,163 @@ class RomListPlugin(ctk.CTkFrame):
         )
         btn_get_name.grid(row=0, column=0, sticky="ew")
 
+        ctk.CTkButton(
+            row1, text="导出本地名称", width=90, command=self._export_user_overrides, fg_color="#7F8C8D"
+        ).grid(row=0, column=1, sticky="e", padx=(5, 0))
+        ctk.CTkButton(
+            row1, text="导入本地名称", width=90, command=self._import_user_overrides, fg_color="#7F8C8D"
+        ).grid(row=0, column=2, sticky="e", padx=(5, 0))
+        ctk.CTkCheckBox(
+            row1, text="自动同步 ROM", variable=self.auto_sync_var, width=90
+        ).grid(row=0, column=3, sticky="e", padx=(10, 0))
+
         row2 = ctk.CTkFrame(master_frame, fg_color="transparent")
         row2.grid(row=3, column=0, sticky="ew", padx=10, pady=(0, 10))
         row2.columnconfigure(0, weight=1)
         row2.columnconfigure(1, weight=1)
+        row2.columnconfigure(2, weight=1)
+        row2.columnconfigure(3, weight=1)
         
         btn_import = ctk.CTkButton(
-            row2, text="导入 ROM", command=self._import_roms_to_gamelist, fg_color="#2980B9"
+            row2, text="同步 ROM", command=self._start_rom_sync, fg_color="#2980B9"
         )
         btn_import.grid(row=0, column=0, sticky="ew", padx=(0, 5))
         
         btn_save = ctk.CTkButton(
             row2, text="保存", command=self._open_backup_manager_dialog, fg_color="#F39C12"
         )
-        btn_save.grid(row=0, column=1, sticky="ew", padx=(5, 0))
+        btn_save.grid(row=0, column=1, sticky="ew", padx=5)
+
+        self.btn_name_all = ctk.CTkButton(
+            row2, text="批量命名全部系统", command=self._start_library_naming, fg_color="#8E44AD"
+        )
+        self.btn_name_all.grid(row=0, column=2, sticky="ew", padx=5)
+
+        self.btn_health = ctk.CTkButton(
+            row2, text="库健康报告", command=self._start_library_health_check, fg_color="#16A085"
+        )
+        self.btn_health.grid(row=0, column=3, sticky="ew", padx=(5, 0))
+
+    def _start_library_health_check(self):
+        if self.library_health_running:
+            messagebox.showinfo("库健康报告", "检查正在进行中。")
+            return
+        self.library_health_running = True
+        self.btn_health.configure(state="disabled")
+        self._update_status("正在检查全部系统的 ROM 目录与 gamelist.xml...", "#16A085")
+        threading.Thread(target=self._run_library_health_check, daemon=True).start()
+
+    def _run_library_health_check(self):
+        reports = library_health.check_library(
+            listener=lambda name, report: self.after(
+                10, lambda: self._update_status(f"库健康报告: {report.summary_line()}", "#16A085")))
+        try:
+            report_paths: Optional[Tuple[Path, Path]] = library_health.write_reports(reports)
+        except OSError as e:
+            print(f"警告: 写入库健康报告失败: {e}")
+            report_paths = None
+        self.after(10, lambda: self._complete_library_health_check(reports, report_paths))
+
+    def _complete_library_health_check(self, reports: List["library_health.SystemHealth"],
+                                       report_paths: Optional[Tuple[Path, Path]]):
+        self.library_health_running = False
+        self.btn_health.configure(state="normal")
+        issues = sum(report.issue_count for report in reports)
+        self._update_status(f"库健康报告完成：{len(reports)} 个系统，{issues} 个问题。",
+                            "orange" if issues else "#27AE60")
+        message = library_health.format_report(reports) + "\n\n(检查的是磁盘上的 gamelist.xml，未保存的修改不计入)"
+        if report_paths:
+            message += "\n\nJSON/CSV 报告已保存到:\n" + "\n".join(path.as_posix() for path in report_paths)
+        messagebox.showinfo("库健康报告", message)
+
+    def _start_library_naming(self):
+        if self.library_naming_job is not None:
+            messagebox.showinfo("批量命名", "批量命名任务正在运行中。")
+            return
+        if not self.toolkit_loader.system_map:
+            messagebox.showwarning("操作警告", "未找到任何系统，请先检查 ROM 根目录配置。")
+            return
+        if not is_rom_index_available():
+            messagebox.showerror("数据库错误", f"未找到数据库文件: {SQLITE_DB_PATH.as_posix()}")
+            return
+        if not messagebox.askyesno(
+                "批量命名全部系统",
+                f"将对 {len(self.toolkit_loader.system_map)} 个系统执行：计算哈希、查询名称、导入缺失条目、更新名称，"
+                f"并在备份后直接保存各系统的 gamelist.xml。\n当前页面未保存的修改不会被包含。是否继续？"):
+            return
+
+        self.library_naming_job = LibraryNamingJob(
+            self.toolkit_loader, self.selected_extensions,
+            progress=lambda msg: self.after(10, lambda: self._update_status(msg, "#8E44AD"))
+        )
+        self.btn_name_all.configure(state="disabled")
+        self._update_status(f"批量命名已开始 (并发 {self.library_naming_job.max_workers} 个系统)...", "#8E44AD")
+        threading.Thread(target=self._run_library_naming, args=(self.library_naming_job,), daemon=True).start()
+
+    def _run_library_naming(self, job: "LibraryNamingJob"):
+        summaries = job.run()
+        try:
+            report_path: Optional[Path] = LibraryNamingJob.write_report(summaries)
+        except OSError:
+            report_path = None
+        self.after(10, lambda: self._complete_library_naming(summaries, report_path))
+
+    def _complete_library_naming(self, summaries: List[Dict[str, Any]], report_path: Optional[Path]):
+        self.library_naming_job = None
+        self.btn_name_all.configure(state="normal")
+
+        saved = sum(1 for item in summaries if item["status"] == "已保存")
+        failed = sum(1 for item in summaries if item["status"] == "失败")
+        self._update_status(f"批量命名完成：{saved} 个系统已保存，{failed} 个失败。", "red" if failed else "#27AE60")
+
+        if self.current_system_name and any(
+                item["system"] == self.current_system_name and item["status"] == "已保存" for item in summaries):
+            self._load_games_list(self.current_system_name, force_reload_data=True)
+
+        report = LibraryNamingJob.format_report(summaries)
+        if report_path:
+            report += f"\n\n报告已保存到: {report_path.as_posix()}"
+        messagebox.showinfo("批量命名结果", report)
+
+    def _export_user_overrides(self):
+        export_path = filedialog.asksaveasfilename(
+            title="导出本地名称覆盖库", defaultextension=".json",
+            initialfile="user_rom_names.json", filetypes=[("JSON 文件", "*.json")]
+        )
+        if not export_path:
+            return
+        try:
+            count = UserOverrideStore().export_json(Path(export_path))
+            self._update_status(f"已导出 {count} 条本地名称映射。", "green")
+        except (sqlite3.Error, OSError) as e:
+            messagebox.showerror("导出失败", f"导出本地名称覆盖库时发生错误: {e}")
+
+    def _import_user_overrides(self):
+        import_path = filedialog.askopenfilename(
+            title="导入本地名称覆盖库", filetypes=[("JSON 文件", "*.json")]
+        )
+        if not import_path:
+            return
+        try:
+            count = UserOverrideStore().import_json(Path(import_path))
+            self._update_status(f"已导入 {count} 条本地名称映射。", "green")
+        except (sqlite3.Error, OSError, ValueError) as e:
+            messagebox.showerror("导入失败", f"导入本地名称覆盖库时发生错误: {e}")
 
     def _open_get_game_name_dialog(self):
         if not self.current_system_name:
             self._update_status("请先选择一个系统。", "red")
             messagebox.showwarning("操作警告", "请先选择一个系统。")
             return
+        if self.rom_scan_running:
+            self._update_status("ROM 列表仍在扫描中，请稍候。", "orange")
+            return
         
         self._perform_db_query_and_update()
 
     def _perform_db_query_and_update(self): 
         
-        if not SQLITE_DB_PATH.is_file():
+        if not is_rom_index_available():
             self._update_status(f"错误：未找到数据库文件 {SQLITE_DB_PATH.name}。", "red")
             messagebox.showerror("数据库错误", f"未找到数据库文件: {SQLITE_DB_PATH.as_posix()}")
             return
@@ -362,67 +867,60 @@ class RomListPlugin(ctk.CTkFrame):
             messagebox.showwarning("操作警告", "ROM 文件列表为空。")
             return
         
-        if not self.game_entry_map or list(self.game_entry_map.keys())[0].startswith(("XML_", "LOAD_")):
-            self._update_status("游戏目录列表为空，请先使用 '导入 ROM'。", "orange")
-            messagebox.showwarning("操作警告", "游戏目录列表为空，请先导入 ROM。")
+        if not self.game_entry_map:
+            self._update_status("游戏目录列表为空，请先使用 '同步 ROM'。", "orange")
+            messagebox.showwarning("操作警告", "游戏目录列表为空，请先同步 ROM。")
             return
 
         newly_updated_count = 0
+        records = self._current_records()
         rom_items = list(self.rom_files.items()) 
-        total_roms = len(rom_items)
-        game_keys = list(self.game_entry_map.keys()) 
+        stats = LookupStats(self.current_system_name)
         
-        for i, (rom_filename, rom_path) in enumerate(rom_items):
-            self._update_status(f"查询进度: {i+1}/{total_roms} - 正在处理 {rom_filename} (使用本地 DB)...", "#3498DB")
-            self.update_idletasks() 
-            
-            is_nes = rom_path.suffix.lower() == ".nes"
-            game_name = None
-            
-            # --- 步骤 1: 尝试 iNES Header Skip 方式 (仅限 NES) ---
-            if is_nes:
-                # 尝试跳过 16 字节头
-                hashes = _calculate_rom_hashes(rom_path, skip_nes_header=True)
-                game_name = _get_game_name_by_identifiers(hashes, rom_filename) 
-                
-                # --- 步骤 2: 如果是 NES 文件且未找到，则尝试不跳过 16 字节 ---
-                if not game_name:
-                    self._update_status(f"查询进度: {i+1}/{total_roms} - {rom_filename} (跳过 header 未命中，尝试完整文件)...", "orange")
-                    # 尝试完整文件
-                    hashes = _calculate_rom_hashes(rom_path, skip_nes_header=False)
-                    game_name = _get_game_name_by_identifiers(hashes, rom_filename)
-            else:
-                # --- 非 NES 文件，直接使用完整文件进行哈希计算 (即不跳过) ---
-                hashes = _calculate_rom_hashes(rom_path, skip_nes_header=False)
-                game_name = _get_game_name_by_identifiers(hashes, rom_filename)
-            
-            if game_name:
-                
-                match_found = False
-                for entry_key in game_keys:
-                    entry = self.game_entry_map[entry_key]
-                    path_in_xml = Path(entry.get('path_in_xml', "")).name
-                    
-                    if path_in_xml == rom_filename:
-                        if entry['name'] != game_name:
-                            entry['name'] = game_name 
-                            
-                            game_element: ET.Element = entry['element']
-                            name_element = game_element.find('name')
-                            if name_element is None:
-                                name_element = ET.SubElement(game_element, 'name')
-                            name_element.text = game_name
-                            
-                            newly_updated_count += 1
-                            match_found = True
-                        break
-
+        try:
+            with RomIndexLookup(self.current_system_name, stats=stats) as lookup:
+                resolved_names = self._resolve_rom_names(rom_items, lookup, stats)
+        except (sqlite3.Error, OSError) as e:
+            self._update_status(f"数据库查询失败: {e}", "red")
+            messagebox.showerror("数据库错误", f"查询本地数据库时发生错误: {e}")
+            return
+        finally:
+            self._log_lookup_stats(stats)
+        
+        for rom_filename, game_name in resolved_names.items():
+            entry_key = self.game_index.first_by_basename(rom_filename)
+            if entry_key is None:
+                continue
             
+            record = self.game_entry_map[entry_key]
+            old_name = record.name.strip()
+            # 只修改记录并标记共享文档，保存时才写回 XML
+            if records.set(record, 'name', game_name):
+                self.game_index.rename(entry_key, old_name, record.name)
+                newly_updated_count += 1
+
+        summary = f"命中 {stats.total_hits} / 未命中 {stats.misses} / 错误 {stats.errors}"
         if newly_updated_count > 0:
             self._load_games_list(self.current_system_name, force_reload_data=False) 
-            self._update_status(f"查询完成，成功更新了 {newly_updated_count} 个游戏名称。请点击 '保存' 按钮。", "#27AE60")
+            self._update_status(f"查询完成，成功更新了 {newly_updated_count} 个游戏名称 ({summary})。请点击 '保存' 按钮。", "#27AE60")
         else:
-            self._update_status("查询完成，没有找到或更新任何游戏名称。", "orange")
+            self._update_status(f"查询完成，没有找到或更新任何游戏名称 ({summary})。", "orange")
+
+        if stats.errors:
+            messagebox.showwarning("查询统计 (存在错误)", stats.format_report())
+        else:
+            messagebox.showinfo("查询统计", stats.format_report())
+
+    def _log_lookup_stats(self, stats: LookupStats):
+        # 统计已显示在状态栏和查询统计对话框中，这里只写入 logs/rom_lookup_metrics.jsonl
+        try:
+            stats.append_to_log()
+        except OSError as e:
+            print(f"警告: 写入查询统计日志失败: {e}")
+
+    def _resolve_rom_names(self, rom_items: List[Tuple[str, Path]], lookup: RomIndexLookup,
+                           stats: LookupStats) -> Dict[str, str]:
+        return resolve_rom_names(rom_items, lookup, stats, progress=self._update_status)
 
     def _open_extension_selector(self):
         for widget in self.winfo_children():
@@ -430,75 +928,201 @@ class RomListPlugin(ctk.CTkFrame):
                 widget.lift()
                 return
 
-        ext_dialog = ExtensionSelectorDialog(self, self.selected_extensions)
+        system_name = self.current_system_name if self.current_system_name in self.toolkit_loader.system_map else None
+        ext_dialog = ExtensionSelectorDialog(self, list(self._current_extension_profile()), system_name)
         ext_dialog.grab_set()
 
-    def _on_extensions_applied(self, new_extensions: List[str]):
+    def _current_extension_profile(self) -> ExtensionProfile:
+        return self.toolkit_loader.get_system_extensions(self.current_system_name, self.selected_extensions)
+
+    def _update_extension_button(self):
+        source = self.toolkit_loader.get_extension_source(self.current_system_name)
+        self.extension_button_var.set(f"后缀名 ({len(self._current_extension_profile())}, {source})")
+
+    def _on_extensions_applied(self, new_extensions: List[str], system_name: Optional[str] = None):
         
         new_extensions = [ext.lower() for ext in new_extensions if ext.startswith(".")]
         
         if not new_extensions:
             new_extensions = DEFAULT_EXTENSIONS 
             self._update_status("警告：未选择任何有效后缀，已重置为默认后缀。", "orange")
-            
-        self.selected_extensions = new_extensions
-        self.extension_button_var.set(f"后缀名 ({len(self.selected_extensions)})")
+
+        if system_name:
+            try:
+                self.toolkit_loader.set_extension_override(system_name, new_extensions)
+            except OSError as e:
+                self._update_status(f"保存系统后缀设置失败: {e}", "red")
+                return
+        else:
+            self.selected_extensions = new_extensions
+        self._update_extension_button()
+        scope = f"系统 {system_name}" if system_name else "全局"
         
         if self.current_system_name:
             self._load_rom_list(self.current_system_name)
-            self._update_status(f"ROM 后缀已更新，共 {len(self.selected_extensions)} 种。已刷新 ROM 列表。", "#2ECC71")
+            self._update_status(f"{scope} ROM 后缀已更新，共 {len(new_extensions)} 种。已刷新 ROM 列表。", "#2ECC71")
         else:
-            self._update_status(f"ROM 后缀已更新，共 {len(self.selected_extensions)} 种。", "#2ECC71")
+            self._update_status(f"{scope} ROM 后缀已更新，共 {len(new_extensions)} 种。", "#2ECC71")
+
+    def _on_extension_override_cleared(self, system_name: str):
+        try:
+            self.toolkit_loader.set_extension_override(system_name, None)
+        except OSError as e:
+            self._update_status(f"保存系统后缀设置失败: {e}", "red")
+            return
+        self._update_extension_button()
+        if self.current_system_name:
+            self._load_rom_list(self.current_system_name)
+        self._update_status(f"系统 {system_name} 已恢复使用{self.toolkit_loader.get_extension_source(system_name)}后缀。", "#2ECC71")
+
+    def _report_gamelist_progress(self, done: int, read_bytes: int, total_bytes: int):
+        # 在主线程中同步加载，需要主动刷新界面才能显示进度
+        percent = read_bytes * 100 // total_bytes if total_bytes else 100
+        self._update_status(f"正在加载 gamelist.xml: {done} 个条目 ({percent}%)", "#3498DB")
+        self.update_idletasks()
+
+    def _mark_document_modified(self, elements: Iterable[ET.Element] = ()):
+        """elements 为被修改或新增的条目；共享文档据此记录未保存的修改并通知其他插件刷新列表。"""
+        document = self.toolkit_loader.current_document
+        if document is not None and document.root is self.current_xml_root:
+            for element in elements:
+                document.mark_dirty(element)
+            document.mark_modified()
+
+    def _current_records(self) -> GameRecordIndex:
+        """当前根节点的条目记录；没有根节点 (尚无 gamelist.xml) 时先创建空的 <gameList>。"""
+        if self.current_xml_root is None:
+            self.current_xml_root = xml_backend.Element('gameList')
+            self.gamelist_load_failed = False
+        if self.game_records is None or self.game_records.root is not self.current_xml_root:
+            document = self.toolkit_loader.current_document
+            if document is not None and document.root is self.current_xml_root:
+                self.game_records = records_for(document)
+            else:
+                self.game_records = GameRecordIndex(self.current_xml_root)
+        return self.game_records
 
     def _load_games_list(self, system_name: str, force_reload_data: bool = True):
+        if force_reload_data:
+            self.current_xml_root, self.gamelist_notice = self.toolkit_loader.load_gamelist_xml(
+                system_name, progress=self._report_gamelist_progress)
+            self.game_records = None
+            self.gamelist_load_failed = self.toolkit_loader.gamelist_load_failed
+            # 加载失败或尚无文件时不创建空的根节点，直到用户同步或添加条目
+            records = self._current_records().records if self.current_xml_root is not None else []
+            self.game_entry_map = ToolkitConfigLoader.build_entry_map(records)
+            self.game_index.rebuild(self.game_entry_map)
+            self.gamelist_mtime_ns = _file_mtime_ns(self.toolkit_loader.current_xml_path)
+        else:
+            self.game_entry_map = ToolkitConfigLoader.build_entry_map(self.game_entry_map.values())
+
+        self._rebuild_game_search_index()
+        self._show_games_list(system_name)
+
+    def _rebuild_game_search_index(self):
+        # 列表顺序随改名和增删变化，索引每次按新的顺序重建；n-gram 倒排表在后台建立
+        search_index = GamelistSearchIndex(self.game_entry_map.values())
+        self.game_search_index = search_index
+        threading.Thread(target=search_index.build_ngrams, daemon=True).start()
+        self._filter_games_list()
+
+    def _update_games_list(self, system_name: str, added: List[GameRecord], removed: List[GameRecord]):
+        """条目增删后只创建/销毁受影响的按钮，其余按钮保留，按新的顺序调整行号。"""
+        for record in removed:
+            entry_key = f"ENTRY_{record.id}"
+            if self.game_entry_map.pop(entry_key, None) is None:
+                continue
+            self.game_index.remove(entry_key, record)
+            btn = self.game_list_widgets.pop(entry_key, None)
+            if btn is not None:
+                if btn is self.selected_game_button:
+                    self.selected_game_button = None
+                btn.destroy()
+        for record in added:
+            entry_key = f"ENTRY_{record.id}"
+            self.game_entry_map[entry_key] = record
+            self.game_index.add(entry_key, record)
+        if added:
+            self.gamelist_notice = None
+        self.game_entry_map = ToolkitConfigLoader.build_entry_map(self.game_entry_map.values())
+        self._rebuild_game_search_index()
+
+        # 有搜索条件、或列表从空变为非空 (需去掉提示文字) 时整体重建
+        if self.game_filter_records is not None or not self.game_list_widgets or not self.game_entry_map:
+            self._show_games_list(system_name)
+            return
+        if added:
+            for record in added:
+                entry_key = f"ENTRY_{record.id}"
+                self.game_list_widgets[entry_key] = self._create_game_button(entry_key, record, 0)
+            for i, entry_key in enumerate(self.game_entry_map):
+                self.game_list_widgets[entry_key].grid_configure(row=i)
+        self.game_list_scroll_frame.configure(
+            label_text=f"系统 '{system_name}' 游戏目录 ({len(self.game_entry_map)} 个条目)")
+
+    def _create_game_button(self, entry_key: str, record: GameRecord, row: int) -> ctk.CTkButton:
+        # 保持右侧列表简洁，只显示名称和类型
+        display_text = f"[{record.tag.upper()}] {record.name.strip() or 'Unknown Game'}"
+
+        btn = ctk.CTkButton(
+            self.game_list_scroll_frame,
+            text=display_text,
+            height=LIST_BUTTON_HEIGHT,
+            fg_color=NORMAL_COLOR,
+            command=lambda key=entry_key: self._on_game_select(key),
+            anchor="w"
+        )
+        btn.grid(row=row, column=0, sticky="ew", padx=5, pady=(2, 2))
+        return btn
+
+    def _filter_games_list(self):
+        query = self.game_filter_var.get() or ""
+        if self.game_search_index is None or not query.strip():
+            self.game_filter_records = None
+        else:
+            self.game_filter_records = self.game_search_index.search(query)
+
+    def _on_game_filter_changed(self):
+        self._filter_games_list()
+        if self.game_filter_job is not None:
+            self.after_cancel(self.game_filter_job)
+        self.game_filter_job = self.after(GAME_FILTER_DEBOUNCE_MS, self._apply_game_filter)
+
+    def _apply_game_filter(self):
+        self.game_filter_job = None
+        if self.current_system_name:
+            self._show_games_list(self.current_system_name)
+
+    def _show_games_list(self, system_name: str):
+        """按 game_entry_map 的顺序显示符合搜索条件的条目。"""
         for widget in self.game_list_scroll_frame.winfo_children():
             widget.destroy()
         self.game_list_widgets.clear()
         self.selected_game_button = None
-        
-        if force_reload_data:
-            self.game_entry_map.clear()
-            self.current_xml_root, self.game_entry_map = self.toolkit_loader.load_gamelist_xml(system_name)
-
-        game_keys = list(self.game_entry_map.keys())
-        displayable_entries = [key for key in game_keys if not key.startswith(("XML_", "LOAD_"))]
-
-        has_error = not displayable_entries and (game_keys and game_keys[0].startswith(("XML_", "LOAD_")))
 
-        if self.current_xml_root is None: 
-            self.current_xml_root = ET.Element('gameList')
-                 
-        if has_error: 
-            error_key = game_keys[0] if game_keys else "NO_ENTRIES"
-            error_data = self.game_entry_map.get(error_key, {"name": "gamelist.xml 中没有游戏条目。", "path": "N/A"})
+        if self.game_filter_records is None:
+            displayable_entries = list(self.game_entry_map)
+        else:
+            displayable_entries = [f"ENTRY_{record.id}" for record in self.game_filter_records]
 
+        if not self.game_entry_map: 
             initial_label = ctk.CTkLabel(
                 self.game_list_scroll_frame, 
-                text=error_data['name'], 
-                text_color="red" if "ERROR" in error_key or "NOT_FOUND" in error_key else "gray"
+                text=self.gamelist_notice or "gamelist.xml 中没有游戏条目。", 
+                text_color="red" if self.gamelist_notice else "gray"
             )
             initial_label.grid(row=0, column=0, sticky="nsew", padx=10, pady=50)
             self.game_list_scroll_frame.configure(label_text=f"系统 '{system_name}' 游戏目录 (0 个条目)")
             return
 
         for i, entry_key in enumerate(displayable_entries):
-            entry_data = self.game_entry_map[entry_key]
-            
-            # 保持右侧列表简洁，只显示名称和类型
-            display_text = f"[{entry_data['type'].upper()}] {entry_data['name']}"
-            
-            btn = ctk.CTkButton(
-                self.game_list_scroll_frame, 
-                text=display_text, 
-                height=LIST_BUTTON_HEIGHT,
-                fg_color=NORMAL_COLOR,
-                command=lambda key=entry_key: self._on_game_select(key),
-                anchor="w"
-            )
-            btn.grid(row=i, column=0, sticky="ew", padx=5, pady=(2, 2))
-            self.game_list_widgets[entry_key] = btn
+            self.game_list_widgets[entry_key] = self._create_game_button(entry_key, self.game_entry_map[entry_key], i)
 
-        self.game_list_scroll_frame.configure(label_text=f"系统 '{system_name}' 游戏目录 ({len(displayable_entries)} 个条目)")
+        if self.game_filter_records is None:
+            count_text = f"{len(displayable_entries)} 个条目"
+        else:
+            count_text = f"显示 {len(displayable_entries)} / {len(self.game_entry_map)} 个条目"
+        self.game_list_scroll_frame.configure(label_text=f"系统 '{system_name}' 游戏目录 ({count_text})")
         
 
     def _highlight_matching_game(self, rom_filename: str):
@@ -509,17 +1133,16 @@ class RomListPlugin(ctk.CTkFrame):
         self.selected_game_button = None
 
         match_found = False
-        for entry_key, entry_data in self.game_entry_map.items():
-            path_in_xml = entry_data.get('path_in_xml', "")
-            if Path(path_in_xml).name == rom_filename:
-                btn = self.game_list_widgets.get(entry_key)
-                if btn:
-                    btn.configure(fg_color=SELECTED_ROM_COLOR)
-                    self.selected_game_button = btn
-                    match_found = True
-                    break 
+        entry_key = self.game_index.first_by_basename(rom_filename)
+        btn = self.game_list_widgets.get(entry_key) if entry_key else None
+        if btn:
+            btn.configure(fg_color=SELECTED_ROM_COLOR)
+            self.selected_game_button = btn
+            match_found = True
         
-        if not match_found:
+        if not match_found and entry_key:
+            self._update_status(f"ROM: {rom_filename} 的匹配条目不符合当前搜索条件，未在列表中显示。", "orange")
+        elif not match_found:
              self._update_status(f"ROM: {rom_filename} 在 gamelist.xml 中没有匹配条目。", "orange")
 
     def _on_game_select(self, entry_key: str):
@@ -531,10 +1154,10 @@ class RomListPlugin(ctk.CTkFrame):
         new_button.configure(fg_color=SELECTED_GAME_COLOR)
         self.selected_game_button = new_button
         
-        entry_data = self.game_entry_map.get(entry_key, {})
-        raw_path = entry_data.get("path_in_xml", "N/A")
+        record = self.game_entry_map.get(entry_key)
+        raw_path = record.path.strip() if record is not None else ""
         
-        if raw_path and raw_path != 'N/A':
+        if raw_path:
             rom_filename_display = Path(raw_path).name 
         else:
             rom_filename_display = "未关联 ROM 文件"
@@ -542,28 +1165,54 @@ class RomListPlugin(ctk.CTkFrame):
         self._update_status(f"已选中游戏目录条目，关联 ROM 文件: {rom_filename_display}", SELECTED_GAME_COLOR)
 
     
-    def _load_rom_list(self, system_name: str):
+    def _load_rom_list(self, system_name: str, force_rescan: bool = False):
         
         for widget in self.rom_list_scroll_frame.winfo_children():
             widget.destroy()
         self.rom_list_widgets.clear()
         self.selected_rom_button = None
         self.rom_files.clear() 
+        self.rom_sorted_names = []
         
-        rom_paths = self.toolkit_loader.get_rom_files_in_system(
-            system_name, 
-            self.selected_extensions
-        )
-
-        if not rom_paths:
-            self.rom_list_scroll_frame.configure(label_text=f"ROM 文件列表 ({system_name}, 0 个文件)")
+        # 扫描在后台线程进行，结果按块回到主线程追加；切换系统后旧扫描的结果通过 generation 丢弃
+        self.rom_scan_generation += 1
+        self.rom_scan_running = True
+        self.rom_list_scroll_frame.configure(label_text=f"ROM 文件列表 ({system_name}, 正在扫描...)")
+        threading.Thread(
+            target=self._scan_rom_list_worker,
+            args=(system_name, self._current_extension_profile(), self.rom_scan_generation, force_rescan),
+            daemon=True
+        ).start()
+
+    def _force_rescan_rom_list(self):
+        if not self.current_system_name or self.current_system_name not in self.toolkit_loader.system_map:
+            self._update_status("请先选择一个系统。", "orange")
             return
+        self._update_status(f"正在强制重新扫描 {self.current_system_name}...", "#3498DB")
+        self._load_rom_list(self.current_system_name, force_rescan=True)
 
-        for i, rom_path in enumerate(rom_paths):
+    def _scan_rom_list_worker(self, system_name: str, extensions: ExtensionProfile, generation: int,
+                              force_rescan: bool):
+        try:
+            for chunk in self.toolkit_loader.iter_rom_file_chunks(system_name, extensions, force_rescan):
+                if generation != self.rom_scan_generation:
+                    return
+                self.after(10, lambda c=chunk: self._append_rom_chunk(system_name, c, generation))
+        finally:
+            self.after(10, lambda: self._finish_rom_scan(system_name, generation))
+
+    def _append_rom_chunk(self, system_name: str, chunk: List[Path], generation: int):
+        if generation != self.rom_scan_generation:
+            return
+        
+        for rom_path in chunk:
             display_name = rom_path.name
+            if display_name in self.rom_files:
+                continue
             
             # 使用文件名作为 key，完整 Path 作为 value
             self.rom_files[display_name] = rom_path
+            bisect.insort(self.rom_sorted_names, display_name)
             
             btn = ctk.CTkButton(
                 self.rom_list_scroll_frame, 
@@ -573,13 +1222,95 @@ class RomListPlugin(ctk.CTkFrame):
                 command=lambda name=display_name: self._on_rom_select(name), 
                 anchor="w"
             )
-            btn.grid(row=i, column=0, sticky="ew", padx=5, pady=(2, 2))
+            btn.grid(row=len(self.rom_list_widgets), column=0, sticky="ew", padx=5, pady=(2, 2))
             self.rom_list_widgets[display_name] = btn
 
-        self.rom_list_scroll_frame.configure(label_text=f"ROM 文件列表 ({system_name}, {len(rom_paths)} 个文件)")
+        self.rom_list_scroll_frame.configure(label_text=f"ROM 文件列表 ({system_name}, 已找到 {len(self.rom_files)} 个文件...)")
+
+    def _finish_rom_scan(self, system_name: str, generation: int):
+        if generation != self.rom_scan_generation:
+            return
+        self.rom_scan_running = False
+
+        # 扫描期间按到达顺序追加，结束后一次性按文件名重新排列
+        self._regrid_rom_rows(system_name)
+        
+        if self.rom_sorted_names:
+            self._on_rom_select(self.rom_sorted_names[0])
+
+        game_count = len(self.game_entry_map)
+        self._update_status(f"成功加载 {len(self.rom_files)} 个 ROM 文件和 {game_count} 个游戏目录。", "#2ECC71")
+
+    def _regrid_rom_rows(self, system_name: str):
+        self.rom_files = {name: self.rom_files[name] for name in self.rom_sorted_names}
+        for i, name in enumerate(self.rom_sorted_names):
+            self.rom_list_widgets[name].grid_configure(row=i)
+        self.rom_list_scroll_frame.configure(label_text=f"ROM 文件列表 ({system_name}, {len(self.rom_files)} 个文件)")
+
+    def _on_fs_events(self, root_key: str, root: Path, events: List[FsEvent]):
+        if root_key == ROOT_ROMS:
+            self._apply_rom_events(root, events)
+        elif root_key == ROOT_GAMELISTS:
+            self._check_external_gamelist_change(events)
+
+    def _apply_rom_events(self, root: Path, events: List[FsEvent]):
+        """只增删受影响的 ROM 行，不重新扫描整个系统。"""
+        systems_changed = False
+        current_system_changed = False
+        added: List[Path] = []
+        # 系统目录内的相对路径；同名文件可能位于不同子目录
+        removed: List[Path] = []
+        extensions = self._current_extension_profile()
+        for event in events:
+            parts = event.relative_parts(root)
+            if len(parts) == 1 and event.is_dir:
+                systems_changed = True
+                continue
+            if len(parts) > 1 and parts[0] == self.current_system_name:
+                current_system_changed = True
+            if (not parts or event.is_dir or parts[0] != self.current_system_name or self.rom_scan_running
+                    or not extensions.matches(event.path.name)):
+                continue
+            if event.kind == "added":
+                added.append(event.path)
+            elif event.kind == "removed":
+                removed.append(Path(*parts[1:]))
 
-        if rom_paths:
-             self._on_rom_select(rom_paths[0].name) 
+        system_path = self.toolkit_loader.system_map.get(self.current_system_name)
+        for relative_path in removed:
+            rom_name = relative_path.name
+            rom_path = self.rom_files.get(rom_name)
+            if rom_path is None or system_path is None or rom_path != system_path / relative_path:
+                continue
+            del self.rom_files[rom_name]
+            self.rom_sorted_names.remove(rom_name)
+            btn = self.rom_list_widgets.pop(rom_name)
+            if btn is self.selected_rom_button:
+                self.selected_rom_button = None
+            btn.destroy()
+        if added:
+            self._append_rom_chunk(self.current_system_name, added, self.rom_scan_generation)
+        if added or removed:
+            self._regrid_rom_rows(self.current_system_name)
+            self._update_status(f"检测到 ROM 目录变化：新增 {len(added)} 个，移除 {len(removed)} 个文件。", "#3498DB")
+        if current_system_changed and self.auto_sync_var.get():
+            self._schedule_auto_sync()
+
+        if systems_changed and self.toolkit_loader.rom_root_path and self.toolkit_loader.scan_systems():
+            self._refresh_system_menu_labels()
+
+    def _check_external_gamelist_change(self, events: List[FsEvent]):
+        xml_path = self.toolkit_loader.current_xml_path
+        if not xml_path:
+            return
+        for event in events:
+            if event.kind == "modified" and event.path.name == xml_path.name and event.path.parent.name == xml_path.parent.name:
+                # 其他插件保存同一份共享文档时签名随之更新，不算外部修改
+                document = self.toolkit_loader.current_document
+                if _file_mtime_ns(xml_path) not in (self.gamelist_mtime_ns,
+                                                    document.mtime_ns if document is not None else None):
+                    self._update_status("gamelist.xml 已被外部程序修改，重新选择系统即可加载最新内容。", "orange")
+                return
 
     def _on_rom_select(self, rom_name: str): 
         if self.selected_rom_button:
@@ -592,78 +1323,118 @@ class RomListPlugin(ctk.CTkFrame):
         self._highlight_matching_game(rom_name)
         self._update_status(f"已选中 ROM: {rom_name}，并高亮右侧匹配游戏。", SELECTED_ROM_COLOR)
 
-    def _import_roms_to_gamelist(self):
-        if not self.current_system_name:
+    def _schedule_auto_sync(self):
+        if self.auto_sync_job is not None:
+            self.after_cancel(self.auto_sync_job)
+        self.auto_sync_job = self.after(AUTO_SYNC_DELAY_MS, self._run_auto_sync)
+
+    def _run_auto_sync(self):
+        self.auto_sync_job = None
+        # 加载失败 (如 gamelist.xml 无法解析) 时不自动创建新的 gamelist，避免保存时覆盖原文件
+        if self.gamelist_load_failed:
+            return
+        if self.rom_sync_running:
+            self._schedule_auto_sync()
+            return
+        self._start_rom_sync(automatic=True)
+
+    def _start_rom_sync(self, automatic: bool = False):
+        """在后台取得系统目录的快照，与当前条目比较后预览差异；自动同步时直接应用新增和重新关联。"""
+        system_name = self.current_system_name
+        if not system_name:
             self._update_status("请先选择一个系统。", "red")
             return
-            
-        if not self.rom_files:
-            self._update_status("ROM 文件列表为空，无法导入。", "orange")
+        if system_name not in self.toolkit_loader.system_map:
+            self._update_status(f"错误：无法获取系统 '{system_name}' 的 ROM 路径，同步失败。", "red")
             return
-            
-        if self.current_xml_root is None:
-            self.current_xml_root = ET.Element('gameList')
-            
-        existing_rom_filenames = {
-            Path(data['path_in_xml']).name
-            for data in self.game_entry_map.values()
-            if data.get('path_in_xml')
-        }
-        
-        # 获取系统 ROM 目录的 Path 对象
-        system_path = self.toolkit_loader.system_map.get(self.current_system_name)
-        if not system_path:
-            self._update_status(f"错误：无法获取系统 '{self.current_system_name}' 的 ROM 路径，导入失败。", "red")
+        if self.rom_sync_running:
+            self._update_status("正在比较 ROM 目录，请稍候。", "orange")
+            return
+        self.rom_sync_running = True
+        if not automatic:
+            self._update_status(f"正在比较 {system_name} 的 ROM 目录与 gamelist.xml...", "#3498DB")
+        threading.Thread(
+            target=self._run_rom_sync, args=(system_name, self._current_extension_profile(), automatic), daemon=True
+        ).start()
+
+    def _run_rom_sync(self, system_name: str, extensions: ExtensionProfile, automatic: bool):
+        try:
+            snapshot: Optional[RomSnapshot] = self.toolkit_loader.take_rom_snapshot(system_name, extensions)
+            error = None
+        except OSError as e:
+            snapshot, error = None, str(e)
+        self.after(10, lambda: self._complete_rom_sync(system_name, snapshot, error, automatic))
+
+    def _complete_rom_sync(self, system_name: str, snapshot: Optional[RomSnapshot], error: Optional[str],
+                           automatic: bool):
+        self.rom_sync_running = False
+        # 比较期间切换了系统，结果作废
+        if system_name != self.current_system_name or (automatic and self.gamelist_load_failed):
+            return
+        if snapshot is None:
+            self._update_status(f"读取 ROM 目录失败: {error}", "red")
+            return
+        delta = compute_sync_delta(self._current_records().records, snapshot)
+        if automatic:
+            if delta.added or delta.relinks:
+                self._apply_rom_sync(delta, MISSING_KEEP, include_missing=False)
             return
+        if delta.is_empty:
+            self._update_status("gamelist.xml 与 ROM 目录一致，无需同步。", "#27AE60")
+            return
+        RomSyncDialog(self, delta)
 
-        new_entries_count = 0
-        new_game_entries = {}
-        
-        for rom_filename, rom_path in self.rom_files.items():
-            
-            if rom_filename not in existing_rom_filenames:
-                
-                # --- 关键修改：计算相对于系统目录的路径 ---
-                try:
-                    # 1. 计算相对路径 (e.g., subdir/game.sfc)
-                    relative_path = rom_path.relative_to(system_path) 
-                    # 2. 格式化为 XML 所需的路径 (e.g., ./subdir/game.sfc)
-                    xml_path_value = f"./{relative_path.as_posix()}" 
-                except ValueError as e:
-                    self._update_status(f"路径计算错误: {rom_path.name} 不在系统目录中。跳过。", "orange")
-                    continue
-                # ----------------------------------------
-                
-                game_element = ET.SubElement(self.current_xml_root, 'game')
-                
-                path_element = ET.SubElement(game_element, 'path')
-                path_element.text = xml_path_value # 使用正确的相对路径
-                
-                name_element = ET.SubElement(game_element, 'name')
-                name_element.text = rom_path.stem
-                
-                entry_key = f"ENTRY_{len(self.game_entry_map) + new_entries_count}"
-                new_game_entries[entry_key] = {
-                    "name": rom_path.stem,
-                    "path_in_xml": xml_path_value, # 存储正确的路径
-                    "type": "game",
-                    "element": game_element
-                }
-                new_entries_count += 1
-                existing_rom_filenames.add(rom_filename) 
-        
-        if new_entries_count > 0:
-            
-            game_keys = list(self.game_entry_map.keys())
-            if game_keys and game_keys[0].startswith(("XML_", "LOAD_", "NO_ENTRIES")):
-                self.game_entry_map.clear()
+    def _apply_rom_sync(self, delta: SyncDelta, missing_action: str, include_missing: bool = True):
+        # 预览期间切换了系统时不应用到其他系统的 gamelist
+        if delta.snapshot.root != self.toolkit_loader.system_map.get(self.current_system_name):
+            self._update_status("系统已切换，同步未应用。请重新点击 '同步 ROM'。", "orange")
+            return
+        records = self._current_records()
+        # 重新关联的条目路径会变化，先从辅助索引中移除，应用后按新路径加回
+        relinked_keys = [(f"ENTRY_{relink.record.id}", relink.record) for relink in delta.relinks
+                         if f"ENTRY_{relink.record.id}" in self.game_entry_map]
+        for entry_key, record in relinked_keys:
+            self.game_index.remove(entry_key, record)
+        result = apply_sync_delta(records, delta, missing_action, include_missing)
+        for entry_key, record in relinked_keys:
+            self.game_index.add(entry_key, record)
+        self._journal_sync_result(result)
+
+        if result.added or result.removed:
+            self._update_games_list(self.current_system_name, result.added, result.removed)
+        elif self.game_search_index is not None:
+            # 只有路径变化，列表顺序不变
+            for record in result.relinked:
+                self.game_search_index.update_record(record)
+
+        message = (f"{'自动' if not include_missing else ''}同步完成：新增 {len(result.added)} 个条目，"
+                   f"重新关联 {len(result.relinked)} 个")
+        if result.hidden:
+            message += f"，隐藏 {len(result.hidden)} 个"
+        if result.removed:
+            message += f"，删除 {len(result.removed)} 个"
+        if result.skipped:
+            message += f" (跳过 {result.skipped} 项已变化的条目)"
+        if not include_missing and delta.missing:
+            message += f"；另有 {len(delta.missing)} 个条目的 ROM 已不存在，可点击 '同步 ROM' 处理"
+        self._update_status(message + "。请点击 '保存' 进行保存。", "#27AE60")
+
+    def _journal_sync_result(self, result: SyncResult):
+        """共享文档的修改逐条记入编辑日志 (与游戏列表编辑器相同)，程序异常退出后可以恢复。"""
+        document = self.toolkit_loader.current_document
+        if document is None or document.root is not self.current_xml_root:
+            return
+        journal = journal_for(document)
+        try:
+            for record in result.added + result.hidden:
+                journal.record_put(record.element)
+            for record in result.relinked:
+                journal.record_fields(record.element, {"path": record.path})
+            for record in result.removed:
+                journal.record_remove(record.element)
+        except OSError as e:
+            print(f"警告: 写入编辑日志失败: {e}")
 
-            self.game_entry_map.update(new_game_entries)
-            self._load_games_list(self.current_system_name, force_reload_data=False) 
-            self._update_status(f"成功导入 {new_entries_count} 个新 ROM 文件。请点击 '保存' 进行保存。", "#27AE60")
-        else:
-            self._update_status("没有新的 ROM 文件需要导入（已全部重复）。", "orange")
-            
     def _execute_save(self, create_backup: bool = False):
         xml_path = self.toolkit_loader.current_xml_path
         
@@ -680,8 +1451,13 @@ class RomListPlugin(ctk.CTkFrame):
             xml_path = system_dir / "gamelist.xml"
             self.toolkit_loader.current_xml_path = xml_path
 
-        if self.current_xml_root is None:
-             self.current_xml_root = ET.Element('gameList')
+        # 名称修改保存在条目记录中，先写回 XML
+        self._current_records().write_back()
+
+        document = self.toolkit_loader.current_document
+        if document is not None and document.root is self.current_xml_root and not document.dirty:
+            self._update_status("列表没有未保存的修改，无需保存。", "orange")
+            return
 
         if create_backup:
             self._create_backup_file(xml_path) 
@@ -689,8 +1465,16 @@ class RomListPlugin(ctk.CTkFrame):
         try:
             xml_path.parent.mkdir(parents=True, exist_ok=True)
             
-            tree = ET.ElementTree(self.current_xml_root)
-            tree.write(xml_path, encoding='utf-8', xml_declaration=True)
+            try:
+                get_gamelist_repository().save(xml_path, self.current_xml_root)
+            except GamelistChangedError:
+                if not messagebox.askyesno(
+                        "文件已变化", f"{xml_path.as_posix()} 在加载后已被外部程序修改。\n"
+                                      f"是否用当前列表覆盖？(外部程序的修改将丢失)"):
+                    self._update_status("已取消保存：gamelist.xml 已被外部程序修改。", "orange")
+                    return
+                get_gamelist_repository().save(xml_path, self.current_xml_root, force=True)
+            self.gamelist_mtime_ns = _file_mtime_ns(xml_path)
             
             self._update_status(f"列表已成功保存到: {xml_path.as_posix()}", "#27AE60")
         
@@ -702,13 +1486,9 @@ class RomListPlugin(ctk.CTkFrame):
             self._update_status("gamelist.xml 尚不存在，跳过备份步骤。", "orange")
             return
             
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        backup_name = f"{xml_path.stem}_{timestamp}.bak"
-        backup_path = xml_path.parent / backup_name
-        
         try:
-            shutil.copy2(xml_path, backup_path)
-            self._update_status(f"已创建备份: {backup_name}", "#F39C12")
+            backup_path = backup_gamelist_file(xml_path)
+            self._update_status(f"已创建备份: {backup_path.name}", "#F39C12")
             return True
         except Exception as e:
             self._update_status(f"备份失败: {e}", "red")
@@ -728,6 +1508,10 @@ class RomListPlugin(ctk.CTkFrame):
         backup_window = BackupManagerDialog(self, expected_path, self.toolkit_loader.current_xml_path)
         backup_window.grab_set()
 
+    def save_config(self):
+        """Ctrl+S：保存当前系统的 gamelist.xml。"""
+        self._execute_save()
+
     def on_switch_to(self):
         rom_root = self.toolkit_loader.load_rom_root()
         
@@ -741,15 +1525,17 @@ class RomListPlugin(ctk.CTkFrame):
     # 【修复】添加空的 on_switch_away 方法以满足主框架要求
     # ----------------------------------------------------
     def on_switch_away(self):
-        pass
+        # 其他插件直接读取 XML 元素，离开前写回记录中的改名
+        if self.game_records is not None:
+            self.game_records.write_back()
 
     def _scan_and_load_systems(self, rom_root: Path):
         if self.toolkit_loader.scan_systems():
             system_names = self.toolkit_loader.get_system_names()
-            self.system_select_menu.configure(values=system_names)
+            self.system_select_menu.configure(values=[self.library_scan.label(name) for name in system_names])
             
             first_system = system_names[0]
-            self.system_select_var.set(first_system)
+            self.system_select_var.set(self.library_scan.label(first_system))
             self._on_system_select(first_system)
             self._update_status(f"ROM 根目录已设置，找到 {len(system_names)} 个系统。", "#2ECC71")
         else:
@@ -758,18 +1544,27 @@ class RomListPlugin(ctk.CTkFrame):
             self.system_select_var.set("未找到系统")
             self._clear_lists()
 
+    def _refresh_system_menu_labels(self):
+        system_names = self.toolkit_loader.get_system_names()
+        if not system_names:
+            return
+        self.system_select_menu.configure(values=[self.library_scan.label(name) for name in system_names])
+        if self.current_system_name in self.toolkit_loader.system_map:
+            self.system_select_var.set(self.library_scan.label(self.current_system_name))
+
     def _on_system_select(self, system_name: str):
+        system_name = system_from_label(system_name)
         self.current_system_name = system_name
+        if self.auto_sync_job is not None:
+            self.after_cancel(self.auto_sync_job)
+            self.auto_sync_job = None
+        self._update_extension_button()
         
         if system_name and system_name not in ["等待加载 ROM 目录...", "未设置 ROM 目录", "未找到系统"]:
             self._update_status(f"已选择系统: {system_name}，正在加载数据...", "blue")
             
-            self._load_rom_list(system_name) 
             self._load_games_list(system_name, force_reload_data=True) 
-            
-            rom_count = len(self.rom_files)
-            game_count = len([k for k in self.game_entry_map.keys() if not k.startswith(("XML_", "LOAD_"))])
-            self._update_status(f"成功加载 {rom_count} 个 ROM 文件和 {game_count} 个游戏目录。", "#2ECC71")
+            self._load_rom_list(system_name) 
 
         else:
             self._update_status("请选择一个有效的系统目录。", "orange")
@@ -780,12 +1575,22 @@ class RomListPlugin(ctk.CTkFrame):
             widget.destroy()
         self.rom_list_widgets.clear()
         self.rom_files.clear()
+        self.rom_sorted_names = []
+        self.rom_scan_generation += 1
+        self.rom_scan_running = False
         self.selected_rom_button = None
         self.rom_list_scroll_frame.configure(label_text="ROM 文件列表 (文件系统)")
         
         self.game_entry_map.clear()
+        self.game_index.clear()
+        self.game_search_index = None
+        self.game_filter_records = None
+        self.game_records = None
+        self.gamelist_notice = None
+        self.gamelist_load_failed = False
         self.current_xml_root = None
         self.toolkit_loader.current_xml_path = None
+        self.toolkit_loader.current_document = None
         self.selected_game_button = None
         
         for widget in self.game_list_scroll_frame.winfo_children():
@@ -806,11 +1611,12 @@ class ExtensionSelectorDialog(ctk.CTkToplevel):
         ".bin", ".rom", ".sms", ".md"
     ]
 
-    def __init__(self, master, current_extensions: List[str]):
+    def __init__(self, master, current_extensions: List[str], system_name: Optional[str] = None):
         super().__init__(master)
         self.master_plugin: RomListPlugin = master
+        self.system_name = system_name
         self.title("选择 ROM 文件后缀名")
-        self.geometry("400x550")
+        self.geometry("400x590")
         self.transient(master)
         self.resizable(False, False)
         self.grid_columnconfigure(0, weight=1)
@@ -862,17 +1668,34 @@ class ExtensionSelectorDialog(ctk.CTkToplevel):
         self.custom_entry.insert(0, initial_custom_text)
         self.custom_entry.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
         
+        # 选中系统时默认只修改该系统的后缀 (保存为手动覆盖)，取消勾选则修改全局后缀列表
+        self.system_only_var = tk.IntVar(value=1 if system_name else 0)
+        if system_name:
+            ctk.CTkCheckBox(
+                main_frame, text=f"仅用于当前系统 ({system_name})", variable=self.system_only_var,
+                onvalue=1, offvalue=0,
+            ).grid(row=3, column=0, sticky="w", padx=10, pady=(0, 5))
+
         footer_frame = ctk.CTkFrame(self, fg_color="transparent")
         footer_frame.grid(row=1, column=0, sticky="ew", padx=20, pady=(0, 10))
-        footer_frame.columnconfigure((0, 1), weight=1)
+        footer_frame.columnconfigure((0, 1, 2), weight=1)
 
         ctk.CTkButton(
             footer_frame, text="应用并刷新", command=self._apply_selection, fg_color="#2ECC71"
         ).grid(row=0, column=0, sticky="ew", padx=(0, 5))
+
+        if system_name:
+            ctk.CTkButton(
+                footer_frame, text="恢复系统默认", command=self._clear_override, fg_color="#7F8C8D"
+            ).grid(row=0, column=1, sticky="ew", padx=5)
         
         ctk.CTkButton(
             footer_frame, text="取消", command=self.destroy, fg_color="#E74C3C"
-        ).grid(row=0, column=1, sticky="ew", padx=(5, 0))
+        ).grid(row=0, column=2, sticky="ew", padx=(5, 0))
+
+    def _clear_override(self):
+        self.master_plugin._on_extension_override_cleared(self.system_name)
+        self.destroy()
 
     def _parse_custom_extensions(self, custom_text: str) -> List[str]:
         valid_custom_exts = []
@@ -907,7 +1730,52 @@ class ExtensionSelectorDialog(ctk.CTkToplevel):
             messagebox.showwarning("警告", "您没有选择任何后缀名，请至少选择或输入一个后缀名。")
             return
 
-        self.master_plugin._on_extensions_applied(new_extensions)
+        system_name = self.system_name if self.system_only_var.get() == 1 else None
+        self.master_plugin._on_extensions_applied(new_extensions, system_name)
+        self.destroy()
+
+
+class RomSyncDialog(ctk.CTkToplevel):
+    """同步 ROM 的差异预览，确认后按所选方式处理 ROM 已不存在的条目。"""
+
+    def __init__(self, master, delta: SyncDelta):
+        super().__init__(master)
+        self.master_plugin: RomListPlugin = master
+        self.delta = delta
+        self.title("同步 ROM - 差异预览")
+        self.geometry("640x480")
+        self.transient(master)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        ctk.CTkLabel(self, text=delta.summary_line(), font=ctk.CTkFont(weight="bold")).grid(
+            row=0, column=0, sticky="w", padx=15, pady=(15, 5))
+
+        preview = ctk.CTkTextbox(self, wrap="none")
+        preview.grid(row=1, column=0, sticky="nsew", padx=15, pady=5)
+        preview.insert("1.0", "\n".join(delta.format_lines(SYNC_PREVIEW_LIMIT)))
+        preview.configure(state="disabled")
+
+        option_frame = ctk.CTkFrame(self, fg_color="transparent")
+        option_frame.grid(row=2, column=0, sticky="ew", padx=15, pady=5)
+        ctk.CTkLabel(option_frame, text="ROM 已不存在的条目:").grid(row=0, column=0, sticky="w")
+        self.missing_action_var = ctk.StringVar(value=MISSING_ACTIONS[MISSING_KEEP])
+        ctk.CTkOptionMenu(
+            option_frame, variable=self.missing_action_var, values=list(MISSING_ACTIONS.values()),
+            state="normal" if delta.missing else "disabled"
+        ).grid(row=0, column=1, sticky="w", padx=(10, 0))
+
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.grid(row=3, column=0, sticky="ew", padx=15, pady=(5, 15))
+        button_frame.columnconfigure((0, 1), weight=1)
+        ctk.CTkButton(button_frame, text="应用", command=self._apply, fg_color="#27AE60",
+            hover_color="#2ECC71").grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        ctk.CTkButton(button_frame, text="取消", command=self.destroy, fg_color="#E74C3C",
+            hover_color="#C0392B").grid(row=0, column=1, padx=(5, 0), sticky="ew")
+
+    def _apply(self):
+        label = self.missing_action_var.get()
+        action = next((key for key, text in MISSING_ACTIONS.items() if text == label), MISSING_KEEP)
+        self.master_plugin._apply_rom_sync(self.delta, action)
         self.destroy()
 
 
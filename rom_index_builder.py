@@ -0,0 +1,660 @@
+"""RomIndex 数据库构建工具。
+
+从 RetroArch 的 DAT (clrmamepro 格式) 与 .rdb (MessagePack) 文件批量导入
+db/rom_master_index.db 中的 RomIndex 表。
+
+用法:
+    python rom_index_builder.py <DAT/RDB 文件或目录> [...] [--rebuild] [--platform 平台名]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+DB_DIR = 'db'
+DB_FILENAME = 'rom_master_index.db'
+SQLITE_DB_PATH = Path(__file__).parent / DB_DIR / DB_FILENAME
+CATALOG_FILENAME = 'rom_index_catalog.db'
+CATALOG_DB_PATH = Path(__file__).parent / DB_DIR / CATALOG_FILENAME
+SHARD_DIR_NAME = 'shards'
+
+SOURCE_EXTENSIONS = (".dat", ".rdb")
+INSERT_BATCH_SIZE = 5000
+RDB_MAGIC = b"RARCHDB\x00"
+
+# (Platform, GameName, RomFilename, Size, CRC, MD5, SHA1)
+RomRow = Tuple[str, str, Optional[str], Optional[int], Optional[str], Optional[str], Optional[str]]
+
+ROM_INDEX_COLUMNS = [
+    ("Platform", "TEXT"),
+    ("GameName", "TEXT NOT NULL"),
+    ("RomFilename", "TEXT"),
+    ("Size", "INTEGER"),
+    ("CRC", "TEXT"),
+    ("MD5", "TEXT"),
+    ("SHA1", "TEXT"),
+]
+
+ROM_INDEX_INDEXES = {
+    "idx_romindex_crc": "CRC",
+    "idx_romindex_md5": "MD5",
+    "idx_romindex_sha1": "SHA1",
+    "idx_romindex_filename": "RomFilename",
+    "idx_romindex_platform": "Platform",
+}
+
+# ES-DE 系统目录名 -> RetroArch 数据库平台名，用于分片模式下按系统挂载分片
+DEFAULT_SYSTEM_PLATFORMS: Dict[str, List[str]] = {
+    "nes": ["Nintendo - Nintendo Entertainment System"],
+    "famicom": ["Nintendo - Nintendo Entertainment System"],
+    "fds": ["Nintendo - Family Computer Disk System"],
+    "snes": ["Nintendo - Super Nintendo Entertainment System"],
+    "sfc": ["Nintendo - Super Nintendo Entertainment System"],
+    "n64": ["Nintendo - Nintendo 64"],
+    "gb": ["Nintendo - Game Boy"],
+    "gbc": ["Nintendo - Game Boy Color"],
+    "gba": ["Nintendo - Game Boy Advance"],
+    "nds": ["Nintendo - Nintendo DS"],
+    "n3ds": ["Nintendo - Nintendo 3DS"],
+    "virtualboy": ["Nintendo - Virtual Boy"],
+    "pokemini": ["Nintendo - Pokemon Mini"],
+    "gc": ["Nintendo - GameCube"],
+    "wii": ["Nintendo - Wii"],
+    "megadrive": ["Sega - Mega Drive - Genesis"],
+    "genesis": ["Sega - Mega Drive - Genesis"],
+    "mastersystem": ["Sega - Master System - Mark III"],
+    "gamegear": ["Sega - Game Gear"],
+    "sg-1000": ["Sega - SG-1000"],
+    "segacd": ["Sega - Mega-CD - Sega CD"],
+    "megacd": ["Sega - Mega-CD - Sega CD"],
+    "sega32x": ["Sega - 32X"],
+    "saturn": ["Sega - Saturn"],
+    "dreamcast": ["Sega - Dreamcast"],
+    "psx": ["Sony - PlayStation"],
+    "ps2": ["Sony - PlayStation 2"],
+    "psp": ["Sony - PlayStation Portable"],
+    "pcengine": ["NEC - PC Engine - TurboGrafx 16", "NEC - PC Engine SuperGrafx"],
+    "tg16": ["NEC - PC Engine - TurboGrafx 16"],
+    "pcenginecd": ["NEC - PC Engine CD - TurboGrafx-CD"],
+    "atari2600": ["Atari - 2600"],
+    "atari5200": ["Atari - 5200"],
+    "atari7800": ["Atari - 7800"],
+    "atarilynx": ["Atari - Lynx"],
+    "lynx": ["Atari - Lynx"],
+    "atarijaguar": ["Atari - Jaguar"],
+    "ngp": ["SNK - Neo Geo Pocket"],
+    "ngpc": ["SNK - Neo Geo Pocket Color"],
+    "wonderswan": ["Bandai - WonderSwan"],
+    "wonderswancolor": ["Bandai - WonderSwan Color"],
+    "msx": ["Microsoft - MSX", "Microsoft - MSX2"],
+    "colecovision": ["Coleco - ColecoVision"],
+    "intellivision": ["Mattel - Intellivision"],
+    "vectrex": ["GCE - Vectrex"],
+    "3do": ["The 3DO Company - 3DO"],
+    "arcade": ["FBNeo - Arcade Games", "MAME"],
+    "fbneo": ["FBNeo - Arcade Games"],
+    "mame": ["MAME"],
+    "neogeo": ["SNK - Neo Geo", "FBNeo - Arcade Games"],
+}
+
+
+# --- DAT (clrmamepro) 解析 ---
+
+_DAT_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([()])|([^\s()"]+)')
+_DAT_ESCAPE_RE = re.compile(r'\\(["\\])')
+
+
+def _iter_dat_tokens(stream: Iterable[str]) -> Iterator[str]:
+    for line in stream:
+        for quoted, paren, bare in _DAT_TOKEN_RE.findall(line):
+            if paren:
+                yield paren
+            elif bare:
+                yield bare
+            else:
+                # 引号内的 \" 和 \\ 为转义
+                yield _DAT_ESCAPE_RE.sub(r'\1', quoted) if "\\" in quoted else quoted
+
+
+def _read_dat_block(tokens: Iterator[str]) -> Dict[str, Any]:
+    """读取 '(' 之后直到匹配 ')' 的键值块，嵌套块以列表形式保存。"""
+    block: Dict[str, Any] = {}
+    for key in tokens:
+        if key == ")":
+            return block
+        value = next(tokens, ")")
+        if value == "(":
+            block.setdefault(key, []).append(_read_dat_block(tokens))
+        elif value == ")":
+            return block
+        else:
+            block[key] = value
+    return block
+
+
+def _normalize_hex(value: Any, width: int) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = value.hex()
+    value = str(value).strip()
+    if not value or value == "-":
+        return None
+    return value.upper().zfill(width)
+
+
+def _parse_size(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_dat_rows(dat_path: Path, platform: str) -> Iterator[RomRow]:
+    """流式解析 clrmamepro DAT 文件，每个 rom 产出一行。"""
+    with open(dat_path, 'r', encoding='utf-8', errors='replace') as f:
+        tokens = _iter_dat_tokens(f)
+        for block_type in tokens:
+            if next(tokens, None) != "(":
+                continue
+            game = _read_dat_block(tokens)
+            if block_type not in ("game", "machine"):
+                continue
+            game_name = game.get("name") or game.get("description")
+            if not game_name:
+                continue
+            for rom in game.get("rom", []):
+                yield (
+                    platform,
+                    game_name,
+                    rom.get("name"),
+                    _parse_size(rom.get("size")),
+                    _normalize_hex(rom.get("crc"), 8),
+                    _normalize_hex(rom.get("md5"), 32),
+                    _normalize_hex(rom.get("sha1"), 40),
+                )
+
+
+# --- RDB (RetroArch libretro-db, MessagePack) 解析 ---
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError("RDB 文件意外结束")
+    return data
+
+
+def _read_msgpack(stream: BinaryIO) -> Any:
+    """读取一个 MessagePack 值 (仅实现 libretro-db 用到的类型)。"""
+    tag = _read_exact(stream, 1)[0]
+
+    if tag <= 0x7f:
+        return tag
+    if tag >= 0xe0:
+        return tag - 0x100
+    if 0x80 <= tag <= 0x8f:
+        return _read_msgpack_map(stream, tag & 0x0f)
+    if 0x90 <= tag <= 0x9f:
+        return [_read_msgpack(stream) for _ in range(tag & 0x0f)]
+    if 0xa0 <= tag <= 0xbf:
+        return _read_exact(stream, tag & 0x1f).decode('utf-8', errors='replace')
+
+    if tag == 0xc0:
+        return None
+    if tag == 0xc2:
+        return False
+    if tag == 0xc3:
+        return True
+    if tag in (0xc4, 0xc5, 0xc6):
+        length_fmt = {0xc4: ">B", 0xc5: ">H", 0xc6: ">I"}[tag]
+        length = struct.unpack(length_fmt, _read_exact(stream, struct.calcsize(length_fmt)))[0]
+        return _read_exact(stream, length)
+    if tag in (0xd9, 0xda, 0xdb):
+        length_fmt = {0xd9: ">B", 0xda: ">H", 0xdb: ">I"}[tag]
+        length = struct.unpack(length_fmt, _read_exact(stream, struct.calcsize(length_fmt)))[0]
+        return _read_exact(stream, length).decode('utf-8', errors='replace')
+
+    scalar_formats = {
+        0xca: ">f", 0xcb: ">d",
+        0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q",
+        0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q",
+    }
+    if tag in scalar_formats:
+        fmt = scalar_formats[tag]
+        return struct.unpack(fmt, _read_exact(stream, struct.calcsize(fmt)))[0]
+
+    if tag in (0xdc, 0xdd):
+        length_fmt = ">H" if tag == 0xdc else ">I"
+        length = struct.unpack(length_fmt, _read_exact(stream, struct.calcsize(length_fmt)))[0]
+        return [_read_msgpack(stream) for _ in range(length)]
+    if tag in (0xde, 0xdf):
+        length_fmt = ">H" if tag == 0xde else ">I"
+        length = struct.unpack(length_fmt, _read_exact(stream, struct.calcsize(length_fmt)))[0]
+        return _read_msgpack_map(stream, length)
+
+    raise ValueError(f"不支持的 MessagePack 类型: 0x{tag:02x}")
+
+
+def _read_msgpack_map(stream: BinaryIO, length: int) -> Dict[Any, Any]:
+    result = {}
+    for _ in range(length):
+        key = _read_msgpack(stream)
+        if isinstance(key, bytes):
+            key = key.decode('utf-8', errors='replace')
+        result[key] = _read_msgpack(stream)
+    return result
+
+
+def _as_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace')
+    value = str(value).strip()
+    return value or None
+
+
+def iter_rdb_rows(rdb_path: Path, platform: str) -> Iterator[RomRow]:
+    """流式读取 RetroArch .rdb 文件，每条记录产出一行。"""
+    with open(rdb_path, 'rb') as f:
+        if f.read(len(RDB_MAGIC)) != RDB_MAGIC:
+            raise ValueError(f"{rdb_path.name} 不是有效的 RetroArch RDB 文件")
+        _read_exact(f, 8)  # 元数据偏移量，顺序读取时不需要
+
+        while True:
+            record = _read_msgpack(f)
+            if not isinstance(record, dict):
+                break
+            game_name = _as_text(record.get("name")) or _as_text(record.get("description"))
+            if not game_name:
+                continue
+            yield (
+                platform,
+                game_name,
+                _as_text(record.get("rom_name")),
+                _parse_size(record.get("size")),
+                _normalize_hex(record.get("crc"), 8),
+                _normalize_hex(record.get("md5"), 32),
+                _normalize_hex(record.get("sha1"), 40),
+            )
+
+
+def iter_source_rows(source_path: Path, platform: Optional[str] = None) -> Iterator[RomRow]:
+    platform = platform or source_path.stem
+    if source_path.suffix.lower() == ".rdb":
+        return iter_rdb_rows(source_path, platform)
+    return iter_dat_rows(source_path, platform)
+
+
+def collect_source_files(inputs: Sequence[Union[str, Path]]) -> List[Path]:
+    """展开命令行传入的文件/目录，返回按名称排序的 DAT/RDB 文件列表。"""
+    sources: Dict[str, Path] = {}
+    for item in inputs:
+        item_path = Path(item)
+        if item_path.is_dir():
+            for entry in os.scandir(item_path):
+                if entry.is_file() and entry.name.lower().endswith(SOURCE_EXTENSIONS):
+                    sources[entry.path] = Path(entry.path)
+        elif item_path.is_file() and item_path.suffix.lower() in SOURCE_EXTENSIONS:
+            sources[str(item_path)] = item_path
+    return sorted(sources.values(), key=lambda p: p.name.lower())
+
+
+def _chunked(rows: Iterator[RomRow], size: int) -> Iterator[List[RomRow]]:
+    chunk: List[RomRow] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- 数据库写入 ---
+
+class SourceImportError(Exception):
+    """某个源文件无法读取或解析。"""
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """创建 RomIndex / RomIndexSources 表，并为旧版数据库补齐缺失的列。"""
+    columns_sql = ", ".join(f"{name} {decl}" for name, decl in ROM_INDEX_COLUMNS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS RomIndex ({columns_sql})")
+
+    existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(RomIndex)")}
+    for name, decl in ROM_INDEX_COLUMNS:
+        if name not in existing_columns:
+            conn.execute(f"ALTER TABLE RomIndex ADD COLUMN {name} {decl.replace(' NOT NULL', '')}")
+
+    _ensure_sources_table(conn)
+
+
+def _ensure_sources_table(conn: sqlite3.Connection):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS RomIndexSources ("
+        "SourceFile TEXT PRIMARY KEY, Platform TEXT, MTime REAL, FileSize INTEGER, RowCount INTEGER)"
+    )
+
+
+def ensure_catalog_schema(conn: sqlite3.Connection):
+    """分片模式的目录库：记录每个平台的分片文件以及系统与平台的对应关系。"""
+    _ensure_sources_table(conn)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS Shards ("
+        "Platform TEXT PRIMARY KEY, ShardFile TEXT NOT NULL, RowCount INTEGER, BuiltAt REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS SystemPlatforms ("
+        "System TEXT NOT NULL, Platform TEXT NOT NULL, PRIMARY KEY (System, Platform))"
+    )
+
+
+def shard_filename(platform: str) -> str:
+    safe_name = re.sub(r'[^\w\-. ]', '_', platform).strip() or "_"
+    return f"{safe_name}.db"
+
+
+def create_indexes(conn: sqlite3.Connection):
+    for index_name, column in ROM_INDEX_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON RomIndex ({column})")
+
+
+def drop_indexes(conn: sqlite3.Connection):
+    for index_name in ROM_INDEX_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+class RomIndexBuilder:
+    """将 DAT/RDB 文件导入 RomIndex。
+
+    每个目标库的导入都在一个事务中完成：构建期间使用 WAL + synchronous=OFF，
+    先删除旧索引、批量 executemany 写入，最后再重建索引。
+
+    sharded=True 时每个平台写入 db/shards/ 下独立的分片库，并在
+    rom_index_catalog.db 中登记；否则写入单文件的 rom_master_index.db。
+    """
+
+    def __init__(self, db_path: Path = SQLITE_DB_PATH, log: Callable[[str], None] = print,
+                 sharded: bool = False, catalog_path: Path = CATALOG_DB_PATH,
+                 shard_dir: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.log = log
+        self.sharded = sharded
+        self.catalog_path = Path(catalog_path)
+        self.shard_dir = Path(shard_dir) if shard_dir else self.catalog_path.parent / SHARD_DIR_NAME
+
+    @property
+    def state_db_path(self) -> Path:
+        return self.catalog_path if self.sharded else self.db_path
+
+    def _load_source_state(self) -> Dict[str, Tuple[float, int]]:
+        if not self.state_db_path.is_file():
+            return {}
+        conn = sqlite3.connect(self.state_db_path)
+        try:
+            rows = conn.execute("SELECT SourceFile, MTime, FileSize FROM RomIndexSources").fetchall()
+            return {source: (mtime, size) for source, mtime, size in rows}
+        except sqlite3.Error:
+            return {}
+        finally:
+            conn.close()
+
+    def select_sources(self, sources: Sequence[Path], platforms: Optional[Sequence[str]] = None,
+                       force: bool = False) -> List[Path]:
+        """按平台过滤源文件；非强制模式下跳过自上次导入后未改动的平台。
+
+        同一平台的任一源文件有改动时，该平台的全部源文件都会重新导入。
+        """
+        wanted = {p.lower() for p in platforms} if platforms else None
+        known_state = {} if force else self._load_source_state()
+
+        candidates = [s for s in sources if wanted is None or s.stem.lower() in wanted]
+        changed_platforms = set()
+        for source in candidates:
+            stat = source.stat()
+            if known_state.get(source.name) != (stat.st_mtime, stat.st_size):
+                changed_platforms.add(source.stem)
+        return [s for s in candidates if s.stem in changed_platforms]
+
+    def build(self, sources: Sequence[Path], rebuild: bool = False) -> Dict[str, int]:
+        """导入给定源文件，返回 {平台: 行数}。
+
+        rebuild=True 时清空整个数据库；否则只替换源文件所属平台的数据 (增量刷新)。
+        """
+        platform_sources: Dict[str, List[Path]] = {}
+        for source in sources:
+            platform_sources.setdefault(source.stem, []).append(source)
+
+        if self.sharded:
+            return self._build_shards(platform_sources, rebuild)
+        return self._build_single(platform_sources, rebuild)
+
+    def _open_build_connection(self, db_path: Path) -> sqlite3.Connection:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        return conn
+
+    def _close_build_connection(self, conn: sqlite3.Connection):
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            # 恢复为单文件模式，便于随程序打包分发
+            conn.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            conn.close()
+
+    def _insert_platform(self, conn: sqlite3.Connection, platform: str,
+                         files: Sequence[Path]) -> List[Tuple[Path, int]]:
+        """在当前事务中写入一个平台的全部源文件，返回 (源文件, 行数)。
+
+        任一源文件读取失败时抛出 SourceImportError，由调用方回滚该平台。
+        """
+        insert_sql = (
+            "INSERT INTO RomIndex (Platform, GameName, RomFilename, Size, CRC, MD5, SHA1) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)"
+        )
+        imported = []
+        for source in files:
+            row_count = 0
+            try:
+                for chunk in _chunked(iter_source_rows(source, platform), INSERT_BATCH_SIZE):
+                    conn.executemany(insert_sql, chunk)
+                    row_count += len(chunk)
+            except (OSError, ValueError, EOFError) as e:
+                raise SourceImportError(f"{source.name}: {e}") from e
+            imported.append((source, row_count))
+            self.log(f"已导入 {source.name}: {row_count} 条")
+        return imported
+
+    def _record_sources(self, conn: sqlite3.Connection, platform: str, imported: Sequence[Tuple[Path, int]]):
+        rows = []
+        for source, row_count in imported:
+            stat = source.stat()
+            rows.append((source.name, platform, stat.st_mtime, stat.st_size, row_count))
+        conn.executemany(
+            "INSERT OR REPLACE INTO RomIndexSources (SourceFile, Platform, MTime, FileSize, RowCount) "
+            "VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def _build_single(self, platform_sources: Dict[str, List[Path]], rebuild: bool) -> Dict[str, int]:
+        conn = self._open_build_connection(self.db_path)
+        summary: Dict[str, int] = {}
+        try:
+            conn.execute("BEGIN")
+            if rebuild:
+                conn.execute("DROP TABLE IF EXISTS RomIndex")
+                conn.execute("DROP TABLE IF EXISTS RomIndexSources")
+            ensure_schema(conn)
+
+            # 先利用现有索引找出旧平台数据的 rowid，删除索引进行批量写入时按 rowid 删除，无需全表扫描
+            old_rowids: Dict[str, List[Tuple[int]]] = {}
+            if not rebuild:
+                for platform in platform_sources:
+                    old_rowids[platform] = conn.execute(
+                        "SELECT rowid FROM RomIndex WHERE Platform = ?", (platform,)).fetchall()
+            drop_indexes(conn)
+
+            for platform, files in sorted(platform_sources.items()):
+                # 每个平台的删除和写入在同一个保存点中，导入失败时回滚，该平台保留原有数据
+                conn.execute("SAVEPOINT platform_import")
+                try:
+                    conn.executemany("DELETE FROM RomIndex WHERE rowid = ?", old_rowids.get(platform, []))
+                    conn.execute("DELETE FROM RomIndexSources WHERE Platform = ?", (platform,))
+                    imported = self._insert_platform(conn, platform, files)
+                    self._record_sources(conn, platform, imported)
+                except SourceImportError as e:
+                    conn.execute("ROLLBACK TO platform_import")
+                    conn.execute("RELEASE platform_import")
+                    self.log(f"警告: 平台 {platform} 导入失败，保留原有数据: {e}")
+                    continue
+                conn.execute("RELEASE platform_import")
+                summary[platform] = sum(count for _, count in imported)
+
+            self.log("正在创建索引...")
+            create_indexes(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._close_build_connection(conn)
+
+        return summary
+
+    def _build_shard(self, platform: str, files: Sequence[Path]) -> Tuple[Path, List[Tuple[Path, int]]]:
+        """在临时文件中构建单个平台的分片，完成后原子替换旧分片。"""
+        shard_path = self.shard_dir / shard_filename(platform)
+        temp_path = shard_path.with_name(shard_path.name + ".tmp")
+        if temp_path.exists():
+            temp_path.unlink()
+
+        conn = self._open_build_connection(temp_path)
+        try:
+            conn.execute("BEGIN")
+            ensure_schema(conn)
+            imported = self._insert_platform(conn, platform, files)
+            create_indexes(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._close_build_connection(conn)
+            temp_path.unlink(missing_ok=True)
+            raise
+        self._close_build_connection(conn)
+
+        os.replace(temp_path, shard_path)
+        return shard_path, imported
+
+    def _build_shards(self, platform_sources: Dict[str, List[Path]], rebuild: bool) -> Dict[str, int]:
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        catalog = sqlite3.connect(self.catalog_path)
+        summary: Dict[str, int] = {}
+        try:
+            with catalog:
+                if rebuild:
+                    catalog.execute("DROP TABLE IF EXISTS Shards")
+                    catalog.execute("DROP TABLE IF EXISTS RomIndexSources")
+                ensure_catalog_schema(catalog)
+                catalog.executemany(
+                    "INSERT OR IGNORE INTO SystemPlatforms (System, Platform) VALUES (?, ?)",
+                    [(system, platform) for system, platforms in DEFAULT_SYSTEM_PLATFORMS.items()
+                     for platform in platforms]
+                )
+
+            for platform, files in sorted(platform_sources.items()):
+                try:
+                    shard_path, imported = self._build_shard(platform, files)
+                except SourceImportError as e:
+                    self.log(f"警告: 平台 {platform} 导入失败，保留原有分片: {e}")
+                    continue
+                row_count = sum(count for _, count in imported)
+                with catalog:
+                    catalog.execute("DELETE FROM RomIndexSources WHERE Platform = ?", (platform,))
+                    self._record_sources(catalog, platform, imported)
+                    catalog.execute(
+                        "INSERT OR REPLACE INTO Shards (Platform, ShardFile, RowCount, BuiltAt) VALUES (?, ?, ?, ?)",
+                        (platform, shard_path.name, row_count, time.time())
+                    )
+                summary[platform] = row_count
+        finally:
+            catalog.close()
+
+        return summary
+
+    def add_system_mappings(self, mappings: Sequence[Tuple[str, str]]):
+        """向目录库追加 系统 -> 平台 映射 (仅分片模式)。"""
+        catalog = sqlite3.connect(self.catalog_path)
+        try:
+            with catalog:
+                ensure_catalog_schema(catalog)
+                catalog.executemany(
+                    "INSERT OR IGNORE INTO SystemPlatforms (System, Platform) VALUES (?, ?)",
+                    [(system.lower(), platform) for system, platform in mappings]
+                )
+        finally:
+            catalog.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="从 RetroArch DAT/RDB 文件构建 rom_master_index.db")
+    parser.add_argument("inputs", nargs="+", help="DAT/RDB 文件或包含它们的目录")
+    parser.add_argument("--db", default=str(SQLITE_DB_PATH), help="目标数据库路径 (单文件模式)")
+    parser.add_argument("--platform", action="append", dest="platforms",
+                        help="只刷新指定平台 (文件名，不含后缀)，可重复使用")
+    parser.add_argument("--rebuild", action="store_true", help="清空并完整重建数据库")
+    parser.add_argument("--force", action="store_true", help="即使源文件未改动也重新导入")
+    parser.add_argument("--sharded", action="store_true", help="按平台生成分片库和目录库")
+    parser.add_argument("--catalog", default=str(CATALOG_DB_PATH), help="分片模式的目录库路径")
+    parser.add_argument("--map", action="append", dest="mappings", default=[],
+                        metavar="SYSTEM=PLATFORM", help="追加 ES-DE 系统到平台的映射 (分片模式)")
+    args = parser.parse_args(argv)
+
+    if args.rebuild and args.platforms:
+        # 重建会清空所有平台的数据，只导入指定平台会丢掉其余平台
+        print("错误: --rebuild 不能与 --platform 同时使用；只刷新部分平台时请使用 --platform (可加 --force)。",
+              file=sys.stderr)
+        return 1
+
+    builder = RomIndexBuilder(Path(args.db), sharded=args.sharded, catalog_path=Path(args.catalog))
+
+    if args.mappings:
+        if not args.sharded:
+            print("错误: --map 仅在 --sharded 模式下可用。", file=sys.stderr)
+            return 1
+        pairs = [tuple(m.split("=", 1)) for m in args.mappings if "=" in m]
+        builder.add_system_mappings(pairs)
+
+    all_sources = collect_source_files(args.inputs)
+    if not all_sources:
+        print("错误: 未找到任何 .dat 或 .rdb 文件。", file=sys.stderr)
+        return 1
+
+    sources = builder.select_sources(all_sources, args.platforms, force=args.force or args.rebuild)
+    if not sources:
+        print("所有平台均为最新，无需刷新。")
+        return 0
+
+    start_time = time.perf_counter()
+    summary = builder.build(sources, rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start_time
+
+    total_rows = sum(summary.values())
+    print(f"完成: {len(summary)} 个平台，共 {total_rows} 条记录，耗时 {elapsed:.1f} 秒。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
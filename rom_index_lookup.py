@@ -0,0 +1,487 @@
+"""RomIndex 查询服务。
+
+支持两种数据库布局：
+- 单文件模式: db/rom_master_index.db (兼容旧版)
+- 分片模式: db/rom_index_catalog.db + db/shards/<平台>.db，只 ATTACH 当前系统对应的分片
+
+查询以批量方式进行：一次调用解析多个 ROM 的哈希/文件名。
+用户在编辑器中手动确认过的名称保存在本地覆盖库 config/user_rom_names.db，查询时优先使用。
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rom_index_builder import CATALOG_DB_PATH, SHARD_DIR_NAME, SQLITE_DB_PATH
+
+USER_OVERRIDES_DB_PATH = Path(__file__).parent / "config" / "user_rom_names.db"
+LOOKUP_METRICS_LOG_PATH = Path(__file__).parent / "logs" / "rom_lookup_metrics.jsonl"
+
+# SQLite 默认最多同时附加 10 个数据库
+MAX_ATTACHED_SHARDS = 9
+HASH_KEY_TYPES = ("SHA1", "MD5", "CRC")
+KEY_COLUMNS = {"SHA1": "SHA1", "MD5": "MD5", "CRC": "CRC", "FILENAME": "RomFilename"}
+USER_KEY_TYPE = "USER"
+
+# (哈希字典, ROM 文件名)
+LookupItem = Tuple[Dict[str, Optional[str]], str]
+# (游戏名, 命中的键类型: SHA1/MD5/CRC/FILENAME，来自本地覆盖库时为 USER)
+LookupResult = Optional[Tuple[str, str]]
+
+
+# 查询时计算过的 ROM 哈希 (按路径保存，用文件大小和 mtime 校验)，记录用户确认的名称时可直接使用
+RECENT_HASHES_LIMIT = 20000
+_recent_hashes: "OrderedDict[str, Tuple[int, int, Dict[str, Optional[str]]]]" = OrderedDict()
+_recent_hashes_lock = threading.Lock()
+
+
+def _calculate_hashes_internal(rom_path: Path, start_offset: int) -> Dict[str, Optional[str]]:
+    BUFFER_SIZE = 65536 
+    
+    try:
+        hash_crc = 0
+        hash_md5 = hashlib.md5()
+        hash_sha1 = hashlib.sha1()
+        
+        original_file_size = rom_path.stat().st_size
+        size_for_hash = original_file_size - start_offset
+        
+        with open(rom_path, 'rb') as f:
+            if start_offset > 0:
+                f.seek(start_offset)
+            
+            while True:
+                data = f.read(BUFFER_SIZE)
+                if not data:
+                    break
+                hash_crc = zlib.crc32(data, hash_crc) & 0xFFFFFFFF
+                hash_md5.update(data)
+                hash_sha1.update(data)
+
+        calculated_hashes = {
+            "CRC": f"{hash_crc:08X}",
+            "MD5": hash_md5.hexdigest().upper(),
+            "SHA1": hash_sha1.hexdigest().upper(),
+            "Size": str(size_for_hash) 
+        }
+        
+        return calculated_hashes
+            
+    except Exception:
+        return {"CRC": None, "MD5": None, "SHA1": None, "Size": None}
+
+
+def calculate_rom_hashes(rom_path: Path, skip_nes_header: bool = False) -> Dict[str, Optional[str]]:
+    
+    is_nes = rom_path.suffix.lower() == ".nes"
+    file_size = rom_path.stat().st_size
+    start_offset = 0
+    
+    # 仅当明确要求跳过头并且是 NES 文件且文件大小足够时才设置偏移量
+    if is_nes and skip_nes_header and file_size > 16:
+        start_offset = 16
+        
+    return _calculate_hashes_internal(rom_path, start_offset)
+
+
+def remember_rom_hashes(rom_path: Path, hashes: Dict[str, Optional[str]]):
+    """保存查询时计算的哈希 (NES 文件为跳过 iNES header 后的哈希，与查询时优先使用的相同)。"""
+    if not any(hashes.get(key_type) for key_type in HASH_KEY_TYPES):
+        return
+    try:
+        stat = rom_path.stat()
+    except OSError:
+        return
+    key = str(rom_path)
+    with _recent_hashes_lock:
+        _recent_hashes[key] = (stat.st_size, stat.st_mtime_ns, {k: hashes.get(k) for k in HASH_KEY_TYPES})
+        _recent_hashes.move_to_end(key)
+        while len(_recent_hashes) > RECENT_HASHES_LIMIT:
+            _recent_hashes.popitem(last=False)
+
+
+def recall_rom_hashes(rom_path: Path) -> Optional[Dict[str, Optional[str]]]:
+    """remember_rom_hashes 保存的哈希；没有保存过或文件已变化时返回 None。"""
+    with _recent_hashes_lock:
+        entry = _recent_hashes.get(str(rom_path))
+    if entry is None:
+        return None
+    try:
+        stat = rom_path.stat()
+    except OSError:
+        return None
+    size, mtime_ns, hashes = entry
+    return hashes if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns) else None
+
+
+def is_rom_index_available(db_path: Path = SQLITE_DB_PATH, catalog_path: Path = CATALOG_DB_PATH) -> bool:
+    return Path(catalog_path).is_file() or Path(db_path).is_file()
+
+
+def _readonly_uri(path: Path) -> str:
+    return f"{path.resolve().as_uri()}?mode=ro"
+
+
+class LookupStats:
+    """一次命名流程的统计：各键类型命中数、未命中、错误、哈希字节数及耗时。"""
+
+    MAX_ERROR_MESSAGES = 20
+
+    def __init__(self, system_name: Optional[str] = None):
+        self.system_name = system_name
+        self.started_at = time.time()
+        self.hits: Dict[str, int] = {key_type: 0 for key_type in (USER_KEY_TYPE, *KEY_COLUMNS)}
+        self.misses = 0
+        self.errors = 0
+        self.error_messages: List[str] = []
+        self.bytes_hashed = 0
+        self.files_hashed = 0
+        self.hash_seconds = 0.0
+        self.query_seconds = 0.0
+        self.queries = 0
+
+    def record_hash(self, byte_count: int, seconds: float):
+        self.files_hashed += 1
+        self.bytes_hashed += byte_count
+        self.hash_seconds += seconds
+
+    def record_query(self, seconds: float):
+        self.queries += 1
+        self.query_seconds += seconds
+
+    def record_result(self, result: LookupResult):
+        if result:
+            self.hits[result[1]] = self.hits.get(result[1], 0) + 1
+        else:
+            self.misses += 1
+
+    def record_error(self, message: str, count: int = 1):
+        self.errors += count
+        if len(self.error_messages) < self.MAX_ERROR_MESSAGES:
+            self.error_messages.append(message)
+
+    @property
+    def total_hits(self) -> int:
+        return sum(self.hits.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "system": self.system_name,
+            "started_at": self.started_at,
+            "hits": dict(self.hits),
+            "total_hits": self.total_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "error_messages": list(self.error_messages),
+            "files_hashed": self.files_hashed,
+            "bytes_hashed": self.bytes_hashed,
+            "hash_seconds": round(self.hash_seconds, 3),
+            "queries": self.queries,
+            "query_seconds": round(self.query_seconds, 3),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def format_report(self) -> str:
+        hit_text = ", ".join(f"{key_type}: {count}" for key_type, count in self.hits.items())
+        lines = [
+            f"系统: {self.system_name or '-'}",
+            f"命中: {self.total_hits} ({hit_text})",
+            f"未命中: {self.misses}",
+            f"错误: {self.errors}",
+            f"哈希: {self.files_hashed} 个文件, {self.bytes_hashed / 1024 / 1024:.1f} MB, 耗时 {self.hash_seconds:.2f}s",
+            f"查询: {self.queries} 次, 耗时 {self.query_seconds:.2f}s",
+        ]
+        lines.extend(f"  - {message}" for message in self.error_messages)
+        return "\n".join(lines)
+
+    def append_to_log(self, log_path: Path = LOOKUP_METRICS_LOG_PATH):
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(self.to_json() + "\n")
+
+
+class UserOverrideStore:
+    """用户确认的 哈希/文件名 -> 游戏名 映射。
+
+    哈希键对所有系统生效；文件名键只对记录时所在的系统生效。
+    """
+
+    def __init__(self, db_path: Path = USER_OVERRIDES_DB_PATH):
+        self.db_path = Path(db_path)
+
+    def exists(self) -> bool:
+        return self.db_path.is_file()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS UserOverrides ("
+            "KeyType TEXT NOT NULL, KeyValue TEXT NOT NULL, System TEXT NOT NULL DEFAULT '', "
+            "GameName TEXT NOT NULL, UpdatedAt REAL, PRIMARY KEY (KeyType, KeyValue, System))"
+        )
+        return conn
+
+    def _upsert(self, rows: Sequence[Tuple[str, str, str, str, float]]) -> int:
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO UserOverrides (KeyType, KeyValue, System, GameName, UpdatedAt) "
+                    "VALUES (?, ?, ?, ?, ?)", rows
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def record_names(self, system_name: Optional[str],
+                     entries: Iterable[Tuple[str, str, Optional[Dict[str, Optional[str]]]]]) -> int:
+        """记录一批 (ROM 文件名, 游戏名, 哈希字典或 None)，返回写入的键数量。"""
+        now = time.time()
+        system_key = (system_name or "").lower()
+        rows = []
+        for rom_filename, game_name, hashes in entries:
+            if not game_name:
+                continue
+            if rom_filename:
+                rows.append(("FILENAME", rom_filename, system_key, game_name, now))
+            for key_type in HASH_KEY_TYPES:
+                value = (hashes or {}).get(key_type)
+                if value:
+                    rows.append((key_type, value.upper(), "", game_name, now))
+        return self._upsert(rows)
+
+    def export_json(self, export_path: Path) -> int:
+        records: List[Dict[str, Any]] = []
+        if self.exists():
+            conn = self._connect()
+            try:
+                for key_type, key_value, system, game_name, updated_at in conn.execute(
+                        "SELECT KeyType, KeyValue, System, GameName, UpdatedAt FROM UserOverrides "
+                        "ORDER BY System, KeyType, KeyValue"):
+                    records.append({"key_type": key_type, "key": key_value, "system": system,
+                                    "name": game_name, "updated_at": updated_at})
+            finally:
+                conn.close()
+        with open(export_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "overrides": records}, f, ensure_ascii=False, indent=2)
+        return len(records)
+
+    def import_json(self, import_path: Path) -> int:
+        """导入其它机器导出的映射，已有的同键记录只在导入记录更新时被覆盖。"""
+        with open(import_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        incoming = []
+        for record in data.get("overrides", []):
+            key_type = str(record.get("key_type", "")).upper()
+            key_value = record.get("key")
+            game_name = record.get("name")
+            if key_type not in KEY_COLUMNS or not key_value or not game_name:
+                continue
+            incoming.append((key_type, key_value, (record.get("system") or "").lower(),
+                             game_name, float(record.get("updated_at") or 0)))
+
+        conn = self._connect()
+        try:
+            existing = {
+                (key_type, key_value, system): updated_at or 0
+                for key_type, key_value, system, updated_at in conn.execute(
+                    "SELECT KeyType, KeyValue, System, UpdatedAt FROM UserOverrides")
+            }
+        finally:
+            conn.close()
+
+        rows = [row for row in incoming if row[4] >= existing.get(row[:3], -1)]
+        return self._upsert(rows)
+
+
+class RomIndexLookup:
+    """按系统打开 RomIndex 并批量查询游戏名。
+
+    存在目录库时使用分片模式，否则回退到单文件数据库。
+    """
+
+    def __init__(self, system_name: Optional[str] = None, db_path: Path = SQLITE_DB_PATH,
+                 catalog_path: Path = CATALOG_DB_PATH, overrides_path: Optional[Path] = USER_OVERRIDES_DB_PATH,
+                 stats: Optional[LookupStats] = None):
+        self.system_name = system_name
+        self.stats = stats
+        self.db_path = Path(db_path)
+        self.catalog_path = Path(catalog_path)
+        self.overrides_path = Path(overrides_path) if overrides_path else None
+        self.mode: Optional[str] = None
+        # 每个连接及其上可查询的 schema 名称
+        self._connections: List[Tuple[sqlite3.Connection, List[str]]] = []
+        self._override_conn: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> "RomIndexLookup":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        if self._connections:
+            return
+        if self.overrides_path and self.overrides_path.is_file():
+            self._override_conn = sqlite3.connect(_readonly_uri(self.overrides_path), uri=True)
+        if self.catalog_path.is_file():
+            self.mode = "sharded"
+            self._open_shards(self._resolve_shard_files())
+        elif self.db_path.is_file():
+            self.mode = "single"
+            conn = sqlite3.connect(_readonly_uri(self.db_path), uri=True)
+            self._connections.append((conn, ["main"]))
+        else:
+            raise FileNotFoundError(f"未找到数据库文件: {self.db_path.as_posix()}")
+
+    def close(self):
+        for conn, _ in self._connections:
+            conn.close()
+        self._connections.clear()
+        if self._override_conn:
+            self._override_conn.close()
+            self._override_conn = None
+
+    def _resolve_shard_files(self) -> List[Path]:
+        """从目录库中找出当前系统对应的分片；系统未登记时使用全部分片。"""
+        shard_dir = self.catalog_path.parent / SHARD_DIR_NAME
+        catalog = sqlite3.connect(_readonly_uri(self.catalog_path), uri=True)
+        try:
+            shard_names: List[str] = []
+            if self.system_name:
+                system_key = self.system_name.lower()
+                shard_names = [row[0] for row in catalog.execute(
+                    "SELECT DISTINCT s.ShardFile FROM Shards s "
+                    "LEFT JOIN SystemPlatforms m ON m.Platform = s.Platform "
+                    "WHERE m.System = ? OR lower(s.Platform) = ? ORDER BY s.ShardFile",
+                    (system_key, system_key)
+                )]
+            if not shard_names:
+                shard_names = [row[0] for row in catalog.execute("SELECT ShardFile FROM Shards ORDER BY ShardFile")]
+        finally:
+            catalog.close()
+        return [shard_dir / name for name in shard_names if (shard_dir / name).is_file()]
+
+    def _open_shards(self, shard_files: Sequence[Path]):
+        for start in range(0, len(shard_files), MAX_ATTACHED_SHARDS):
+            group = shard_files[start:start + MAX_ATTACHED_SHARDS]
+            conn = sqlite3.connect("file::memory:", uri=True)
+            schemas = []
+            for i, shard_path in enumerate(group):
+                schema = f"shard{i}"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (_readonly_uri(shard_path),))
+                schemas.append(schema)
+            self._connections.append((conn, schemas))
+
+    @staticmethod
+    def _fill_key_table(conn: sqlite3.Connection, keys: Dict[str, set]):
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS LookupKeys (KeyType TEXT, KeyValue TEXT)")
+        conn.execute("DELETE FROM temp.LookupKeys")
+        conn.executemany("INSERT INTO temp.LookupKeys (KeyType, KeyValue) VALUES (?, ?)",
+                         [(key_type, value) for key_type, values in keys.items() for value in values])
+
+    def _query_overrides(self, keys: Dict[str, set]) -> Dict[Tuple[str, str], str]:
+        found: Dict[Tuple[str, str], str] = {}
+        if self._override_conn is None or not any(keys.values()):
+            return found
+        self._fill_key_table(self._override_conn, keys)
+        cursor = self._override_conn.execute(
+            "SELECT k.KeyType, k.KeyValue, o.GameName FROM temp.LookupKeys k "
+            "JOIN UserOverrides o ON o.KeyType = k.KeyType AND o.KeyValue = k.KeyValue "
+            "WHERE o.System = '' OR o.System = ?",
+            ((self.system_name or "").lower(),)
+        )
+        for key_type, key_value, game_name in cursor:
+            found.setdefault((key_type, key_value), game_name)
+        return found
+
+    def _query_keys(self, keys: Dict[str, set]) -> Dict[Tuple[str, str], str]:
+        """对所有连接/分片查询键值，返回 {(键类型, 键值): 游戏名}，先命中者优先。"""
+        found: Dict[Tuple[str, str], str] = {}
+        if not any(keys.values()):
+            return found
+
+        for conn, schemas in self._connections:
+            self._fill_key_table(conn, keys)
+            for schema in schemas:
+                for key_type, column in KEY_COLUMNS.items():
+                    if not keys.get(key_type):
+                        continue
+                    cursor = conn.execute(
+                        f"SELECT k.KeyValue, r.GameName FROM temp.LookupKeys k "
+                        f"JOIN {schema}.RomIndex r ON r.{column} = k.KeyValue "
+                        f"WHERE k.KeyType = ?",
+                        (key_type,)
+                    )
+                    for key_value, game_name in cursor:
+                        if game_name:
+                            found.setdefault((key_type, key_value), game_name)
+        return found
+
+    @staticmethod
+    def _collect_keys(items_keys: Iterable[List[Tuple[str, str]]]) -> Dict[str, set]:
+        keys: Dict[str, set] = {key_type: set() for key_type in KEY_COLUMNS}
+        for item_keys in items_keys:
+            for key_type, value in item_keys:
+                keys[key_type].add(value)
+        return keys
+
+    def find_game_names(self, items: Sequence[LookupItem]) -> List[LookupResult]:
+        """批量查询。本地覆盖库优先；主库按 SHA1 > MD5 > CRC > 文件名 的顺序取第一个命中的结果。
+
+        数据库错误 (锁定、损坏等) 会直接抛出 sqlite3.Error，不会被当成未命中。
+        """
+        self.open()
+        query_start = time.perf_counter()
+
+        normalized_items = []
+        for hashes, rom_filename in items:
+            item_keys = []
+            for key_type in HASH_KEY_TYPES:
+                value = hashes.get(key_type)
+                if value:
+                    item_keys.append((key_type, value.upper()))
+            if rom_filename:
+                item_keys.append(("FILENAME", rom_filename))
+            normalized_items.append(item_keys)
+
+        results: List[LookupResult] = [None] * len(normalized_items)
+
+        # 先查本地覆盖库，只有未命中的条目才继续查询主库
+        overrides = self._query_overrides(self._collect_keys(normalized_items))
+        pending = []
+        for index, item_keys in enumerate(normalized_items):
+            game_name = next((overrides[key] for key in item_keys if key in overrides), None)
+            if game_name:
+                results[index] = (game_name, USER_KEY_TYPE)
+            else:
+                pending.append(index)
+
+        found = self._query_keys(self._collect_keys(normalized_items[i] for i in pending))
+        for index in pending:
+            for key_type, value in normalized_items[index]:
+                game_name = found.get((key_type, value))
+                if game_name:
+                    results[index] = (game_name, key_type)
+                    break
+
+        if self.stats is not None:
+            self.stats.record_query(time.perf_counter() - query_start)
+        return results
+
+    def find_game_name(self, hashes: Dict[str, Optional[str]], rom_filename: str) -> Optional[str]:
+        result = self.find_game_names([(hashes, rom_filename)])[0]
+        return result[0] if result else None
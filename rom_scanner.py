@@ -0,0 +1,602 @@
+"""ROM 目录扫描。
+
+基于 os.scandir 实现，直接复用 DirEntry 自带的文件类型信息，避免 Path.rglob + is_file()
+为每个条目额外 stat 一次；结果按块 (chunk) 逐步返回，界面可以边扫描边显示。
+
+DirectorySnapshotCache 持久化保存每个目录的文件/子目录列表及其 mtime，目录未变化时
+只需一次 stat 即可复用上次的列表。名称编辑器和媒体预览共用同一个缓存实例。
+
+NAS (SMB/NFS) 上每次列目录都是一次网络往返，子目录可以在有界线程池中并发列出；
+并发数可按根目录配置，或由自动模式根据实测的列目录耗时调整。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Tuple, Union
+
+import xml_backend
+
+SCAN_CHUNK_SIZE = 500
+SNAPSHOT_CACHE_PATH = Path(__file__).parent / "config" / "dir_snapshot_cache.db"
+# mtime 距离当前时间过近的目录不写入缓存：同一时间粒度内的后续改动无法通过 mtime 发现
+RACY_MTIME_WINDOW = 2.0
+
+# (文件名列表, 子目录名列表)
+DirListing = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def _cache_key(path: Union[str, Path]) -> str:
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+class DirectorySnapshotCache:
+    """目录快照缓存：内存字典 + SQLite 持久化，线程安全。"""
+
+    def __init__(self, db_path: Path = SNAPSHOT_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.RLock()
+        self._snapshots: Dict[str, Tuple[int, DirListing]] = {}
+        self._dirty: Dict[str, Tuple[int, DirListing]] = {}
+        self._removed: set = set()
+        self._loaded = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS DirSnapshots ("
+            "Path TEXT PRIMARY KEY, MtimeNs INTEGER NOT NULL, Files TEXT NOT NULL, Subdirs TEXT NOT NULL)"
+        )
+        return conn
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.db_path.is_file():
+            return
+        try:
+            conn = self._connect()
+            try:
+                for path, mtime_ns, files, subdirs in conn.execute(
+                        "SELECT Path, MtimeNs, Files, Subdirs FROM DirSnapshots"):
+                    self._snapshots[path] = (mtime_ns, (tuple(json.loads(files)), tuple(json.loads(subdirs))))
+            finally:
+                conn.close()
+        except (sqlite3.Error, ValueError):
+            # 缓存损坏时直接丢弃，重新扫描即可
+            self._snapshots.clear()
+
+    def get_valid(self, directory: Union[str, Path]) -> Optional[DirListing]:
+        """目录 mtime 与快照一致时返回缓存的列表，否则返回 None。"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            self._ensure_loaded()
+            snapshot = self._snapshots.get(_cache_key(directory))
+        if snapshot and snapshot[0] == mtime_ns:
+            return snapshot[1]
+        return None
+
+    def store(self, directory: Union[str, Path], mtime_ns: int, files: Iterable[str], subdirs: Iterable[str]):
+        if time.time() - mtime_ns / 1e9 < RACY_MTIME_WINDOW:
+            return
+        key = _cache_key(directory)
+        snapshot = (mtime_ns, (tuple(files), tuple(subdirs)))
+        with self._lock:
+            self._ensure_loaded()
+            self._snapshots[key] = snapshot
+            self._dirty[key] = snapshot
+            self._removed.discard(key)
+
+    def listing(self, directory: Union[str, Path], force: bool = False) -> Optional[DirListing]:
+        """返回目录的 (文件名, 子目录名)；目录不存在时返回 None。"""
+        if not force:
+            cached = self.get_valid(directory)
+            if cached is not None:
+                return cached
+        try:
+            mtime_ns, files, subdirs = _list_directory(directory)
+        except OSError:
+            return None
+        self.store(directory, mtime_ns, files, subdirs)
+        return tuple(files), tuple(subdirs)
+
+    def file_names(self, directory: Union[str, Path], force: bool = False) -> FrozenSet[str]:
+        listing = self.listing(directory, force)
+        return frozenset(listing[0]) if listing else frozenset()
+
+    def invalidate(self, root: Union[str, Path]):
+        """丢弃 root 及其所有子目录的快照 (用于“强制重新扫描”)。"""
+        prefix = _cache_key(root)
+        with self._lock:
+            self._ensure_loaded()
+            for key in [k for k in self._snapshots if k == prefix or k.startswith(prefix + os.sep)]:
+                del self._snapshots[key]
+                self._dirty.pop(key, None)
+                self._removed.add(key)
+
+    def save(self):
+        with self._lock:
+            dirty = dict(self._dirty)
+            removed = set(self._removed)
+            self._dirty.clear()
+            self._removed.clear()
+        if not dirty and not removed:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany("DELETE FROM DirSnapshots WHERE Path = ?", [(key,) for key in removed])
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO DirSnapshots (Path, MtimeNs, Files, Subdirs) VALUES (?, ?, ?, ?)",
+                        [(key, mtime_ns, json.dumps(listing[0], ensure_ascii=False),
+                          json.dumps(listing[1], ensure_ascii=False))
+                         for key, (mtime_ns, listing) in dirty.items()]
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"警告: 保存目录快照缓存失败: {e}")
+
+
+_shared_cache: Optional[DirectorySnapshotCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> DirectorySnapshotCache:
+    """进程内共享的目录快照缓存。"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = DirectorySnapshotCache()
+        return _shared_cache
+
+
+def _list_directory(directory: Union[str, Path]) -> Tuple[int, List[str], List[str]]:
+    mtime_ns = os.stat(directory).st_mtime_ns
+    files: List[str] = []
+    subdirs: List[str] = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return mtime_ns, files, subdirs
+
+
+IGNORE_FILE_NAME = ".esdeignore"
+# 操作系统 / NAS 生成的元数据目录，扫描时总是跳过
+OS_METADATA_DIRS = frozenset({
+    "$recycle.bin", "system volume information", "__macosx", "@eadir", "#recycle", "#snapshot",
+    ".trashes", ".spotlight-v100", ".fseventsd", ".temporaryitems", "lost+found",
+})
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """把 gitignore 风格的 glob 转成匹配相对路径 (posix) 的正则。"""
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex.append(f"[{body}]")
+                i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return "".join(regex)
+
+
+class IgnoreRule(NamedTuple):
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+
+
+def parse_ignore_lines(lines: Iterable[str]) -> List[IgnoreRule]:
+    rules = []
+    for raw_line in lines:
+        line = raw_line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.strip("/") if dir_only else line
+        # 含有 '/' (末尾除外) 的模式相对于系统目录；否则匹配任意层级的名称
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+        prefix = "" if anchored else "(?:.*/)?"
+        rules.append(IgnoreRule(re.compile(f"^{prefix}{_glob_to_regex(line)}$", re.IGNORECASE),
+                                negate, dir_only))
+    return rules
+
+
+class ScanRules:
+    """扫描剪枝规则：.esdeignore 模式、最大深度、隐藏/系统元数据目录。
+
+    路径均为相对于系统目录的 posix 路径；被忽略的目录不会被列出。
+    """
+
+    def __init__(self, ignore_rules: Optional[List[IgnoreRule]] = None, max_depth: Optional[int] = None,
+                 skip_hidden: bool = True):
+        self.ignore_rules = ignore_rules or []
+        self.max_depth = max_depth
+        self.skip_hidden = skip_hidden
+
+    def _is_ignored(self, relative_path: str, is_dir: bool) -> bool:
+        # 与 gitignore 相同，后出现的规则优先；被忽略目录内的文件根本不会被列出，
+        # 因此文件只需匹配非目录规则
+        ignored = False
+        for rule in self.ignore_rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(relative_path):
+                ignored = not rule.negate
+        return ignored
+
+    def allows_dir(self, name: str, relative_path: str, depth: int) -> bool:
+        """depth 为该子目录相对于系统目录的层级 (系统目录下的直接子目录为 1)。"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.skip_hidden and (name.startswith(".") or name.lower() in OS_METADATA_DIRS):
+            return False
+        return not self._is_ignored(relative_path, True)
+
+    def allows_file(self, name: str, relative_path: str) -> bool:
+        if self.skip_hidden and name.startswith("."):
+            return False
+        return not self._is_ignored(relative_path, False)
+
+
+def load_scan_rules(system_path: Union[str, Path], rom_root: Optional[Union[str, Path]] = None,
+                    max_depth: Optional[int] = None, skip_hidden: bool = True) -> ScanRules:
+    """读取 ROM 根目录下的全局 .esdeignore 和系统目录下的 .esdeignore (后者优先)。
+
+    全局文件中的模式同样相对于各个系统目录解释。
+    """
+    lines: List[str] = []
+    for base in (rom_root, system_path):
+        if base is None:
+            continue
+        ignore_path = Path(base) / IGNORE_FILE_NAME
+        try:
+            with open(ignore_path, 'r', encoding='utf-8') as f:
+                lines.extend(f.readlines())
+        except OSError:
+            continue
+    return ScanRules(parse_ignore_lines(lines), max_depth=max_depth, skip_hidden=skip_hidden)
+
+
+class ExtensionProfile:
+    """编译后的后缀名查找表。
+
+    后缀按包含的点数分组 (".zip" 为 1，".p8.png" 为 2)，匹配时对文件名最多做几次 rsplit
+    再查集合，不需要逐个后缀 endswith。
+    """
+
+    __slots__ = ("extensions", "_dot_counts")
+
+    def __init__(self, extensions: Iterable[str]):
+        normalized = set()
+        for ext in extensions:
+            ext = ext.strip().lower()
+            if not ext:
+                continue
+            normalized.add(ext if ext.startswith(".") else "." + ext)
+        self.extensions: FrozenSet[str] = frozenset(normalized)
+        self._dot_counts = tuple(sorted({ext.count(".") for ext in self.extensions}))
+
+    def matches(self, file_name: str) -> bool:
+        lowered = file_name.lower()
+        for dot_count in self._dot_counts:
+            parts = lowered.rsplit(".", dot_count)
+            # parts[0] 为空说明是 ".zip" 这类以点开头的隐藏文件，没有主文件名
+            if len(parts) == dot_count + 1 and parts[0] and "." + ".".join(parts[1:]) in self.extensions:
+                return True
+        return False
+
+    def __contains__(self, ext: str) -> bool:
+        return ext.lower() in self.extensions
+
+    def __iter__(self):
+        return iter(sorted(self.extensions))
+
+    def __len__(self) -> int:
+        return len(self.extensions)
+
+
+def load_system_extension_profiles(systems_file: Union[str, Path]) -> Dict[str, ExtensionProfile]:
+    """从 es_systems.xml 读取各系统的 <extension>，按系统名和 ROM 目录名 (<path> 的最后一级) 建立索引。"""
+    profiles: Dict[str, ExtensionProfile] = {}
+    for _, elem in xml_backend.iterparse(os.fspath(systems_file), events=("end",)):
+        if elem.tag.rsplit("}", 1)[-1] != "system":
+            continue
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in elem}
+        extensions = fields.get("extension", "").split()
+        if extensions:
+            profile = ExtensionProfile(extensions)
+            if fields.get("name"):
+                profiles[fields["name"]] = profile
+            folder_name = re.split(r"[\\/]", fields.get("path", "").rstrip("/\\"))[-1]
+            if folder_name and not folder_name.startswith("%"):
+                profiles.setdefault(folder_name, profile)
+        elem.clear()
+    return profiles
+
+
+def _normalize_extensions(allowed_extensions: Optional[Iterable[str]]) -> Optional[ExtensionProfile]:
+    if allowed_extensions is None or isinstance(allowed_extensions, ExtensionProfile):
+        return allowed_extensions
+    return ExtensionProfile(allowed_extensions)
+
+
+AUTO_SCAN_WORKERS = "auto"
+MAX_SCAN_WORKERS = 16
+# 自动模式下，列目录平均耗时每增加这么多秒就多开一个并发列目录的线程；本地磁盘通常远低于此值，保持单线程
+AUTO_LATENCY_PER_WORKER = 0.002
+LATENCY_SMOOTHING = 0.3
+
+# 自动模式记住的各根目录列目录平均耗时，下次扫描同一目录时直接从合适的并发数开始
+_learned_latency: Dict[str, float] = {}
+_learned_latency_lock = threading.Lock()
+
+
+class ScanConcurrency:
+    """并发列目录的线程数：固定值，或自动模式下按列目录耗时的滑动平均动态调整。"""
+
+    def __init__(self, workers: Union[int, str] = AUTO_SCAN_WORKERS, root: Optional[Union[str, Path]] = None):
+        self.auto = workers == AUTO_SCAN_WORKERS
+        self.fixed = 1 if self.auto else max(1, min(MAX_SCAN_WORKERS, int(workers)))
+        self.root_key = _cache_key(root) if root is not None else None
+        self.avg_latency: Optional[float] = None
+        if self.auto and self.root_key is not None:
+            with _learned_latency_lock:
+                self.avg_latency = _learned_latency.get(self.root_key)
+
+    @property
+    def max_workers(self) -> int:
+        return MAX_SCAN_WORKERS if self.auto else self.fixed
+
+    @property
+    def target(self) -> int:
+        if not self.auto:
+            return self.fixed
+        if self.avg_latency is None:
+            return 1
+        return max(1, min(MAX_SCAN_WORKERS, int(self.avg_latency / AUTO_LATENCY_PER_WORKER)))
+
+    def record(self, seconds: float):
+        if self.avg_latency is None:
+            self.avg_latency = seconds
+        else:
+            self.avg_latency += LATENCY_SMOOTHING * (seconds - self.avg_latency)
+
+    def remember(self):
+        if self.auto and self.root_key is not None and self.avg_latency is not None:
+            with _learned_latency_lock:
+                _learned_latency[self.root_key] = self.avg_latency
+
+
+def concurrency_for_root(root: Union[str, Path], setting: Any = AUTO_SCAN_WORKERS) -> ScanConcurrency:
+    """setting 可以是整数、"auto"，或 {目录: 整数/"auto"} 字典 (按最长目录前缀匹配，"*" 为默认值)。"""
+    workers = setting
+    if isinstance(setting, dict):
+        workers = setting.get("*", AUTO_SCAN_WORKERS)
+        root_key = _cache_key(root)
+        best_length = -1
+        for prefix, value in setting.items():
+            if prefix == "*":
+                continue
+            prefix_key = _cache_key(prefix)
+            if (root_key == prefix_key or root_key.startswith(prefix_key.rstrip(os.sep) + os.sep)) \
+                    and len(prefix_key) > best_length:
+                workers, best_length = value, len(prefix_key)
+    if workers != AUTO_SCAN_WORKERS:
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            workers = AUTO_SCAN_WORKERS
+    return ScanConcurrency(workers, root)
+
+
+def _timed_listing(directory: str, cache: Optional[DirectorySnapshotCache],
+                   force: bool) -> Tuple[Optional[DirListing], float]:
+    started = time.perf_counter()
+    if cache is not None:
+        listing = cache.listing(directory, force)
+    else:
+        try:
+            _, files, subdirs = _list_directory(directory)
+            listing = (tuple(files), tuple(subdirs))
+        except OSError:
+            listing = None
+    return listing, time.perf_counter() - started
+
+
+def _walk_listings(root: Union[str, Path], cache: Optional[DirectorySnapshotCache], force: bool,
+                   rules: Optional[ScanRules],
+                   concurrency: ScanConcurrency) -> Iterator[Tuple[str, str, Tuple[str, ...], Tuple[str, ...]]]:
+    """按广度优先顺序返回 (目录, 相对路径, 文件名, 子目录名)。
+
+    目录列表可以在线程池中并发读取，但总是按提交顺序取回结果、子目录按名称排序后入队，
+    因此输出顺序与并发数和各目录的返回先后无关。
+    """
+    pending_dirs = deque([(os.fspath(root), "", 0)])
+    # (目录, 相对路径, 深度, Future 或已完成的结果)
+    in_flight: deque = deque()
+    executor: Optional[ThreadPoolExecutor] = None
+    try:
+        while pending_dirs or in_flight:
+            target = concurrency.target
+            if target > 1 and executor is None:
+                executor = ThreadPoolExecutor(max_workers=concurrency.max_workers)
+            while pending_dirs and (not in_flight or len(in_flight) < target):
+                current_dir, relative_dir, depth = pending_dirs.popleft()
+                if executor is not None and target > 1:
+                    job = executor.submit(_timed_listing, current_dir, cache, force)
+                else:
+                    job = _timed_listing(current_dir, cache, force)
+                in_flight.append((current_dir, relative_dir, depth, job))
+
+            current_dir, relative_dir, depth, job = in_flight.popleft()
+            listing, seconds = job.result() if isinstance(job, Future) else job
+            concurrency.record(seconds)
+            if listing is None:
+                continue
+            file_names, subdir_names = listing
+            for name in sorted(subdir_names):
+                relative_path = f"{relative_dir}{name}"
+                if rules is None or rules.allows_dir(name, relative_path, depth + 1):
+                    pending_dirs.append((os.path.join(current_dir, name), relative_path + "/", depth + 1))
+            yield current_dir, relative_dir, file_names, subdir_names
+        concurrency.remember()
+    finally:
+        if executor is not None:
+            # 扫描被提前中止时丢弃尚未开始的列目录任务 (cancel_futures 参数需要 3.9+)
+            for _, _, _, job in in_flight:
+                if isinstance(job, Future):
+                    job.cancel()
+            executor.shutdown(wait=False)
+
+
+def iter_rom_files(root: Union[str, Path], allowed_extensions: Optional[Iterable[str]] = None,
+                   chunk_size: int = SCAN_CHUNK_SIZE, cache: Optional[DirectorySnapshotCache] = None,
+                   force: bool = False, rules: Optional[ScanRules] = None,
+                   workers: Any = AUTO_SCAN_WORKERS) -> Iterator[List[Path]]:
+    """递归扫描 root，按块返回后缀匹配的文件路径。allowed_extensions 为 None 时返回所有文件。
+
+    后缀过滤只用列目录得到的文件名完成，不匹配的文件不会被 stat 或哈希。
+    传入 cache 时，mtime 未变化的目录直接使用快照；force=True 则忽略快照重新列出所有目录。
+    传入 rules 时按规则在目录层面剪枝。无法访问的子目录会被跳过。
+    workers 为并发列目录的线程数、"auto"、{目录: 并发数} 字典或 ScanConcurrency；
+    网络共享上每次列目录都是一次往返，并发可以显著缩短扫描时间。结果顺序与并发数无关。
+    """
+    extensions = _normalize_extensions(allowed_extensions)
+    concurrency = workers if isinstance(workers, ScanConcurrency) else concurrency_for_root(root, workers)
+    chunk: List[Path] = []
+    try:
+        for current_dir, relative_dir, file_names, _ in _walk_listings(root, cache, force, rules, concurrency):
+            for name in file_names:
+                if extensions is not None and not extensions.matches(name):
+                    continue
+                if rules is not None and not rules.allows_file(name, f"{relative_dir}{name}"):
+                    continue
+                chunk.append(Path(current_dir, name))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if cache is not None:
+            cache.save()
+
+
+def scan_rom_files(root: Union[str, Path], allowed_extensions: Optional[Iterable[str]] = None,
+                   cache: Optional[DirectorySnapshotCache] = None, force: bool = False,
+                   rules: Optional[ScanRules] = None, workers: Any = AUTO_SCAN_WORKERS) -> List[Path]:
+    """一次性扫描并按文件名排序，等价于旧版 rglob 实现的结果。"""
+    rom_files = [path for chunk in iter_rom_files(root, allowed_extensions, cache=cache, force=force,
+                                                  rules=rules, workers=workers)
+                 for path in chunk]
+    return sorted(rom_files, key=lambda p: p.name)
+
+
+class RomSnapshot:
+    """一个系统目录某一时刻的内容，路径均为相对于系统目录的 posix 路径 (如 "sub/game.zip")。
+
+    roms 为后缀和规则都匹配的 ROM 文件 (按扫描顺序)；entries 为被列出目录中的全部文件和子目录，
+    用来判断 gamelist 中的路径是否仍然存在；listed_dirs 为被列出的目录 ("" 为系统目录本身)。
+    被规则剪掉的目录没有列出，其中的路径无法由快照判断。
+    entries 和 listed_dirs 保存的是 key(路径)：Windows 上文件名不区分大小写，统一转为小写比较。
+    """
+
+    __slots__ = ("root", "case_sensitive", "roms", "entries", "listed_dirs")
+
+    def __init__(self, root: Union[str, Path], case_sensitive: bool = os.name != "nt"):
+        self.root = Path(root)
+        self.case_sensitive = case_sensitive
+        self.roms: List[str] = []
+        self.entries: set = set()
+        self.listed_dirs: set = set()
+
+    def key(self, relative_path: str) -> str:
+        return relative_path if self.case_sensitive else relative_path.casefold()
+
+    def contains(self, relative_path: str) -> Optional[bool]:
+        """路径是否存在；所在目录没有被列出时返回 None。"""
+        key = self.key(relative_path)
+        if key in self.entries:
+            return True
+        parent = key.rsplit("/", 1)[0] if "/" in key else ""
+        return False if parent in self.listed_dirs else None
+
+
+def take_rom_snapshot(root: Union[str, Path], allowed_extensions: Optional[Iterable[str]] = None,
+                      cache: Optional[DirectorySnapshotCache] = None, force: bool = False,
+                      rules: Optional[ScanRules] = None, workers: Any = AUTO_SCAN_WORKERS) -> RomSnapshot:
+    """列出 root 下的所有目录 (规则与 iter_rom_files 相同)，只保留相对路径字符串，不为文件创建 Path 对象。
+
+    不调用 cache.save()，由调用方在一批快照完成后保存。root 不存在时返回空快照。
+    """
+    extensions = _normalize_extensions(allowed_extensions)
+    concurrency = workers if isinstance(workers, ScanConcurrency) else concurrency_for_root(root, workers)
+    snapshot = RomSnapshot(root)
+    roms = snapshot.roms
+    entries = snapshot.entries
+    fold = None if snapshot.case_sensitive else str.casefold
+    for _, relative_dir, file_names, subdir_names in _walk_listings(root, cache, force, rules, concurrency):
+        snapshot.listed_dirs.add(relative_dir[:-1] if fold is None else fold(relative_dir[:-1]))
+        if fold is None:
+            entries.update(relative_dir + name for name in subdir_names)
+            entries.update(relative_dir + name for name in file_names)
+        else:
+            entries.update(fold(relative_dir + name) for name in subdir_names)
+            entries.update(fold(relative_dir + name) for name in file_names)
+        for name in file_names:
+            relative_path = relative_dir + name
+            if extensions is not None and not extensions.matches(name):
+                continue
+            if rules is not None and not rules.allows_file(name, relative_path):
+                continue
+            roms.append(relative_path)
+    return snapshot
@@ -11,6 +11,8 @@ import os
 import shutil 
 import datetime 
 
+import xml_backend
+
 try:
     from base_interface import BaseInterface 
     from interface_loader import register_interface
@@ -133,7 +135,7 @@ def load_systems_file(path: Union[str, Path]) -> Optional[ET.ElementTree]:
     try:
         content = Path(path).read_text(encoding='utf-8')
         content = re.sub(' xmlns="[^"]+"', '', content, count=1)
-        tree = ET.ElementTree(ET.fromstring(content))
+        tree = xml_backend.ElementTree(xml_backend.fromstring(content))
         return tree
     except Exception as e:
         messagebox.showerror("文件加载错误", f"无法解析系统配置文件: {e}")
@@ -143,7 +145,7 @@ def save_systems_file(path: Union[str, Path], tree: ET.ElementTree):
     path_obj = Path(path)
     
     try:
-        tree.write(path_obj, encoding='utf-8', xml_declaration=True)
+        xml_backend.write_xml(tree, path_obj)
         messagebox.showinfo("提示", f"系统配置已保存到:\n{path_obj.name}")
     except Exception as e:
         messagebox.showerror("保存失败", f"保存系统配置文件时发生错误: {e}")
@@ -163,7 +165,7 @@ def _extract_retroarch_cores_from_xml(systems_file_path: Path) -> List[str]:
     try:
         content = systems_file_path.read_text(encoding='utf-8')
         content = re.sub(' xmlns="[^"]+"', '', content, count=1)
-        root = ET.fromstring(content)
+        root = xml_backend.fromstring(content)
         
         core_regex = re.compile(r'%CORE_RETROARCH%[/\\]["\']?([^"\']+\.(?:dll|so|dylib))["\']?', re.IGNORECASE)
         
@@ -188,7 +190,7 @@ def _extract_emulators_from_find_rules(find_rules_file_path: Path) -> Dict[str,
     try:
         content = find_rules_file_path.read_text(encoding='utf-8')
         content = re.sub(' xmlns="[^"]+"', '', content, count=1) 
-        root = ET.fromstring(content)
+        root = xml_backend.fromstring(content)
         
         core_names: Set[str] = set()
         for core_element in root.findall('core'):
@@ -233,7 +235,7 @@ def _extract_commands_from_systems_xml(systems_file_path: Path, emu_var_to_key:
     try:
         content = systems_file_path.read_text(encoding='utf-8')
         content = re.sub(' xmlns="[^"]+"', '', content, count=1)
-        root = ET.fromstring(content)
+        root = xml_backend.fromstring(content)
         
         sorted_vars = sorted(emu_var_to_key.keys(), key=len, reverse=True)
         
@@ -1149,9 +1151,8 @@ class SystemsEditorFrame(BaseInterface):
 
         if element is None:
             if new_text:
-                new_element = ET.Element(tag)
+                new_element = xml_backend.SubElement(self.current_system_element, tag)
                 new_element.text = new_text
-                self.current_system_element.append(new_element)
         else:
             if new_text:
                 element.text = new_text
@@ -1177,7 +1178,7 @@ class SystemsEditorFrame(BaseInterface):
         platform_elem = self.current_system_element.find('platform')
         if platform_elem is None:
             if platform_text:
-                platform_elem = ET.Element('platform')
+                platform_elem = xml_backend.Element('platform')
                 platform_elem.text = platform_text
                 self.current_system_element.append(platform_elem)
         else:
@@ -1189,7 +1190,7 @@ class SystemsEditorFrame(BaseInterface):
         theme_elem = self.current_system_element.find('theme')
         if theme_elem is None:
             if theme_text:
-                theme_elem = ET.Element('theme')
+                theme_elem = xml_backend.Element('theme')
                 theme_elem.text = theme_text
                 self.current_system_element.append(theme_elem)
         else:
@@ -1244,17 +1245,17 @@ class SystemsEditorFrame(BaseInterface):
             messagebox.showerror("错误", "该系统全称已存在。")
             return
         
-        new_system = ET.Element('system')
+        new_system = xml_backend.Element('system')
         
-        ET.SubElement(new_system, 'fullname').text = l
-        ET.SubElement(new_system, 'path').text = "%ROMPATH%"
-        ET.SubElement(new_system, 'extension').text = ".zip .7z .iso"
-        ET.SubElement(new_system, 'platform').text = l
-        ET.SubElement(new_system, 'theme').text = l
+        xml_backend.SubElement(new_system, 'fullname').text = l
+        xml_backend.SubElement(new_system, 'path').text = "%ROMPATH%"
+        xml_backend.SubElement(new_system, 'extension').text = ".zip .7z .iso"
+        xml_backend.SubElement(new_system, 'platform').text = l
+        xml_backend.SubElement(new_system, 'theme').text = l
         
         default_cmd_label = "default"
         default_cmd_text = "%EMULATOR_DEFAULT% %ROM%"
-        ET.SubElement(new_system, 'command', label=default_cmd_label).text = default_cmd_text
+        xml_backend.SubElement(new_system, 'command', label=default_cmd_label).text = default_cmd_text
 
         self.xml_tree.getroot().append(new_system)
         self.systems_data[l] = new_system 
@@ -1280,7 +1281,7 @@ class SystemsEditorFrame(BaseInterface):
                 return
         
         c = "%EMULATOR_DEFAULT% %ROM%"
-        n = ET.Element('command', label=l)
+        n = xml_backend.Element('command', label=l)
         n.text = c
         self.current_system_element.append(n)
         self._refresh_cmd_list(reselect_key=l)
@@ -1,7 +1,6 @@
 import customtkinter as ctk
 from typing import Any, Optional, Dict, List, Tuple, Union
 import xml.etree.ElementTree as ET
-import io
 import sys
 import json
 import os
@@ -9,6 +8,7 @@ from pathlib import Path
 from tkinter import messagebox, filedialog 
 import platform
 
+import xml_backend
 from base_interface import BaseInterface 
 from interface_loader import register_interface 
     
@@ -80,7 +80,7 @@ class XmlRuleEditor:
             xml_content = self.file_path.read_text(encoding='utf-8')
             content_cleaned = xml_content.replace(' xmlns="http://www.emulationstation.org/xml/system"', '')
             
-            self.tree = ET.parse(io.StringIO(content_cleaned))
+            self.tree = xml_backend.ElementTree(xml_backend.fromstring(content_cleaned))
             self.root = self.tree.getroot()
             return True
         except Exception as e:
@@ -134,14 +134,14 @@ class XmlRuleEditor:
         for element in elements:
             rule = element.find('rule') 
             if rule is None:
-                rule = ET.SubElement(element, 'rule', type='staticpath')
+                rule = xml_backend.SubElement(element, 'rule', type='staticpath')
                 
             for entry in rule.findall('entry'):
                 rule.remove(entry)
             
             for path in new_paths:
                 if path and path.strip():
-                    new_entry = ET.SubElement(rule, 'entry')
+                    new_entry = xml_backend.SubElement(rule, 'entry')
                     new_entry.text = path.strip()
                     
     def save_to_file(self) -> bool:
@@ -150,7 +150,7 @@ class XmlRuleEditor:
             return False
         
         try:
-            self.tree.write(self.file_path, encoding='utf-8', xml_declaration=True)
+            xml_backend.write_xml(self.tree, self.file_path)
             return True
         except Exception as e:
             print(f"错误: 无法保存 XML 文件: {e}", file=sys.stderr)
@@ -2,9 +2,14 @@ import customtkinter as ctk
 from tkinter import messagebox
 from typing import Optional, Dict, List, Type
 import sys
+import threading
 
 from interface_loader import get_available_interfaces
 from base_interface import BaseInterface
+from library_scan import start_library_scan_from_config
+from fs_watcher import start_fs_watcher_from_config
+from gamelist_repository import get_gamelist_repository
+from gamelist_journal import load_pending_journals, recover_document
 
 # --- 全局常量 (仅用于显示) ---
 __version__ = "1.0 @爱折腾的老家伙"
@@ -17,6 +22,7 @@ class WindowShell(ctk.CTk):
         self.title(f"配置工具 (v{__version__})")
         self.geometry("1280x720")
         self.bind("<Control-s>", lambda e: self._handle_ctrl_s())
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
         self.current_component: Optional[BaseInterface] = None
         self.interface_instances: Dict[str, BaseInterface] = {}
@@ -29,7 +35,44 @@ class WindowShell(ctk.CTk):
         self._create_main_content_frame()
         
         self._load_plugins()
+        # 后台统计各系统 ROM/条目数量，完成后各插件的系统下拉框会自动更新
+        start_library_scan_from_config()
+        # 监视 ROM / gamelist / 媒体目录的变化并推送给各插件
+        start_fs_watcher_from_config()
+        # 上次退出前没有保存完成的 gamelist 修改：后台加载编辑日志对应的列表，回到主线程重放
+        threading.Thread(target=self._load_gamelist_journals, daemon=True).start()
         self._show_initial_interface()
+
+    def _load_gamelist_journals(self):
+        try:
+            pending, stale = load_pending_journals(get_gamelist_repository())
+        except Exception as e:
+            print(f"警告: 读取 gamelist 编辑日志失败: {e}", file=sys.stderr)
+            return
+        if pending or stale:
+            self.after(10, lambda: self._recover_gamelist_journals(pending, stale))
+
+    def _recover_gamelist_journals(self, pending, stale):
+        recovered = [document.path for document, records in pending if recover_document(document, records)]
+        lines = []
+        if recovered:
+            lines.append("以下游戏列表恢复了上次未保存的修改，请在游戏列表编辑器中检查并保存:")
+            lines.extend(f"  {path.parent.name}/{path.name}" for path in recovered)
+        if stale:
+            lines.append("以下编辑日志对应的文件已被其他程序修改，未做恢复，日志已保留:")
+            lines.extend(f"  {path}" for path in stale)
+        if not lines:
+            return
+        # 当前界面可能已显示恢复前的列表
+        if recovered and self.current_component:
+            self.current_component.on_switch_to()
+        messagebox.showinfo("恢复未保存的修改", "\n".join(lines))
+
+    def _on_close(self):
+        """等待后台保存写完再退出；未保存的修改保留在编辑日志中，下次启动时恢复。"""
+        if not get_gamelist_repository().wait_for_saves(timeout=30):
+            print("警告: 等待 gamelist 保存超时", file=sys.stderr)
+        self.destroy()
         
     def _handle_ctrl_s(self):
         """调用当前界面的保存方法。"""
@@ -0,0 +1,185 @@
+"""XML 后端。
+
+安装了 lxml 时用它解析 gamelist.xml / es_systems.xml / es_find_rules.xml：C 实现更快，
+开启 huge_tree 后可以解析超大文件，xpath() 支持完整 XPath 并缓存编译结果。未安装时使用标准库 ElementTree。
+
+两种后端的元素接口相同 (tag/text/tail/attrib/find/findall/append...)。写文件统一经过
+ElementTree 的序列化器，因此两种后端的输出逐字节相同，也与以往 tree.write(...) 生成的文件一致；
+写入路径时先写临时文件再原子替换。
+注释和处理指令在解析时丢弃，与 ElementTree 的默认行为相同。
+
+环境变量 ESDE_XML_BACKEND=etree 可强制使用标准库 (用于对比测试)。
+"""
+import os
+import stat
+import threading
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Union
+
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    lxml_etree = None
+    LXML_AVAILABLE = False
+
+BACKEND_LXML = "lxml"
+BACKEND_ETREE = "etree"
+BACKEND_ENV_VAR = "ESDE_XML_BACKEND"
+
+# 捕获解析错误时使用：except PARSE_ERRORS
+PARSE_ERRORS: tuple = (ET.ParseError,) + ((lxml_etree.XMLSyntaxError,) if LXML_AVAILABLE else ())
+
+XmlSource = Union[str, Path, IO[bytes]]
+
+_backend = BACKEND_LXML if LXML_AVAILABLE and os.environ.get(BACKEND_ENV_VAR) != BACKEND_ETREE else BACKEND_ETREE
+# lxml 的解析器对象不是线程安全的，每个线程各用一个
+_thread_local = threading.local()
+_xpath_cache: Dict[str, Any] = {}
+_xpath_cache_lock = threading.Lock()
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def set_backend(name: str):
+    """切换后端 (基准测试用)。请求 lxml 但未安装时抛出 ValueError。"""
+    global _backend
+    if name == BACKEND_LXML and not LXML_AVAILABLE:
+        raise ValueError("lxml 未安装")
+    if name not in (BACKEND_LXML, BACKEND_ETREE):
+        raise ValueError(f"未知的 XML 后端: {name}")
+    _backend = name
+
+
+def _lxml_parser():
+    parser = getattr(_thread_local, "parser", None)
+    if parser is None:
+        parser = lxml_etree.XMLParser(huge_tree=True, remove_comments=True, remove_pis=True)
+        _thread_local.parser = parser
+    return parser
+
+
+def _source_arg(source: XmlSource):
+    return os.fspath(source) if isinstance(source, Path) else source
+
+
+def parse(source: XmlSource) -> ET.ElementTree:
+    """解析文件，返回以 ElementTree 包装的树 (getroot()/write() 对两种后端行为一致)。"""
+    if _backend == BACKEND_LXML:
+        return ET.ElementTree(lxml_etree.parse(_source_arg(source), _lxml_parser()).getroot())
+    return ET.parse(_source_arg(source))
+
+
+def fromstring(text: Union[str, bytes]):
+    if _backend == BACKEND_LXML:
+        # lxml 不接受带 encoding 声明的 str；调用方都是按 UTF-8 读入的文本
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        return lxml_etree.fromstring(data, _lxml_parser())
+    return ET.fromstring(text)
+
+
+def XMLParser():
+    """可多次 feed() 的增量解析器，close() 返回根元素。"""
+    if _backend == BACKEND_LXML:
+        return lxml_etree.XMLParser(huge_tree=True, remove_comments=True, remove_pis=True)
+    return ET.XMLParser()
+
+
+def iterparse(source: XmlSource, events: Sequence[str] = ("end",)):
+    if _backend == BACKEND_LXML:
+        return lxml_etree.iterparse(_source_arg(source), events=tuple(events), huge_tree=True,
+                                    remove_comments=True, remove_pis=True)
+    return ET.iterparse(_source_arg(source), events=events)
+
+
+def Element(tag: str, attrib: Optional[Dict[str, str]] = None, **extra):
+    attrib = dict(attrib or {}, **extra)
+    if _backend == BACKEND_LXML:
+        return lxml_etree.Element(tag, attrib)
+    return ET.Element(tag, attrib)
+
+
+def SubElement(parent, tag: str, attrib: Optional[Dict[str, str]] = None, **extra):
+    """按父元素自身的类型创建子元素，两种后端的元素可以混用此函数。"""
+    element = parent.makeelement(tag, dict(attrib or {}, **extra))
+    parent.append(element)
+    return element
+
+
+def ElementTree(root) -> ET.ElementTree:
+    return ET.ElementTree(root)
+
+
+def xpath(element, expression: str) -> List[Any]:
+    """lxml 元素使用编译缓存的完整 XPath (支持 not()、contains() 等)；标准库元素退回 findall，
+    只支持 ElementPath 子集。简单的子节点选择直接用 element.findall 更快。"""
+    if LXML_AVAILABLE and isinstance(element, lxml_etree._Element):
+        with _xpath_cache_lock:
+            compiled = _xpath_cache.get(expression)
+            if compiled is None:
+                compiled = lxml_etree.XPath(expression)
+                _xpath_cache[expression] = compiled
+        return compiled(element)
+    return element.findall(expression)
+
+
+def write_xml(tree_or_root, destination: Union[str, Path, IO[bytes]]):
+    """以 UTF-8 和 XML 声明写出，输出与 ElementTree.write(encoding='utf-8', xml_declaration=True) 相同。
+
+    destination 为路径时原子写入 (见 atomic_write)，中途崩溃不会留下被截断的文件。
+    """
+    root = tree_or_root.getroot() if hasattr(tree_or_root, "getroot") else tree_or_root
+    if isinstance(destination, (str, Path)):
+        with atomic_write(destination) as f:
+            ET.ElementTree(root).write(f, encoding='utf-8', xml_declaration=True)
+        return
+    ET.ElementTree(root).write(destination, encoding='utf-8', xml_declaration=True)
+
+
+@contextmanager
+def atomic_write(path: Union[str, Path]) -> Iterator[IO[bytes]]:
+    """先写入同目录下的临时文件并 fsync，成功后用 os.replace 替换目标文件；出错时删除临时文件，原文件不变。"""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # 保留原文件的权限位
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except OSError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path):
+    """让 os.replace 的目录项变更落盘；Windows 不支持打开目录，直接跳过。"""
+    if os.name != "posix":
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def tostring(element) -> bytes:
+    return ET.tostring(element, encoding='utf-8')
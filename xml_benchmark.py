@@ -0,0 +1,105 @@
+"""对比 lxml 与 ElementTree 两种 XML 后端的解析/查询/写出耗时，并校验两者写出的文件逐字节相同。
+
+用法:
+    python xml_benchmark.py                       # 使用配置中的 gamelist 目录和 es_systems.xml
+    python xml_benchmark.py path/to/gamelist.xml path/to/es_systems.xml --repeat 5
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import xml_backend
+from gamelist_loader import load_gamelist
+
+TOOLKIT_CONFIG_PATH = Path(__file__).parent / "config" / "esde_toolkit_config.json"
+
+
+def _default_files() -> List[Path]:
+    if not TOOLKIT_CONFIG_PATH.is_file():
+        return []
+    with open(TOOLKIT_CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    files: List[Path] = []
+    if config.get("gamelist_base_dir"):
+        files.extend(sorted(Path(config["gamelist_base_dir"]).glob("*/gamelist.xml")))
+    if config.get("systems_config_file_found_path"):
+        files.append(Path(config["systems_config_file_found_path"]))
+    return [path for path in files if path.is_file()]
+
+
+def _best_of(repeat: int, func: Callable[[], object]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _serialize(path: Path) -> bytes:
+    buffer = io.BytesIO()
+    xml_backend.write_xml(xml_backend.parse(path), buffer)
+    return buffer.getvalue()
+
+
+def benchmark_file(path: Path, backends: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    outputs: Dict[str, bytes] = {}
+    for backend in backends:
+        xml_backend.set_backend(backend)
+        root = xml_backend.parse(path).getroot()
+        entry_tag = "game" if root.tag == "gameList" else "system"
+        results[backend] = {
+            "parse": _best_of(repeat, lambda: xml_backend.parse(path)),
+            "stream": _best_of(repeat, lambda: load_gamelist(path, keep_elements=False)),
+            "findall": _best_of(repeat, lambda: root.findall(entry_tag)),
+            "xpath": _best_of(repeat, lambda: xml_backend.xpath(root, f"{entry_tag}[name]")),
+            "write": _best_of(repeat, lambda: _serialize(path)),
+        }
+        outputs[backend] = _serialize(path)
+    first = next(iter(outputs.values()))
+    results["_identical"] = {"value": float(all(output == first for output in outputs.values()))}
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="对比 XML 后端性能")
+    parser.add_argument("files", nargs="*", type=Path, help="要测试的 XML 文件 (默认读取配置)")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最快一次")
+    args = parser.parse_args(argv)
+
+    files = args.files or _default_files()
+    if not files:
+        print("没有可测试的文件：请指定路径，或先在基础设置中配置 gamelist 目录。")
+        return 1
+
+    backends = [xml_backend.BACKEND_ETREE] + ([xml_backend.BACKEND_LXML] if xml_backend.LXML_AVAILABLE else [])
+    if not xml_backend.LXML_AVAILABLE:
+        print("提示: 未安装 lxml (pip install lxml)，只测试 ElementTree。")
+    original_backend = xml_backend.get_backend()
+
+    all_identical = True
+    try:
+        for path in files:
+            size_mb = path.stat().st_size / 1024 / 1024
+            print(f"\n{path} ({size_mb:.1f} MB)")
+            results = benchmark_file(path, backends, max(1, args.repeat))
+            identical = bool(results.pop("_identical")["value"])
+            all_identical = all_identical and identical
+            print(f"  {'后端':<8}{'解析':>10}{'流式加载':>10}{'findall':>10}{'xpath':>10}{'写出':>10}")
+            for backend, timings in results.items():
+                print(f"  {backend:<8}" + "".join(f"{timings[key] * 1000:>9.1f}ms"
+                                                   for key in ("parse", "stream", "findall", "xpath", "write")))
+            if len(backends) > 1:
+                print(f"  写出结果逐字节相同: {'是' if identical else '否'}")
+    finally:
+        xml_backend.set_backend(original_backend)
+    return 0 if all_identical else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))